@@ -25,6 +25,21 @@ ALLOWED_ORIGINS = ["https://ksaver.onrender.com"]
 JWT_SECRET = os.getenv("JWT_SECRET", "CHANGE_THIS_TO_LONG_RANDOM_STRING")
 JWT_ALG = "HS256"
 JWT_EXPIRE_MIN = int(os.getenv("JWT_EXPIRE_MIN", "1440"))  # 24h
+AUTH_TOKEN_CACHE_MAX = int(os.getenv("AUTH_TOKEN_CACHE_MAX", "10000"))  # 검증 끝난 token LRU 항목 수 (0 이면 끔)
+AUTH_REVOKE_SYNC_SEC = float(os.getenv("AUTH_REVOKE_SYNC_SEC", "2"))    # 다른 worker 가 기록한 폐기 목록(users.db)을 읽는 주기
+
+# ✅ 사용자 저장소 / 로그인 (app/domain/user_store.py)
+USER_STORE = os.getenv("USER_STORE", "sqlite")                        # sqlite | memory
+USER_DB_PATH = os.getenv(
+    "USER_DB_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "users.db")),
+)
+AUTH_SEED_USERS = os.getenv("AUTH_SEED_USERS", "1") == "1"           # 빈 저장소면 admin@local / user@local 생성
+AUTH_PBKDF2_ROUNDS = int(os.getenv("AUTH_PBKDF2_ROUNDS", "29000"))   # 새 hash 비용 (바뀌면 로그인 시 재hash)
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))         # 비밀번호 검증 전용 스레드 수
+AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", "32"))            # 검증 대기 상한 (넘으면 503)
+AUTH_LOGIN_MAX_FAILS = int(os.getenv("AUTH_LOGIN_MAX_FAILS", "5"))   # 계정별 연속 실패 허용 수
+AUTH_LOGIN_LOCK_SEC = float(os.getenv("AUTH_LOGIN_LOCK_SEC", "60"))  # 초과 시 잠금 (반복되면 2배씩, 최대 15분)
 
 # =========================
 # MQTT
@@ -36,6 +51,54 @@ MQTT_PASS = os.getenv("MQTT_PASS", "")
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "th/#")
 MQTT_TLS = os.getenv("MQTT_TLS", "0") == "1"
 
+# ✅ 연결 관리 (app/services/mqtt_manager.py)
+MQTT_CLIENTS = int(os.getenv("MQTT_CLIENTS", "1"))                    # 브로커 연결 수 (shared subscription 으로 분담)
+MQTT_SHARE_GROUP = os.getenv("MQTT_SHARE_GROUP", "")                  # "$share/<group>/<topic>" (비우면 clients>1 일 때만 "monitor")
+# client id (연결마다 -<n>): 비우면 server_reader-<host>-<pid> -> 프로세스마다 달라서
+#   같은 호스트에서 MQTT 를 켠 프로세스가 여럿이어도 (APP_ROLE=all + uvicorn --workers N) 서로 세션을 뺏지 않음
+#   이 경우 영속 세션은 그 프로세스가 살아 있는 동안의 재연결에만 쓰이고, 정상 종료 시 세션을 지움
+#   재시작 사이에도 세션(밀린 QoS 1 메시지)을 이어받으려면 MQTT 를 맡는 프로세스 1개
+#   (APP_ROLE=ingest 또는 all + --workers 1) 에 MQTT_CLIENT_ID 를 명시 (프로세스마다 다른 값)
+MQTT_CLIENT_ID = os.getenv("MQTT_CLIENT_ID", "")
+MQTT_PROTOCOL = os.getenv("MQTT_PROTOCOL", "5")                       # 5 | 311
+MQTT_QOS = int(os.getenv("MQTT_QOS", "1"))
+MQTT_SESSION_EXPIRY = int(os.getenv("MQTT_SESSION_EXPIRY", "3600"))   # 끊긴 동안 브로커가 세션/QoS1 메시지 보관(초), 0 이면 clean session
+MQTT_RECONNECT_MIN_SEC = float(os.getenv("MQTT_RECONNECT_MIN_SEC", "1"))
+MQTT_RECONNECT_MAX_SEC = float(os.getenv("MQTT_RECONNECT_MAX_SEC", "30"))
+MQTT_KEEPALIVE = int(os.getenv("MQTT_KEEPALIVE", "60"))
+# ✅ ingest 큐가 차면 on_message 가 PUBACK 전에 이만큼 재시도 (keepalive/2 를 넘지 않음)
+#   그래도 못 넣은 메시지가 MQTT_UNACKED_RECONNECT 개가 되면 재연결 -> 브로커가 세션의 미확인 메시지를 재전송
+MQTT_ACK_WAIT_SEC = float(os.getenv("MQTT_ACK_WAIT_SEC", "20"))
+MQTT_UNACKED_RECONNECT = int(os.getenv("MQTT_UNACKED_RECONNECT", "1"))
+
+# ✅ on_message 는 enqueue 만, 처리는 shard 별 ingest 스레드 (app/services/ingest_pool.py)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "20000"))   # 전체 shard 합계
+INGEST_SUBMIT_TIMEOUT_SEC = float(os.getenv("INGEST_SUBMIT_TIMEOUT_SEC", "2"))   # shard 큐가 차면 on_message 가 기다리는 시간, 넘으면 PUBACK 안 함
+
+# =========================
+# Logging (app/core/log.py)
+# =========================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")                        # text | json
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))            # 넘치면 버림 (호출 스레드 안 막음)
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))        # DEBUG 메시지 로그: 장치별 N 건 중 1 건
+LOG_ERROR_INTERVAL = float(os.getenv("LOG_ERROR_INTERVAL", "10"))   # 같은 에러는 N 초에 1 번
+
+# =========================
+# Process role (multi-worker)
+# =========================
+# all    : 한 프로세스가 MQTT + REST/WS 전부 (기본, uvicorn --workers 1)
+# ingest : MQTT/Influx/rollup 만 담당, 정규화된 record 를 IPC_SOCKET 으로 publish (ingest.py)
+# worker : MQTT 없이 IPC_SOCKET 에서 record 를 받아 replica 로 REST/WS 제공 (uvicorn --workers N)
+APP_ROLE = os.getenv("APP_ROLE", "all").lower()
+# ✅ 소켓은 소유자 전용(0700) 디렉터리 안 (공용 /tmp 에 바로 두면 다른 로컬 사용자가 먼저 bind 가능)
+IPC_SOCKET = os.getenv(
+    "IPC_SOCKET",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR") or "/tmp", f"monitor-{os.getuid()}", "ingest.sock"),
+)
+IPC_QUEUE_MAX = int(os.getenv("IPC_QUEUE_MAX", "20000"))          # worker 1개당 송신 대기 상한(records)
+
 # =========================
 # Influx
 # =========================
@@ -45,6 +108,81 @@ INFLUX_ORG = os.getenv("INFLUX_ORG", "")
 INFLUX_BUCKET = os.getenv("INFLUX_BUCKET", "")
 INFLUX_MEASUREMENT = os.getenv("INFLUX_MEASUREMENT", "power")
 
+# ✅ 배치 writer (MQTT 수신 스레드에서 Influx HTTP 왕복을 분리)
+INFLUX_BATCH_SIZE = int(os.getenv("INFLUX_BATCH_SIZE", "500"))           # points / batch
+INFLUX_FLUSH_MS = int(os.getenv("INFLUX_FLUSH_MS", "1000"))              # 최대 대기(linger)
+INFLUX_QUEUE_MAX = int(os.getenv("INFLUX_QUEUE_MAX", "50000"))           # 큐 상한(points)
+INFLUX_MAX_RETRIES = int(os.getenv("INFLUX_MAX_RETRIES", "3"))
+INFLUX_RETRY_BASE_MS = int(os.getenv("INFLUX_RETRY_BASE_MS", "500"))     # backoff 시작값
+
+# ✅ Influx 장애 시 디스크 spool (app/services/influx_spool.py) - 복구되면 순서대로 replay
+INFLUX_SPOOL_DIR = os.getenv(
+    "INFLUX_SPOOL_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "spool")),
+)                                                                         # 빈 값이면 spool 끔
+INFLUX_SPOOL_SEGMENT_MB = float(os.getenv("INFLUX_SPOOL_SEGMENT_MB", "16"))   # segment 파일 회전 크기
+INFLUX_SPOOL_MAX_MB = float(os.getenv("INFLUX_SPOOL_MAX_MB", "512"))          # spool 전체 상한
+INFLUX_SPOOL_POLICY = os.getenv("INFLUX_SPOOL_POLICY", "drop_oldest")         # drop_oldest | drop_newest
+INFLUX_SPOOL_REPLAY_SEC = float(os.getenv("INFLUX_SPOOL_REPLAY_SEC", "5"))    # 장애 중 복구 확인 주기
+
+# ✅ 수신 시점 rollup (minute/hour/day 버킷 -> 별도 measurement)
+ROLLUP_ENABLED = os.getenv("ROLLUP_ENABLED", "1") == "1"
+INFLUX_ROLLUP_MEASUREMENT = os.getenv("INFLUX_ROLLUP_MEASUREMENT", f"{INFLUX_MEASUREMENT}_rollup")
+ROLLUP_GRACE_SEC = float(os.getenv("ROLLUP_GRACE_SEC", "10"))     # 버킷 종료 후 늦게 오는 샘플 허용 시간
+ROLLUP_SWEEP_SEC = float(os.getenv("ROLLUP_SWEEP_SEC", "5"))      # 조용한 장치의 버킷 닫기 주기
+# 종료 시 열린 버킷 / kwh_prev 를 저장 -> 재시작 후 이어서 집계 (비우면 저장 안 함)
+ROLLUP_STATE_PATH = os.getenv(
+    "ROLLUP_STATE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "rollup.state")),
+)
+
+# =========================
+# /api/series (Influx 집계 + 캐시)
+# =========================
+SERIES_TZ = os.getenv("SERIES_TZ", "UTC")                                        # 시간/일/월 경계 기준 timezone
+SERIES_CACHE_MAX = int(os.getenv("SERIES_CACHE_MAX", "2048"))                    # LRU 항목 수
+SERIES_CACHE_OPEN_TTL = float(os.getenv("SERIES_CACHE_OPEN_TTL", "30"))          # 현재(열린) 구간
+SERIES_CACHE_CLOSED_TTL = float(os.getenv("SERIES_CACHE_CLOSED_TTL", "21600"))   # 지난(닫힌) 구간 6h
+
+# ✅ 서버 측 리포트 (/api/report) - 장치 x 구간 청크 조회 + 결과 파일 캐시
+REPORT_CACHE_DIR = os.getenv(
+    "REPORT_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "reports")),
+)
+REPORT_CACHE_MAX_MB = float(os.getenv("REPORT_CACHE_MAX_MB", "256"))   # 캐시 파일 전체 상한
+REPORT_CHUNK_WINDOWS = int(os.getenv("REPORT_CHUNK_WINDOWS", "500"))   # 장치당 1번에 조회할 window 수
+REPORT_MAX_DEVICES = int(os.getenv("REPORT_MAX_DEVICES", "500"))
+REPORT_CACHE_TTL_SEC = float(os.getenv("REPORT_CACHE_TTL_SEC", "21600"))        # 캐시 파일 수명 (늦게 도착한 point 반영)
+REPORT_CSV_BUFFER_ROWS = int(os.getenv("REPORT_CSV_BUFFER_ROWS", "50000"))     # 이하면 CSV 를 다 만든 뒤 전송 (오류는 HTTP 상태로)
+
+# ✅ 최근 이력 ring buffer (app/domain/timeseries.py) - 장치당 샘플 수 상한
+HISTORY_CAPACITY = int(os.getenv("HISTORY_CAPACITY", "720"))     # 5초 주기 기준 1시간
+
+# =========================
+# WebSocket fan-out
+# =========================
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "256"))            # 클라이언트별 송신 큐 상한
+WS_SLOW_POLICY = os.getenv("WS_SLOW_POLICY", "drop_oldest")       # drop_oldest | disconnect
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))       # send 1건이 이보다 오래 걸리면 끊음
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "10000"))        # MQTT 스레드 -> 루프 대기 상한
+WS_AUTH_REQUIRED = os.getenv("WS_AUTH_REQUIRED", "1") == "1"      # handshake 에서 JWT 검증 (?token= 또는 Authorization)
+
+# =========================
+# Device cache snapshot (warm restart)
+# =========================
+SNAPSHOT_PATH = os.getenv(
+    "SNAPSHOT_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "devices.snap")),
+)
+SNAPSHOT_SEC = float(os.getenv("SNAPSHOT_SEC", "60"))               # 0 이면 끔
+
+# =========================
+# Startup / readiness (/healthz, /readyz)
+# =========================
+# ✅ /readyz 가 200 이 되려면 ready 여야 하는 서브시스템 (users, snapshot, influx, mqtt, ipc)
+READY_REQUIRE = [s.strip() for s in os.getenv("READY_REQUIRE", "users,snapshot").split(",") if s.strip()]
+CONNECT_RETRY_MAX_SEC = float(os.getenv("CONNECT_RETRY_MAX_SEC", "30"))   # Influx 백그라운드 연결 backoff 상한 (MQTT 는 MQTT_RECONNECT_*)
+
 # =========================
 # Device online window
 # =========================
@@ -0,0 +1,49 @@
+# app/core/health.py
+"""
+✅ 서브시스템 상태 (/healthz, /readyz)
+
+- 각 서비스가 상태가 바뀔 때만 set_state(name, state, detail) 호출 -> 조회는 dict 복사
+- state: disabled | starting | connecting | ready | error
+  disabled = 설정 안 됨 / 이 역할에서 안 씀 (readiness 에서는 ready 취급)
+- readiness 에 필요한 서브시스템은 READY_REQUIRE (기본 users,snapshot)
+  Influx/MQTT 는 백그라운드에서 재시도하며 붙고, 붙기 전에도 API 는 캐시/스냅샷으로 응답 가능
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import READY_REQUIRE
+
+READY_STATES = ("ready", "disabled")
+
+_lock = threading.Lock()
+_states: Dict[str, dict] = {}
+_started = time.time()
+
+
+def set_state(name: str, state: str, detail: Optional[str] = None) -> None:
+    with _lock:
+        prev = _states.get(name)
+        if prev and prev["state"] == state and prev["detail"] == detail:
+            return
+        _states[name] = {"state": state, "detail": detail, "since": time.time()}
+
+
+def get_state(name: str) -> Optional[str]:
+    st = _states.get(name)
+    return st["state"] if st else None
+
+
+def snapshot() -> Dict[str, dict]:
+    with _lock:
+        return {k: dict(v) for k, v in _states.items()}
+
+
+def readiness() -> Tuple[bool, List[str]]:
+    """-> (ready, 아직 준비 안 된 필수 서브시스템 이름)"""
+    waiting = [name for name in READY_REQUIRE if get_state(name) not in READY_STATES]
+    return not waiting, waiting
+
+
+def uptime() -> float:
+    return time.time() - _started
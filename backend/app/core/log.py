@@ -0,0 +1,142 @@
+# app/core/log.py
+"""
+✅ 로깅 (print 대체)
+
+- setup_logging(): "app" 로거 -> QueueHandler -> (별도 스레드) QueueListener -> stdout
+  수신/WS 경로에서는 큐에 넣기만 하므로 stdout 쓰기 비용이 없음.
+  큐가 가득 차면 블로킹하지 않고 버림 (dropped 카운트)
+- LOG_LEVEL   : DEBUG / INFO / WARNING / ERROR
+- LOG_FORMAT  : text | json   (json 이면 extra= 로 넘긴 필드도 같이 출력)
+- TopicSampler: topic(장치) 별 N 건 중 1 건만 debug 로그
+- log_limited : 같은 key 의 에러는 interval 마다 1 건 + 그 사이 생략 건수
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_MAX, LOG_SAMPLE_EVERY, LOG_ERROR_INTERVAL
+
+# LogRecord 기본 속성 (json 에서 extra 필드만 골라내기 위함)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED and not k.startswith("_"):
+                out[k] = v
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 버림 (호출 스레드를 절대 막지 않음)"""
+
+    def __init__(self, q: "queue.Queue") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    global _listener, _handler
+    if _listener:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_MAX))
+    _listener = logging.handlers.QueueListener(_handler.queue, stream, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger("app")
+    root.handlers[:] = [_handler]
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    root.propagate = False
+
+
+def shutdown_logging() -> None:
+    global _listener
+    if _listener:
+        _listener.stop()  # 남은 레코드 flush
+    _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """app.* 네임스페이스 로거 (setup_logging 전에도 사용 가능)"""
+    return logging.getLogger(name if name.startswith("app") else f"app.{name}")
+
+
+def dropped_count() -> int:
+    return _handler.dropped if _handler else 0
+
+
+# =========================================================
+# sampling / rate limit
+# =========================================================
+class TopicSampler:
+    """topic 의 장치 단위(앞 4 segment) 별로 every 건마다 1 건 True"""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY) -> None:
+        self.every = max(1, int(every))
+        self._counts: Dict[str, int] = {}
+
+    def sample(self, topic: str) -> bool:
+        if self.every == 1:
+            return True
+        key = "/".join(topic.split("/", 4)[:4])
+        n = self._counts.get(key, 0)
+        self._counts[key] = n + 1
+        return n % self.every == 0
+
+
+_limits: Dict[str, Tuple[float, int]] = {}
+_limits_lock = threading.Lock()
+
+
+def log_limited(
+    logger: logging.Logger,
+    key: str,
+    msg: str,
+    *args,
+    level: int = logging.ERROR,
+    interval: float = LOG_ERROR_INTERVAL,
+    **kwargs,
+) -> bool:
+    """같은 key 는 interval 초에 1 번만 기록, 생략된 건수는 다음 로그에 붙임"""
+    now = time.monotonic()
+    with _limits_lock:
+        last, suppressed = _limits.get(key, (0.0, 0))
+        if last and now - last < interval:
+            _limits[key] = (last, suppressed + 1)
+            return False
+        _limits[key] = (now, 0)
+    if suppressed:
+        msg = f"{msg} (+{suppressed} suppressed)"
+    logger.log(level, msg, *args, **kwargs)
+    return True
@@ -0,0 +1,203 @@
+# app/core/metrics.py
+"""
+✅ Prometheus text format 메트릭 (외부 의존성 없음)
+
+- Counter / Histogram 은 스레드별 저장소(threading.local)에 기록 -> 메시지마다 전역 lock 없음
+  (스레드가 처음 기록할 때만 lock 을 잡고 등록, /metrics 수집 시 스레드별 값을 합산)
+- GaugeFunc / CounterFunc 는 /metrics 요청 시 콜백으로 읽음 (ws_manager.count() 등 기존 stats 재사용)
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+# 초 단위 기본 버킷 (normalize 는 수십 us, Influx write 는 수백 ms 까지)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        with _registry_lock:
+            _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += self.samples()
+        return "\n".join(lines)
+
+
+class _PerThread:
+    """스레드마다 dict 1개. 등록할 때만 lock."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._all: List[dict] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        d = getattr(self._local, "d", None)
+        if d is None:
+            d = self._local.d = {}
+            with self._lock:
+                self._all.append(d)
+        return d
+
+    def shards(self) -> List[dict]:
+        with self._lock:
+            return list(self._all)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._data = _PerThread()
+
+    def inc(self, *labelvalues: str, n: float = 1) -> None:
+        d = self._data.get()
+        d[labelvalues] = d.get(labelvalues, 0) + n
+
+    def values(self) -> Dict[LabelValues, float]:
+        out: Dict[LabelValues, float] = {}
+        for shard in self._data.shards():
+            for k, v in list(shard.items()):
+                out[k] = out.get(k, 0) + v
+        return out
+
+    def samples(self) -> List[str]:
+        values = self.values()
+        if not values and not self.labelnames:
+            values = {(): 0}
+        return [
+            f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}"
+            for k, v in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._data = _PerThread()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        d = self._data.get()
+        st = d.get(labelvalues)
+        if st is None:
+            # [버킷별 count (마지막 = +Inf), sum, count]
+            st = d[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        st[0][bisect_left(self.buckets, value)] += 1
+        st[1] += value
+        st[2] += 1
+
+    def samples(self) -> List[str]:
+        merged: Dict[LabelValues, list] = {}
+        for shard in self._data.shards():
+            for k, st in list(shard.items()):
+                m = merged.get(k)
+                if m is None:
+                    m = merged[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                m[0] = [a + b for a, b in zip(m[0], st[0])]
+                m[1] += st[1]
+                m[2] += st[2]
+
+        lines = []
+        for k, (counts, total, n) in sorted(merged.items()):
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_label = 'le="%s"' % _fmt(le)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, k, le_label)} {acc}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, k)} {n}")
+        return lines
+
+
+Value = Union[float, Dict[LabelValues, float]]
+
+
+class GaugeFunc(_Metric):
+    """수집 시점에 fn() 호출. 숫자 1개 또는 {label tuple: 값}"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Value], labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            v = self.fn()
+        except Exception:
+            return []
+        if isinstance(v, dict):
+            return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(x)}" for k, x in sorted(v.items())]
+        return [f"{self.name} {_fmt(v)}"]
+
+
+class CounterFunc(GaugeFunc):
+    """이미 누적 카운터가 있는 곳 (ws_manager.dropped 등)"""
+    type = "counter"
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# =========================================================
+# 공용 메트릭 (계측 지점에서 import 해서 사용)
+# =========================================================
+MQTT_MESSAGES = Counter("monitor_mqtt_messages_total", "MQTT messages received", ("prefix",))
+MQTT_PARSE_FAILURES = Counter("monitor_mqtt_parse_failures_total", "MQTT payloads that were not valid JSON objects")
+NORMALIZE_SECONDS = Histogram("monitor_normalize_seconds", "Payload normalization latency")
+
+INFLUX_BATCH_POINTS = Histogram("monitor_influx_batch_points", "Points per Influx write batch", SIZE_BUCKETS)
+INFLUX_WRITE_SECONDS = Histogram("monitor_influx_write_seconds", "Influx batch write latency")
+INFLUX_WRITE_FAILURES = Counter("monitor_influx_write_failures_total", "Influx batches (or parts) lost after retries and spooling")
+
+WS_BROADCAST_SECONDS = Histogram("monitor_ws_broadcast_seconds", "Time to route one telemetry event to client queues")
+
+HTTP_DEVICES_SECONDS = Histogram("monitor_http_devices_seconds", "/api/devices response time")
@@ -2,57 +2,407 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Set, Tuple
+import asyncio
+import threading
 import time
+import uuid
 
-from .config import JWT_SECRET, JWT_ALG, JWT_EXPIRE_MIN
+from .config import (
+    JWT_SECRET, JWT_ALG, JWT_EXPIRE_MIN, AUTH_TOKEN_CACHE_MAX, AUTH_REVOKE_SYNC_SEC,
+    AUTH_SEED_USERS, AUTH_PBKDF2_ROUNDS, AUTH_HASH_WORKERS, AUTH_HASH_QUEUE,
+    AUTH_LOGIN_MAX_FAILS, AUTH_LOGIN_LOCK_SEC,
+)
+from app.core.log import get_logger, log_limited
+from app.core.health import set_state
+from app.domain.user_store import get_user_store, list_seed_users
+from app.services.query_cache import TTLLRUCache
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+log = get_logger(__name__)
+
+_pwd_context = None
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-# ✅ 임시 유저(테스트용) : 나중에 SQLite 붙이면 여기만 DB로 교체
-_fake_users = {
-    "admin@local": {
-        "id": 1,
-        "email": "admin@local",
-        "password_hash": pwd_context.hash("admin1234"),
-        "role": "admin",
-        "is_active": True,
-    },
-    "user@local": {
-        "id": 2,
-        "email": "user@local",
-        "password_hash": pwd_context.hash("user1234"),
-        "role": "user",
-        "is_active": True,
-    },
-}
+# ✅ jose / passlib 은 import 비용이 커서 (cryptography backend 포함) 처음 쓸 때 import
+def _jose():
+    from jose import jwt, JWTError
+    return jwt, JWTError
+
+def pwd_context():
+    # ✅ hash 비용은 env 로 조정 (기존 hash 는 그대로 검증, 로그인 성공 시 새 비용으로 재hash)
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(
+            schemes=["pbkdf2_sha256"],
+            deprecated="auto",
+            pbkdf2_sha256__default_rounds=AUTH_PBKDF2_ROUNDS,
+        )
+    return _pwd_context
 
 def create_access_token(payload: dict) -> str:
     to_encode = payload.copy()
-    exp = int(time.time()) + (JWT_EXPIRE_MIN * 60)
-    to_encode.update({"exp": exp})
+    now = int(time.time())
+    exp = now + (JWT_EXPIRE_MIN * 60)
+    # ✅ jti: 토큰 1개 폐기용 / iat: 사용자 전체 세션 폐기 기준
+    to_encode.update({"exp": exp, "iat": now, "jti": uuid.uuid4().hex})
+    jwt, _ = _jose()
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALG)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+
+# =========================================================
+# ✅ 검증 끝난 token 캐시 + 폐기(revocation)
+# - 서명 검증(jwt.decode)은 token 수명 동안 1번: 이후 요청은 LRU 조회 + 폐기 확인만
+# - 캐시 TTL = exp 까지 남은 시간 -> 만료된 token 은 캐시에서 사라지고 다시 decode 하면 401
+# - 폐기 목록은 사용자 저장소(users.db 의 revocations)에 기록 -> 모든 worker 가 공유
+#   요청마다 DB 를 보지 않고 AUTH_REVOKE_SYNC_SEC 마다 새 행만 읽어 메모리 표에 반영
+#   (폐기한 프로세스는 즉시, 다른 worker 는 최대 AUTH_REVOKE_SYNC_SEC 뒤부터 거절)
+# - jti 는 token exp 까지, 사용자 폐기는 기준 시각 + JWT 수명까지만 보관 (지나면 DB/메모리에서 정리)
+# =========================================================
+_token_cache = TTLLRUCache(max(1, AUTH_TOKEN_CACHE_MAX))
+_revoked_jti = {}          # jti -> exp
+_revoked_before = {}       # sub -> (이 시각 이전(iat)에 발급된 token 은 무효, 보관 만료 시각)
+_revoke_lock = threading.Lock()
+_revoke_seen = 0           # 마지막으로 반영한 revocations id
+_revoke_synced = 0.0       # 마지막 동기화 (monotonic)
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+def _is_revoked(payload: dict) -> bool:
+    jti = payload.get("jti")
+    if jti and jti in _revoked_jti:
+        return True
+    before = _revoked_before.get(payload.get("sub"))
+    return before is not None and int(payload.get("iat") or 0) < before[0]
+
+def _apply_revocation(jti: Optional[str], sub: Optional[str], before: int, expires: float) -> None:
+    """lock 안에서만"""
+    if jti:
+        _revoked_jti[jti] = expires
+    if sub:
+        cur = _revoked_before.get(sub)
+        if cur is None or before > cur[0]:
+            _revoked_before[sub] = (before, expires)
+
+def _prune_revocations(now: float) -> None:
+    """lock 안에서만: 보관 기간이 지난 항목 (그 전에 발급된 token 은 이미 만료)"""
+    for k in [k for k, exp in _revoked_jti.items() if exp <= now]:
+        del _revoked_jti[k]
+    for k in [k for k, v in _revoked_before.items() if v[1] <= now]:
+        del _revoked_before[k]
+
+def _sync_revocations(now: float) -> None:
+    """다른 worker 가 기록한 폐기를 반영 (AUTH_REVOKE_SYNC_SEC 에 1번, 동기화 중이면 기다리지 않음)"""
+    global _revoke_seen, _revoke_synced
+    t = time.monotonic()
+    if t - _revoke_synced < AUTH_REVOKE_SYNC_SEC or not _revoke_lock.acquire(blocking=False):
+        return
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-        sub = payload.get("sub")
-        if not sub:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return payload
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        _revoke_synced = t
+        rows = get_user_store().revocations_since(_revoke_seen, now)
+        for rid, jti, sub, before, expires in rows:
+            _apply_revocation(jti, sub, before, expires)
+            _revoke_seen = max(_revoke_seen, rid)
+        _prune_revocations(now)
+    except Exception as e:
+        log_limited(log, "revoke-sync", "❌ revocation sync failed: %r", e)
+    finally:
+        _revoke_lock.release()
+
+def verify_token(token: str) -> dict:
+    """서명 + exp + 폐기 확인 -> payload (공유 dict 이므로 읽기 전용으로 사용)"""
+    now = time.time()
+    payload = _token_cache.get(token) if AUTH_TOKEN_CACHE_MAX > 0 else None
+    if payload is None:
+        jwt, JWTError = _jose()
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        except JWTError:
+            raise _unauthorized()
+        if not payload.get("sub"):
+            raise _unauthorized()
+        exp = payload.get("exp")
+        if AUTH_TOKEN_CACHE_MAX > 0 and exp:
+            _token_cache.set(token, payload, float(exp) - now)
+    elif float(payload.get("exp") or now + 1) <= now:
+        raise _unauthorized()   # 캐시 TTL 경계 (monotonic vs wall clock 차이)
+    _sync_revocations(now)
+    if (_revoked_jti or _revoked_before) and _is_revoked(payload):
+        raise _unauthorized()
+    return payload
+
+def _revoke(jti: Optional[str], sub: Optional[str], before: int, expires: float) -> None:
+    """저장소에 기록 (다른 worker 용) + 이 프로세스에는 바로 반영"""
+    now = time.time()
+    get_user_store().add_revocation(jti, sub, before, expires, now)
+    with _revoke_lock:
+        _apply_revocation(jti, sub, before, expires)
+        _prune_revocations(now)
+
+def revoke_token(payload: dict) -> None:
+    """로그아웃: 이 token(jti) 만 폐기"""
+    jti = payload.get("jti")
+    if not jti:
+        return
+    _revoke(jti, None, 0, float(payload.get("exp") or time.time()))
+
+def revoke_user(sub: str) -> None:
+    """비밀번호 변경 / 계정 정지: 지금까지 발급된 sub 의 token 전부 폐기
+    (iat 가 초 단위라 같은 초에 새로 발급된 token 도 무효 -> 1초 뒤 다시 로그인)"""
+    before = int(time.time()) + 1
+    _revoke(None, str(sub), before, before + JWT_EXPIRE_MIN * 60)
+
+def get_token_cache_stats() -> dict:
+    return {**_token_cache.stats(), "revoked_tokens": len(_revoked_jti), "revoked_users": len(_revoked_before)}
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    return verify_token(token)
+
+def user_scope(payload: dict):
+    """token 의 sites / devices claim -> (sites, devices). admin 이거나 claim 이 없으면 None (전체)"""
+    if payload.get("role") == "admin":
+        return None
+    sites = payload.get("sites")
+    devices = payload.get("devices")
+    if sites is None and devices is None:
+        return None
+    return list(sites or []), list(devices or [])
+
+def scope_allows_key(scope, key: str) -> bool:
+    """key(country/site_id/model/device_id) 가 user_scope 결과 안인지 (WS scope_patterns 와 같은 규칙)"""
+    if scope is None:
+        return True
+    sites, devices = scope
+    parts = key.split("/")
+    if len(parts) != 4:
+        return False
+    return parts[1] in sites or key in devices or parts[3] in devices
+
+def scoped_keys(user: dict) -> Optional[Set[str]]:
+    """REST 목록용: 볼 수 있는 장치 key (범위 제한이 없으면 None = 전체)"""
+    scope = user_scope(user)
+    if scope is None:
+        return None
+    from app.domain.device_store import registry
+    return registry.scope_keys(*scope)
+
+def require_device_scope(user: dict, device: str) -> str:
+    """
+    REST device 파라미터 범위 확인 -> Influx 조회에 쓸 device (범위 밖이면 403)
+    device_id 만 온 경우: scope 에 그 device_id 가 있으면 그대로,
+    아니면 registry 에서 범위 안 key 하나로 확정 (다른 site 의 같은 device_id 까지 조회되지 않게)
+    """
+    scope = user_scope(user)
+    device = (device or "").strip()
+    if scope is None or not device:
+        return device
+    if device.count("/") == 3:
+        if scope_allows_key(scope, device):
+            return device
+    elif device in scope[1]:
+        return device
+    else:
+        from app.domain.device_store import registry
+        keys = registry.scope_keys((), [device])
+        if len(keys) == 1:
+            key = next(iter(keys))
+            if scope_allows_key(scope, key):
+                return key
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="device out of scope")
+
+def require_site_scope(user: dict, site_id: str) -> Optional[Set[str]]:
+    """
+    site 범위 확인 -> 그 site 에서 볼 수 있는 key (None = 제한 없음)
+    site 가 scope 에 없고 장치 단위 권한도 그 site 에 하나도 없으면 403
+    """
+    scope = user_scope(user)
+    if scope is None or not site_id:
+        return None
+    from app.domain.device_store import registry
+    site_keys = registry.scope_keys([site_id], ())
+    if site_id in scope[0]:
+        return site_keys
+    allowed = {k for k in site_keys if scope_allows_key(scope, k)}
+    if not allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="site out of scope")
+    return allowed
 
 class LoginRequest(BaseModel):
     email: str
     password: str
 
-def authenticate(email: str, password: str) -> dict:
-    user = _fake_users.get(email)
+
+# =========================================================
+# ✅ 로그인: 전용 bounded executor + 계정별 잠금
+# - pbkdf2 검증(수십 ms CPU)은 AUTH_HASH_WORKERS 스레드에서만 -> 로그인 폭주가 API threadpool 을 막지 않음
+#   (hashlib.pbkdf2_hmac 는 GIL 을 놓으므로 스레드로 병렬 처리됨)
+# - 대기 포함 AUTH_HASH_QUEUE 를 넘으면 바로 503 (무한정 쌓지 않음)
+# - 계정별 연속 실패 AUTH_LOGIN_MAX_FAILS 회 -> AUTH_LOGIN_LOCK_SEC 잠금 (반복 시 2배, 최대 15분)
+#   잠긴 동안은 hash 계산 없이 429
+# - 없는 계정도 dummy hash 로 같은 비용을 써서 응답 시간으로 계정 존재 여부가 드러나지 않게
+# =========================================================
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_slots = threading.BoundedSemaphore(max(1, AUTH_HASH_WORKERS + AUTH_HASH_QUEUE))
+_dummy_hash: Optional[str] = None
+_LOCK_MAX_SEC = 900.0
+
+
+class LoginLimiter:
+    def __init__(self, max_fails: int = AUTH_LOGIN_MAX_FAILS, lock_sec: float = AUTH_LOGIN_LOCK_SEC) -> None:
+        self.max_fails = max(1, int(max_fails))
+        self.lock_sec = float(lock_sec)
+        self._state: Dict[str, list] = {}   # email -> [연속 실패 수, 잠금 해제 시각, 잠금 횟수]
+        self._lock = threading.Lock()
+        self.locked_out = 0
+
+    def retry_after(self, email: str, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        st = self._state.get(email)
+        if not st or st[1] <= now:
+            return 0.0
+        return st[1] - now
+
+    def failure(self, email: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self._state.setdefault(email, [0, 0.0, 0])
+            st[0] += 1
+            if st[0] >= self.max_fails:
+                st[0] = 0
+                st[2] += 1
+                st[1] = now + min(_LOCK_MAX_SEC, self.lock_sec * (2 ** (st[2] - 1)))
+                self.locked_out += 1
+            if len(self._state) > 100_000:
+                # 오래된 항목 정리 (잠금이 끝났고 실패 기록만 남은 계정)
+                for k in [k for k, v in self._state.items() if v[1] <= now and k != email]:
+                    del self._state[k]
+
+    def success(self, email: str) -> None:
+        with self._lock:
+            self._state.pop(email, None)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {
+                "tracked": len(self._state),
+                "locked": sum(1 for v in self._state.values() if v[1] > now),
+                "locked_out_total": self.locked_out,
+            }
+
+
+login_limiter = LoginLimiter()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=max(1, AUTH_HASH_WORKERS), thread_name_prefix="pwd-hash")
+    return _hash_pool
+
+
+def hash_password(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def _seed_users(store) -> None:
+    """hash 스레드에서 실행: 없는 seed 계정만 생성 (다른 worker 가 먼저 넣었으면 건너뜀)"""
+    try:
+        n = 0
+        for u in list_seed_users():
+            if store.get_by_email(u["email"]) is None:
+                n += store.create_if_absent(u["email"], hash_password(u["password"]), u["role"])
+        log.info("✅ user store seeded (%d users)", n)
+        set_state("users", "ready")
+    except Exception as e:
+        log.error("❌ user seed failed: %r", e)
+        set_state("users", "error", repr(e))
+
+
+def init_user_store() -> Optional[Future]:
+    """
+    startup 에서 호출: 저장소 생성 + (비어 있으면) 기본 계정 seed. import 시점 hash 없음
+    seed hash (수십 ms x 계정 수) 는 hash 스레드에서 -> startup / 이벤트 루프를 막지 않음 (끝나면 users = ready)
+    """
+    store = get_user_store()
+    if AUTH_SEED_USERS and store.count() == 0:
+        set_state("users", "starting", "seeding")
+        return _pool().submit(_seed_users, store)
+    set_state("users", "ready")
+    return None
+
+
+def _verify(email: str, password: str) -> Tuple[Optional[dict], bool]:
+    """hash 스레드에서 실행: (user, ok). 비용 파라미터가 바뀐 hash 는 여기서 재hash"""
+    global _dummy_hash
+    store = get_user_store()
+    user = store.get_by_email(email)
+    if not user:
+        if _dummy_hash is None:
+            _dummy_hash = pwd_context().hash(uuid.uuid4().hex)
+        pwd_context().verify(password, _dummy_hash)
+        return None, False
+    ok, new_hash = pwd_context().verify_and_update(password, user["password_hash"])
+    if ok and new_hash:
+        store.set_password_hash(user["id"], new_hash)
+    return user, ok
+
+
+async def authenticate(email: str, password: str) -> dict:
+    key = (email or "").strip().lower()
+    wait = login_limiter.retry_after(key)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed logins, try again later",
+            headers={"Retry-After": str(int(wait) + 1)},
+        )
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Login busy, try again")
+    try:
+        user, ok = await asyncio.get_running_loop().run_in_executor(_pool(), _verify, key, password)
+    finally:
+        _hash_slots.release()
+
     if not user or not user.get("is_active", True):
+        login_limiter.failure(key)
         raise HTTPException(status_code=401, detail="Invalid email or inactive user")
-    if not pwd_context.verify(password, user["password_hash"]):
+    if not ok:
+        login_limiter.failure(key)
         raise HTTPException(status_code=401, detail="Invalid password")
-    return user
\ No newline at end of file
+    login_limiter.success(key)
+    return user
+
+
+async def change_password(user: dict, old_password: str, new_password: str) -> None:
+    """현재 비밀번호 확인 -> 새 hash 저장 -> 기존 token 전부 폐기 (다시 로그인)"""
+    found = await authenticate(user.get("email") or "", old_password)
+    if str(found["id"]) != str(user.get("sub")):
+        raise _unauthorized()
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Login busy, try again")
+    try:
+        new_hash = await asyncio.get_running_loop().run_in_executor(_pool(), hash_password, new_password)
+    finally:
+        _hash_slots.release()
+    get_user_store().set_password_hash(found["id"], new_hash)
+    revoke_user(str(found["id"]))
+
+
+def set_user_active(user_id: int, active: bool) -> None:
+    """계정 정지 시 이미 발급된 token 도 바로 무효"""
+    store = get_user_store()
+    if store.get_by_id(user_id) is None:
+        raise HTTPException(status_code=404, detail="user not found")
+    store.set_active(user_id, active)
+    if not active:
+        revoke_user(str(user_id))
+
+
+def shutdown_auth() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False)
+    _hash_pool = None
\ No newline at end of file
@@ -0,0 +1,286 @@
+# app/domain/device_registry.py
+"""
+✅ 장치 레지스트리 (key -> 최신 TelemetryRecord)
+
+- 보조 인덱스: site_id / model / country / device_id -> key set (device_id 는 사용자 범위 확인용)
+  (key 자체가 country/site_id/model/device_id 라서 장치가 생길 때 1번만 등록)
+- last_seen 순서: OrderedDict 를 항상 (ts, key) 오름차순으로 유지 -> 역순 순회 = last_seen 내림차순
+  ingest shard 가 여러 스레드라 도착 순서 != ts 순서일 수 있음
+  put: move_to_end 후 끝쪽에서 자기보다 새 record 만 다시 뒤로 보냄 (보통 0개, 늦게 온 만큼만)
+  put_many(스냅샷): 넣은 뒤 순서가 깨졌으면 한 번 전체 정렬
+- query(): 필터는 인덱스 교집합, 페이지는 cursor (last_seen, key) 기준
+  필터 없으면 최신부터 limit 개만 보고 멈춤 / 필터 있으면 후보만 nlargest -> 전체 정렬 없음
+- version: put 마다 +1 (장치별 version 도 기록) -> ETag / ?since=<version> 변경분 조회
+  _versions 는 갱신 순서(= version 순서) OrderedDict -> since 조회는 끝에서 since 까지만 모아서 후보로 사용
+  worker replica 는 ingest 가 붙인 seq 를 version 으로 받음 (put(rec, version=seq))
+  -> 모든 worker 가 같은 version / ETag / since 기준을 씀
+"""
+import base64
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+INDEX_FIELDS = ("site_id", "model", "country", "device_id")
+
+
+def encode_cursor(ts: float, key: str) -> str:
+    return base64.urlsafe_b64encode(f"{ts!r}|{key}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[float, str]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, key = raw.split("|", 1)
+        return float(ts), key
+    except Exception:
+        return None
+
+
+class DeviceRegistry:
+    def __init__(self) -> None:
+        self._records: "OrderedDict[str, object]" = OrderedDict()
+        self._index: Dict[str, Dict[str, Set[str]]] = {f: {} for f in INDEX_FIELDS}
+        self._lock = threading.Lock()
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self.version = 0
+
+    # -----------------------------
+    # write (ingest)
+    # -----------------------------
+    def put(self, rec, version: Optional[int] = None) -> None:
+        """version: 밖에서 정한 번호 (IPC seq, 단조 증가), 없으면 +1"""
+        key = rec.key
+        with self._lock:
+            if key not in self._records:
+                meta = rec.meta
+                for f in INDEX_FIELDS:
+                    self._index[f].setdefault(str(meta.get(f)), set()).add(key)
+            self._records[key] = rec
+            self._records.move_to_end(key)
+            self._reorder_tail(rec)
+            self.version = self.version + 1 if version is None else max(self.version, version)
+            self._versions[key] = self.version
+            self._versions.move_to_end(key)
+
+    def put_many(self, recs) -> int:
+        """
+        스냅샷 복원용: lock 1번. 이미 더 새 record 가 있으면 건너뜀
+        live 수신과 동시에 불려도 됨 (더 오래된 record 가 끝에 붙으면 마지막에 (ts, key) 로 한 번 재정렬)
+        """
+        n = 0
+        unordered = False
+        with self._lock:
+            records, index, versions = self._records, self._index, self._versions
+            for rec in recs:
+                key = rec.key
+                cur = records.get(key)
+                if cur is not None:
+                    if cur.ts >= rec.ts:
+                        continue
+                else:
+                    meta = rec.meta
+                    for f in INDEX_FIELDS:
+                        index[f].setdefault(str(meta.get(f)), set()).add(key)
+                if not unordered and records:
+                    last = records[next(reversed(records))]
+                    unordered = (last.ts, last.key) > (rec.ts, key)
+                records[key] = rec
+                records.move_to_end(key)
+                self.version += 1
+                versions[key] = self.version
+                versions.move_to_end(key)
+                n += 1
+            if unordered:
+                ordered = sorted(records.values(), key=lambda r: (r.ts, r.key))
+                self._records = OrderedDict((r.key, r) for r in ordered)
+        return n
+
+    def _reorder_tail(self, rec) -> None:
+        """lock 안에서만: 방금 끝으로 보낸 rec 보다 (ts, key) 가 큰 record 들을 다시 뒤로 (늦게 도착한 경우)"""
+        records = self._records
+        pos = (rec.ts, rec.key)
+        newer = []
+        it = reversed(records.values())
+        next(it)  # rec 자신
+        for r in it:
+            if (r.ts, r.key) <= pos:
+                break
+            newer.append(r.key)
+        for k in reversed(newer):
+            records.move_to_end(k)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            rec = self._records.pop(key, None)
+            if rec is None:
+                return
+            self._versions.pop(key, None)
+            self.version += 1
+            for f in INDEX_FIELDS:
+                keys = self._index[f].get(str(rec.meta.get(f)))
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[f][str(rec.meta.get(f))]
+
+    # -----------------------------
+    # dict 호환 (get / in / len / items 로 읽는 곳)
+    # -----------------------------
+    def get(self, key: str, default=None):
+        return self._records.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self._records[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def values(self) -> List:
+        with self._lock:
+            return list(self._records.values())
+
+    def items(self) -> List[Tuple[str, object]]:
+        with self._lock:
+            return list(self._records.items())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._records)
+
+    # -----------------------------
+    # query
+    # -----------------------------
+    def version_of(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def counts(self, field: str) -> Dict[str, int]:
+        """site_id / model / country 별 장치 수"""
+        with self._lock:
+            return {v: len(keys) for v, keys in self._index[field].items()}
+
+    def scope_keys(self, sites, devices) -> Set[str]:
+        """사용자 범위 (site_id 목록, key 또는 device_id 목록) -> 지금 registry 에 있는 key"""
+        out: Set[str] = set()
+        with self._lock:
+            for site in sites or ():
+                out |= self._index["site_id"].get(str(site), set())
+            for dev in devices or ():
+                dev = str(dev)
+                if dev.count("/") == 3:
+                    if dev in self._records:
+                        out.add(dev)
+                else:
+                    out |= self._index["device_id"].get(dev, set())
+        return out
+
+    def _candidates(self, filters: Dict[str, str]) -> Optional[Set[str]]:
+        sets = []
+        for f, v in filters.items():
+            keys = self._index[f].get(str(v))
+            if not keys:
+                return set()
+            sets.append(keys)
+        if not sets:
+            return None
+        sets.sort(key=len)
+        out = set(sets[0])
+        for s in sets[1:]:
+            out &= s
+        return out
+
+    def query(
+        self,
+        filters: Optional[Dict[str, str]] = None,
+        min_ts: Optional[float] = None,
+        max_ts: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        since: Optional[int] = None,
+        keys: Optional[Set[str]] = None,
+        exclude_keys: Optional[Set[str]] = None,
+        scope: Optional[Set[str]] = None,
+    ) -> Tuple[List, Optional[str], int]:
+        """-> (records 최신순, next_cursor, 필터 조건에 맞는 전체 수(min/max_ts, keys 제외))
+        min_ts / max_ts: last_seen 범위
+        since: 이 version 이후 갱신된 장치만
+        keys / exclude_keys: 이 key 들만 / 이 key 들은 빼고 (online / offline 필터)
+        scope: 사용자가 볼 수 있는 key (전체 수에도 적용)"""
+        filters = {k: v for k, v in (filters or {}).items() if k in INDEX_FIELDS and v}
+        after = decode_cursor(cursor) if cursor else None
+
+        def ok(rec) -> bool:
+            if min_ts is not None and rec.ts < min_ts:
+                return False
+            if max_ts is not None and rec.ts >= max_ts:
+                return False
+            if after is not None and (rec.ts, rec.key) >= after:
+                return False
+            if since is not None and versions[rec.key] <= since:
+                return False
+            if exclude_keys is not None and rec.key in exclude_keys:
+                return False
+            return True
+
+        with self._lock:
+            versions = self._versions
+            cand = self._candidates(filters)
+            if scope is not None:
+                cand = set(scope) if cand is None else cand & scope
+            if since is not None:
+                # 갱신 순서 역순으로 since 까지만 -> 변경된 장치만 후보
+                changed = set()
+                for key in reversed(versions):
+                    if versions[key] <= since:
+                        break
+                    changed.add(key)
+                total = len(cand) if cand is not None else len(self._records)
+                cand = changed if cand is None else cand & changed
+            else:
+                total = None
+            if keys is not None:
+                if total is None:
+                    total = len(cand) if cand is not None else len(self._records)
+                cand = set(keys) if cand is None else cand & keys
+            if cand is None:
+                total = len(self._records)
+                out = []
+                for rec in self._iter_newest():
+                    if min_ts is not None and rec.ts < min_ts:
+                        break  # (ts, key) 순서라 이후는 전부 더 오래됨
+                    if ok(rec):
+                        out.append(rec)
+                        if limit is not None and len(out) > limit:
+                            break
+            else:
+                if total is None:
+                    total = len(cand)
+                recs = [r for r in (self._records[k] for k in cand) if ok(r)]
+                order = lambda r: (r.ts, r.key)
+                if limit is not None:
+                    out = heapq.nlargest(limit + 1, recs, key=order)
+                else:
+                    out = sorted(recs, key=order, reverse=True)
+
+        next_cursor = None
+        if limit is not None and len(out) > limit:
+            out = out[:limit]
+            last = out[-1]
+            next_cursor = encode_cursor(last.ts, last.key)
+        return out, next_cursor, total
+
+    def _iter_newest(self) -> Iterator:
+        # lock 안에서만 호출
+        return reversed(self._records.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "devices": len(self._records),
+                "sites": len(self._index["site_id"]),
+                "models": len(self._index["model"]),
+                "countries": len(self._index["country"]),
+            }
@@ -0,0 +1,315 @@
+# app/domain/normalizer.py
+"""
+✅ 선언형 alias 테이블 -> 모델별 normalizer
+
+- 필드별 alias 목록을 테이블로 선언하고, 모델(topic 의 model 세그먼트)별
+  프로필로 alias 를 추가/덮어쓸 수 있음
+- 프로필별로 (필드, 첫 alias, 나머지 alias) 튜플을 한 번 만들어 두고 메시지마다 그 표를 순회
+  (첫 alias 가 있으면 dict.get 1번, 숫자 변환은 float 가 아닐 때만)
+- 채널 표는 term/phase 와 숫자 필드로 나눠 둠 (단일 값 fallback 은 숫자 표만 보고, 숫자는 고르면서 바로 변환)
+- 값 선택 규칙: alias 순서대로 보고 "None 도 빈 문자열도 아닌" 첫 값을 사용
+  (기존 `a or b or c` 체인은 0 / 0.0 / "0" 을 누락으로 취급했음 -> 이제 0 은 정상값)
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# =========================================================
+# alias 테이블 (기본 프로필)
+# =========================================================
+SUMMARY_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "v_l1": ("v_l1", "v1", "vl1"),
+    "v_l2": ("v_l2", "v2", "vl2"),
+    "v_l3": ("v_l3", "v3", "vl3"),
+    "v_avg": ("v_avg", "v", "volt", "voltage"),
+
+    "a_l1": ("a_l1", "a1", "al1"),
+    "a_l2": ("a_l2", "a2", "al2"),
+    "a_l3": ("a_l3", "a3", "al3"),
+    "a_avg": ("a_avg", "a", "amp", "current"),
+
+    "pf_l1": ("pf_l1", "pf1", "pfl1"),
+    "pf_l2": ("pf_l2", "pf2", "pfl2"),
+    "pf_l3": ("pf_l3", "pf3", "pfl3"),
+    "pf_avg": ("pf_avg", "pf", "power_factor"),
+
+    "kw": ("kw", "kW", "p", "power_kw"),
+    "kwh": ("kwh", "kWh", "energy_kwh"),
+}
+
+CHANNEL_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "term": ("term", "io", "side"),
+    "phase": ("phase", "ph"),
+    "v": ("v", "volt", "voltage"),
+    "a": ("a", "amp", "current"),
+    "kw": ("kw", "kW", "p", "power_kw"),
+    "pf": ("pf", "power_factor"),
+}
+
+# ✅ 모델별 프로필: 기본 테이블 위에 alias 를 덮어씀 (topic 의 model 세그먼트 기준)
+#   예) "pg46": {"summary": {"kwh": ("kwh", "kWh", "energy_kwh", "ep_imp")}}
+MODEL_PROFILES: Dict[str, Dict[str, Dict[str, Tuple[str, ...]]]] = {}
+
+_DI_KEYS = tuple((i, f"di{i}") for i in range(1, 17))
+_DI_SET = frozenset(k for _, k in _DI_KEYS)
+_DI_RANGE = tuple(range(1, 17))
+_DI_ON = frozenset(("1", "true", "True", "ON", "on"))
+
+
+# =========================================================
+# typed record
+# =========================================================
+class Summary(NamedTuple):
+    kw: Optional[float]
+    kwh: Optional[float]
+    v_l1: Optional[float]
+    v_l2: Optional[float]
+    v_l3: Optional[float]
+    v_avg: Optional[float]
+    a_l1: Optional[float]
+    a_l2: Optional[float]
+    a_l3: Optional[float]
+    a_avg: Optional[float]
+    pf_l1: Optional[float]
+    pf_l2: Optional[float]
+    pf_l3: Optional[float]
+    pf_avg: Optional[float]
+    di: Optional[Dict[int, Optional[int]]]
+
+    def as_dict(self) -> Dict[str, Any]:
+        kw, kwh, v1, v2, v3, va, a1, a2, a3, aa, pf1, pf2, pf3, pfa, di = self
+        return {
+            "kw": kw,
+            "kwh": kwh,
+
+            "v_l1": v1, "v_l2": v2, "v_l3": v3, "v_avg": va,
+            "a_l1": a1, "a_l2": a2, "a_l3": a3, "a_avg": aa,
+            "pf_l1": pf1, "pf_l2": pf2, "pf_l3": pf3, "pf_avg": pfa,
+
+            "di": di,
+        }
+
+
+class Channel(NamedTuple):
+    term: str
+    phase: Any
+    v: Optional[float]
+    a: Optional[float]
+    kw: Optional[float]
+    pf: Optional[float]
+
+    def as_dict(self) -> Dict[str, Any]:
+        term, phase, v, a, kw, pf = self
+        return {"term": term, "phase": phase, "v": v, "a": a, "kw": kw, "pf": pf}
+
+
+# =========================================================
+# helpers
+# =========================================================
+def to_float(x) -> Optional[float]:
+    if x is None or x.__class__ is float:
+        return x
+    try:
+        return None if x == "" else float(x)
+    except Exception:
+        return None
+
+
+def _avg3(x1, x2, x3) -> Optional[float]:
+    nums = [n for n in (x1, x2, x3) if n is not None]
+    return round(sum(nums) / len(nums), 3) if nums else None
+
+
+def _di_bit(v) -> int:
+    return 1 if v == 1 or str(v) in _DI_ON else 0
+
+
+def _parse_di(p: dict) -> Optional[Dict[int, Optional[int]]]:
+    di_map: Dict[int, Optional[int]] = {}
+    di_obj = p.get("di")
+
+    if isinstance(di_obj, dict):
+        for k, v in di_obj.items():
+            try:
+                i = int(k)
+            except Exception:
+                continue
+            if 1 <= i <= 16:
+                di_map[i] = _di_bit(v)
+
+    if not di_map and isinstance(di_obj, list):
+        for idx, v in enumerate(di_obj[:16], start=1):
+            di_map[idx] = v if v in (0, 1) else None
+
+    for i, k in _DI_KEYS:
+        if k in p:
+            di_map[i] = _di_bit(p[k])
+
+    if not di_map:
+        return None
+    out = dict.fromkeys(_DI_RANGE)
+    out.update(di_map)
+    return out
+
+
+# =========================================================
+# normalizer
+#   alias 테이블 -> (필드, 첫 alias, 나머지 alias) 튜플로 한 번 펼쳐 둠
+#   메시지마다: 첫 alias 를 dict.get 1번 (대부분 여기서 끝) -> 없을 때만 나머지 루프
+# =========================================================
+_new = tuple.__new__
+_SUMMARY_NUM = Summary._fields[:-1]
+_GROUPS = (
+    ("v_l1", "v_l2", "v_l3", "v_avg"),
+    ("a_l1", "a_l2", "a_l3", "a_avg"),
+    ("pf_l1", "pf_l2", "pf_l3", "pf_avg"),
+)
+_CH_NUM = ("v", "a", "kw", "pf")
+
+
+def _table(aliases: Dict[str, Tuple[str, ...]], fields) -> Tuple[Tuple[str, str, Tuple[str, ...]], ...]:
+    return tuple((f, aliases[f][0], tuple(aliases[f][1:])) for f in fields)
+
+
+class Normalizer:
+    """alias 테이블을 한 번 펼쳐 둔 normalizer (모델 프로필 1개당 1개)
+
+    - summary(p) / channels(p)           -> typed record (Summary / Channel)
+    - summary_dict(p) / channel_dicts(p) -> 기존 API 와 같은 dict
+    """
+
+    __slots__ = ("_summary", "_channel", "_term_phase")
+
+    def __init__(
+        self,
+        summary_aliases: Dict[str, Tuple[str, ...]],
+        channel_aliases: Dict[str, Tuple[str, ...]],
+    ) -> None:
+        self._summary = _table(summary_aliases, _SUMMARY_NUM)
+        self._channel = _table(channel_aliases, _CH_NUM)
+        self._term_phase = _table(channel_aliases, ("term", "phase"))
+
+    # -----------------------------
+    # summary
+    # -----------------------------
+    def summary_dict(self, p) -> Dict[str, Any]:
+        if not isinstance(p, dict):
+            p = {}
+        out = _pick_numbers(p.get, self._summary, {})
+        for l1, l2, l3, avg in _GROUPS:
+            x1, x2, x3 = out[l1], out[l2], out[l3]
+            if out[avg] is None:
+                out[avg] = _avg3(x1, x2, x3)
+            elif x1 is None and x2 is None and x3 is None:
+                out[l1] = out[l2] = out[l3] = out[avg]
+        out["di"] = _parse_di(p) if ("di" in p or not _DI_SET.isdisjoint(p)) else None
+        return out
+
+    def summary(self, p) -> Summary:
+        d = self.summary_dict(p)
+        return _new(Summary, [d[f] for f in Summary._fields])
+
+    # -----------------------------
+    # channels
+    # -----------------------------
+    def channel_dicts(self, payload) -> List[Dict[str, Any]]:
+        if not isinstance(payload, dict):
+            return []
+
+        ch = payload.get("channels")
+        if not (isinstance(ch, list) and len(ch) > 0):
+            # ✅ 단일 값 payload fallback (term / phase 는 고정이라 숫자만)
+            d = _pick_numbers(payload.get, self._channel, {})
+            return _single(d["v"], d["a"], d["kw"], d["pf"])
+
+        term_phase, nums = self._term_phase, self._channel
+        out = []
+        for c in ch:
+            if not isinstance(c, dict):
+                continue
+            get = c.get
+            d = _pick(get, term_phase, {})
+            d["term"] = d["term"] or "in"
+            d["phase"] = _phase(d["phase"]) or "L1"
+            out.append(_pick_numbers(get, nums, d))
+        return out
+
+    def channels(self, payload) -> List[Channel]:
+        return [_new(Channel, tuple(d.values())) for d in self.channel_dicts(payload)]
+
+
+def _pick(get, table, out: Dict[str, Any]) -> Dict[str, Any]:
+    """table 의 필드마다 alias 순서대로 None / "" 가 아닌 첫 값 (없으면 None)"""
+    for f, first, rest in table:
+        v = get(first)
+        if v is None or v == "":
+            v = None
+            for alias in rest:
+                x = get(alias)
+                if x is not None and x != "":
+                    v = x
+                    break
+        out[f] = v
+    return out
+
+
+def _pick_numbers(get, table, out: Dict[str, Any]) -> Dict[str, Any]:
+    """_pick + float 변환 (float 가 아닐 때만)"""
+    for f, first, rest in table:
+        v = get(first)
+        if v is None or v == "":
+            v = None
+            for alias in rest:
+                x = get(alias)
+                if x is not None and x != "":
+                    v = x
+                    break
+        if v is not None and v.__class__ is not float:
+            v = to_float(v)
+        out[f] = v
+    return out
+
+
+def _phase(phase):
+    if phase in (1, "1"):
+        return "L1"
+    if phase in (2, "2"):
+        return "L2"
+    if phase in (3, "3"):
+        return "L3"
+    return phase
+
+
+def _single(v, a, kw, pf) -> List[Dict[str, Any]]:
+    if v is None and a is None and kw is None and pf is None:
+        return []
+    return [
+        {"term": "in", "phase": "L1", "v": v, "a": a, "kw": kw, "pf": pf},
+        {"term": "in", "phase": "L2", "v": v, "a": a, "kw": kw, "pf": pf},
+        {"term": "in", "phase": "L3", "v": v, "a": a, "kw": kw, "pf": pf},
+    ]
+
+
+def _build(model: Optional[str]) -> Normalizer:
+    prof = MODEL_PROFILES.get(model or "") or {}
+    summary = {**SUMMARY_ALIASES, **(prof.get("summary") or {})}
+    channel = {**CHANNEL_ALIASES, **(prof.get("channel") or {})}
+    return Normalizer(summary, channel)
+
+
+_DEFAULT = _build(None)
+_BUILT: Dict[str, Normalizer] = {}
+
+
+def get_normalizer(model: Optional[str] = None) -> Normalizer:
+    """모델별 normalizer (프로필이 없으면 기본 normalizer 공유)"""
+    if not model or model not in MODEL_PROFILES:
+        return _DEFAULT
+    n = _BUILT.get(model)
+    if n is None:
+        n = _BUILT[model] = _build(model)
+    return n
+
+
+def register_profile(model: str, summary=None, channel=None) -> None:
+    """런타임에 모델 프로필 추가/교체 (캐시된 normalizer 무효화)"""
+    MODEL_PROFILES[model] = {"summary": dict(summary or {}), "channel": dict(channel or {})}
+    _BUILT.pop(model, None)
@@ -0,0 +1,193 @@
+# app/domain/timeseries.py
+"""
+✅ 장치별 최근 이력 ring buffer (in-memory)
+
+- 장치 1개 = 고정 크기 ring 1개, 컬럼(metric)별 array('d') + 공통 timestamp array('d')
+  (dict 리스트 대신 연속 메모리 -> 장치당 메모리 = capacity x (컬럼 수 + 1) x 8 bytes 로 고정)
+- 컬럼은 처음 값이 들어올 때만 할당 (안 쓰는 metric 은 메모리 0)
+- 빈 값은 NaN
+MQTT 수신 경로에서 append 하고, /api/series 가 최근 구간은 여기서 바로 집계함.
+"""
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import HISTORY_CAPACITY
+
+NAN = float("nan")
+
+# summary 필드 그대로 + 채널 kw (phase 별)
+SUMMARY_COLUMNS = (
+    "kw", "kwh",
+    "v_avg", "v_l1", "v_l2", "v_l3",
+    "a_avg", "a_l1", "a_l2", "a_l3",
+    "pf_avg", "pf_l1", "pf_l2", "pf_l3",
+)
+CHANNEL_KW_COLUMNS = {"L1": "kw_l1", "L2": "kw_l2", "L3": "kw_l3"}
+
+
+def extract_values(rec) -> Dict[str, float]:
+    """TelemetryRecord -> {컬럼: 값} (값이 있는 컬럼만)"""
+    summary = rec.summary
+    values: Dict[str, float] = {}
+    for name in SUMMARY_COLUMNS:
+        v = summary.get(name)
+        if v is not None:
+            values[name] = v
+    for ch in rec.channels:
+        name = CHANNEL_KW_COLUMNS.get(ch.get("phase"))
+        if name and name not in values and ch.get("term") == "in" and ch.get("kw") is not None:
+            values[name] = ch["kw"]
+    return values
+
+
+class DeviceRing:
+    __slots__ = ("capacity", "ts", "cols", "head", "size")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.ts = array("d", bytes(8 * capacity))
+        self.cols: Dict[str, array] = {}
+        self.head = 0     # 다음에 쓸 위치
+        self.size = 0
+
+    def append(self, ts: float, values: Dict[str, float]) -> None:
+        i = self.head
+        self.ts[i] = ts
+        cols = self.cols
+        for name, v in values.items():
+            col = cols.get(name)
+            if col is None:
+                col = cols[name] = array("d", [NAN]) * self.capacity
+            col[i] = v
+        # 이번 샘플에 없는 컬럼은 NaN
+        if len(values) != len(cols):
+            for name, col in cols.items():
+                if name not in values:
+                    col[i] = NAN
+        self.head = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def _order(self) -> range:
+        """오래된 것부터의 물리 인덱스 순서"""
+        start = (self.head - self.size) % self.capacity
+        return range(start, start + self.size)
+
+    def oldest_ts(self) -> Optional[float]:
+        if not self.size:
+            return None
+        return self.ts[(self.head - self.size) % self.capacity]
+
+    def samples(self, column: str, start_ts: float, stop_ts: float) -> List[Tuple[float, float]]:
+        col = self.cols.get(column)
+        if col is None:
+            return []
+        cap, ts = self.capacity, self.ts
+        out = []
+        for j in self._order():
+            i = j % cap
+            t = ts[i]
+            if start_ts <= t < stop_ts:
+                v = col[i]
+                if v == v:  # NaN 제외
+                    out.append((t, v))
+        return out
+
+    def nbytes(self) -> int:
+        return self.ts.itemsize * len(self.ts) + sum(c.itemsize * len(c) for c in self.cols.values())
+
+
+class HistoryStore:
+    def __init__(self, capacity: int = HISTORY_CAPACITY) -> None:
+        self.capacity = max(2, int(capacity))
+        self._rings: Dict[str, DeviceRing] = {}
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # ingest (MQTT 수신 경로)
+    # -----------------------------
+    def append(self, rec) -> None:
+        """TelemetryRecord 1건 -> 숫자 컬럼만 추출해서 ring 에 기록"""
+        values = extract_values(rec)
+        if not values:
+            return
+
+        with self._lock:
+            ring = self._rings.get(rec.key)
+            if ring is None:
+                ring = self._rings[rec.key] = DeviceRing(self.capacity)
+            ring.append(rec.ts, values)
+
+    # -----------------------------
+    # query
+    # -----------------------------
+    def oldest_ts(self, key: str) -> Optional[float]:
+        with self._lock:
+            ring = self._rings.get(key)
+            return ring.oldest_ts() if ring else None
+
+    def find(self, device_id: str) -> Optional[str]:
+        """device_id 만 온 경우 -> 유일한 key 면 반환"""
+        if not device_id:
+            return None
+        suffix = "/" + device_id
+        with self._lock:
+            hits = [k for k in self._rings if k.endswith(suffix)]
+        return hits[0] if len(hits) == 1 else None
+
+    def samples(self, key: str, column: str, start_ts: float, stop_ts: float) -> List[Tuple[float, float]]:
+        with self._lock:
+            ring = self._rings.get(key)
+            return ring.samples(column, start_ts, stop_ts) if ring else []
+
+    def aggregate(
+        self,
+        key: str,
+        column: str,
+        bounds: Sequence[float],
+        agg: str,
+    ) -> List[Tuple[int, float]]:
+        """bounds = 윈도우 경계 epoch 초 [b0, b1, ..., bn] -> [(윈도우 index, 값)]
+        agg: mean | spread (kwh 처럼 누적 카운터)"""
+        if len(bounds) < 2:
+            return []
+        samples = self.samples(key, column, bounds[0], bounds[-1])
+        fn: Callable[[List[float]], float] = _spread if agg == "spread" else _mean
+        buckets: Dict[int, List[float]] = {}
+        for t, v in samples:
+            w = bisect_left(bounds, t + 1e-9) - 1
+            if 0 <= w < len(bounds) - 1:
+                buckets.setdefault(w, []).append(v)
+        return [(w, fn(vals)) for w, vals in sorted(buckets.items())]
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._rings.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rings = list(self._rings.values())
+        total = sum(r.nbytes() for r in rings)
+        return {
+            "devices": len(rings),
+            "capacity": self.capacity,
+            "samples": sum(r.size for r in rings),
+            "bytes": total,
+            "bytes_per_device_max": max((r.nbytes() for r in rings), default=0),
+            # 컬럼 전부 할당됐을 때 장치당 상한
+            "bytes_per_device_bound": 8 * self.capacity * (len(SUMMARY_COLUMNS) + len(CHANNEL_KW_COLUMNS) + 1),
+        }
+
+
+def _mean(vals: List[float]) -> float:
+    return math.fsum(vals) / len(vals)
+
+
+def _spread(vals: List[float]) -> float:
+    return max(vals) - min(vals)
+
+
+history = HistoryStore()
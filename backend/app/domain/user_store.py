@@ -0,0 +1,289 @@
+# app/domain/user_store.py
+"""
+✅ 사용자 저장소 (로그인용)
+
+- UserStore (ABC): get_by_email / get_by_id / create / create_if_absent / set_password_hash / set_active
+  user dict = {id, email, password_hash, role, is_active, sites, devices}
+- token 폐기 목록도 같은 저장소 (add_revocation / revocations_since)
+  -> uvicorn worker 여럿이 같은 users.db 를 보므로 로그아웃/비밀번호 변경이 모든 worker 에 적용
+  행 = (id, jti, sub, before, expires): jti 1개 폐기 또는 sub 의 before 이전 발급 token 전부 폐기
+  expires 가 지나면 의미 없는 행 -> 기록할 때 같이 삭제
+  sites / devices 가 None 이면 접근 범위 제한 없음 (WS fan-out scope, app/routers/ws.py)
+- SQLiteUserStore (기본): email UNIQUE COLLATE NOCASE 인덱스로 조회, 스레드별 connection (WAL)
+- MemoryUserStore: 개발/벤치용
+- 모듈 import 시점에는 아무것도 만들지 않음 -> get_user_store() 첫 호출(서버 startup)에서 생성
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import USER_STORE, USER_DB_PATH
+
+_SCHEMA = ("""
+CREATE TABLE IF NOT EXISTS users (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    email         TEXT    NOT NULL UNIQUE COLLATE NOCASE,
+    password_hash TEXT    NOT NULL,
+    role          TEXT    NOT NULL DEFAULT 'user',
+    is_active     INTEGER NOT NULL DEFAULT 1,
+    sites         TEXT,
+    devices       TEXT
+)
+""", """
+CREATE TABLE IF NOT EXISTS revocations (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    jti     TEXT,
+    sub     TEXT,
+    before  INTEGER NOT NULL DEFAULT 0,
+    expires REAL    NOT NULL
+)
+""", """
+CREATE INDEX IF NOT EXISTS revocations_expires ON revocations (expires)
+""")
+Revocation = Tuple[int, Optional[str], Optional[str], int, float]   # (id, jti, sub, before, expires)
+_COLUMNS = "id, email, password_hash, role, is_active, sites, devices"
+
+
+def _norm_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+class UserStore(ABC):
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def get_by_id(self, user_id: int) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def create(
+        self,
+        email: str,
+        password_hash: str,
+        role: str = "user",
+        sites: Optional[Iterable[str]] = None,
+        devices: Optional[Iterable[str]] = None,
+    ) -> dict:
+        """같은 email 이 있으면 ValueError"""
+
+    @abstractmethod
+    def create_if_absent(self, email: str, password_hash: str, role: str = "user") -> bool:
+        """없을 때만 생성 (seed 용, 여러 worker 가 동시에 불러도 에러 없음) -> 만들었으면 True"""
+
+    @abstractmethod
+    def set_password_hash(self, user_id: int, password_hash: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_active(self, user_id: int, active: bool) -> None:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def add_revocation(self, jti: Optional[str], sub: Optional[str], before: int, expires: float, now: float) -> None:
+        ...
+
+    @abstractmethod
+    def revocations_since(self, last_id: int, now: float) -> List[Revocation]:
+        ...
+
+
+class MemoryUserStore(UserStore):
+    def __init__(self) -> None:
+        self._by_email: Dict[str, dict] = {}
+        self._by_id: Dict[int, dict] = {}
+        self._revocations: List[Revocation] = []
+        self._revocation_id = 0
+        self._lock = threading.Lock()
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        return self._by_email.get(_norm_email(email))
+
+    def get_by_id(self, user_id: int) -> Optional[dict]:
+        return self._by_id.get(int(user_id))
+
+    def create(self, email, password_hash, role="user", sites=None, devices=None) -> dict:
+        with self._lock:
+            key = _norm_email(email)
+            if key in self._by_email:
+                raise ValueError(f"user exists: {email}")
+            user = {
+                "id": len(self._by_id) + 1,
+                "email": email.strip(),
+                "password_hash": password_hash,
+                "role": role,
+                "is_active": True,
+                "sites": None if sites is None else list(sites),
+                "devices": None if devices is None else list(devices),
+            }
+            self._by_email[key] = user
+            self._by_id[user["id"]] = user
+            return user
+
+    def create_if_absent(self, email, password_hash, role="user") -> bool:
+        try:
+            self.create(email, password_hash, role)
+        except ValueError:
+            return False
+        return True
+
+    def set_password_hash(self, user_id: int, password_hash: str) -> None:
+        user = self._by_id.get(int(user_id))
+        if user:
+            user["password_hash"] = password_hash
+
+    def set_active(self, user_id: int, active: bool) -> None:
+        user = self._by_id.get(int(user_id))
+        if user:
+            user["is_active"] = bool(active)
+
+    def count(self) -> int:
+        return len(self._by_id)
+
+    def add_revocation(self, jti, sub, before, expires, now) -> None:
+        with self._lock:
+            self._revocation_id += 1
+            self._revocations = [r for r in self._revocations if r[4] > now]
+            self._revocations.append((self._revocation_id, jti, sub, int(before), float(expires)))
+
+    def revocations_since(self, last_id: int, now: float) -> List[Revocation]:
+        with self._lock:
+            return [r for r in self._revocations if r[0] > last_id and r[4] > now]
+
+
+class SQLiteUserStore(UserStore):
+    def __init__(self, path: str = USER_DB_PATH) -> None:
+        self.path = path
+        self._local = threading.local()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # ✅ sync 라우트는 threadpool 에서 돌므로 스레드마다 connection 1개
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[dict]:
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "email": row["email"],
+            "password_hash": row["password_hash"],
+            "role": row["role"],
+            "is_active": bool(row["is_active"]),
+            "sites": json.loads(row["sites"]) if row["sites"] is not None else None,
+            "devices": json.loads(row["devices"]) if row["devices"] is not None else None,
+        }
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        cur = self._conn().execute(f"SELECT {_COLUMNS} FROM users WHERE email = ?", (_norm_email(email),))
+        return self._row(cur.fetchone())
+
+    def get_by_id(self, user_id: int) -> Optional[dict]:
+        cur = self._conn().execute(f"SELECT {_COLUMNS} FROM users WHERE id = ?", (int(user_id),))
+        return self._row(cur.fetchone())
+
+    def create(self, email, password_hash, role="user", sites=None, devices=None) -> dict:
+        conn = self._conn()
+        try:
+            cur = conn.execute(
+                "INSERT INTO users (email, password_hash, role, sites, devices) VALUES (?, ?, ?, ?, ?)",
+                (
+                    email.strip(),
+                    password_hash,
+                    role,
+                    None if sites is None else json.dumps(list(sites)),
+                    None if devices is None else json.dumps(list(devices)),
+                ),
+            )
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            raise ValueError(f"user exists: {email}")
+        return self.get_by_id(cur.lastrowid)
+
+    def create_if_absent(self, email, password_hash, role="user") -> bool:
+        # ✅ worker 여럿이 동시에 seed 해도 UNIQUE 충돌은 무시 (먼저 넣은 쪽이 이김)
+        conn = self._conn()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO users (email, password_hash, role) VALUES (?, ?, ?)",
+            (email.strip(), password_hash, role),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+
+    def set_password_hash(self, user_id: int, password_hash: str) -> None:
+        conn = self._conn()
+        conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, int(user_id)))
+        conn.commit()
+
+    def set_active(self, user_id: int, active: bool) -> None:
+        conn = self._conn()
+        conn.execute("UPDATE users SET is_active = ? WHERE id = ?", (1 if active else 0, int(user_id)))
+        conn.commit()
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def add_revocation(self, jti, sub, before, expires, now) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM revocations WHERE expires <= ?", (now,))
+        conn.execute(
+            "INSERT INTO revocations (jti, sub, before, expires) VALUES (?, ?, ?, ?)",
+            (jti, sub, int(before), float(expires)),
+        )
+        conn.commit()
+
+    def revocations_since(self, last_id: int, now: float) -> List[Revocation]:
+        cur = self._conn().execute(
+            "SELECT id, jti, sub, before, expires FROM revocations WHERE id > ? AND expires > ? ORDER BY id",
+            (int(last_id), now),
+        )
+        return [tuple(r) for r in cur.fetchall()]
+
+
+_store: Optional[UserStore] = None
+_store_lock = threading.Lock()
+
+
+def get_user_store() -> UserStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryUserStore() if USER_STORE == "memory" else SQLiteUserStore()
+    return _store
+
+
+def set_user_store(store: UserStore) -> None:
+    """다른 저장소 구현으로 교체 (startup 전에 호출)"""
+    global _store
+    _store = store
+
+
+def list_seed_users() -> List[dict]:
+    # ✅ 기존 테스트 계정 (저장소가 비어 있을 때 1번만 hash 해서 저장)
+    return [
+        {"email": "admin@local", "password": "admin1234", "role": "admin"},
+        {"email": "user@local", "password": "user1234", "role": "user"},
+    ]
@@ -2,4 +2,7 @@
 from .auth import router as auth_router
 from .devices import router as devices_router
 from .series import router as series_router
-from .report import router as report_router
\ No newline at end of file
+from .report import router as report_router
+from .ws import router as ws_router
+from .metrics import router as metrics_router
+from .health import router as health_router
\ No newline at end of file
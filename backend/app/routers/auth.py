@@ -1,26 +1,39 @@
 # app/routers/auth.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
 from app.core.security import (
     LoginRequest,
     authenticate,
+    change_password,
     create_access_token,
     get_current_user,
+    revoke_token,
+    set_user_active,
 )
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
+class PasswordChangeRequest(BaseModel):
+    old_password: str
+    new_password: str
+
+
 @router.post("/login")
-def login(body: LoginRequest):
-    user = authenticate(body.email, body.password)
+async def login(body: LoginRequest):
+    # ✅ 비밀번호 검증은 전용 executor 에서 (이벤트 루프 / API threadpool 을 막지 않음)
+    user = await authenticate(body.email, body.password)
 
-    token = create_access_token(
-        {
-            "sub": str(user["id"]),
-            "email": user["email"],
-            "role": user["role"],
-        }
-    )
+    claims = {
+        "sub": str(user["id"]),
+        "email": user["email"],
+        "role": user["role"],
+    }
+    # ✅ 접근 범위가 정해진 사용자만 (WS fan-out 에서 site/장치 제한)
+    for k in ("sites", "devices"):
+        if user.get(k) is not None:
+            claims[k] = list(user[k])
+    token = create_access_token(claims)
 
     # ✅ 프론트 호환성: access_token + token 둘 다 내려줌
     return {
@@ -31,6 +44,31 @@ def login(body: LoginRequest):
     }
 
 
+@router.post("/logout")
+def logout(user=Depends(get_current_user)):
+    # ✅ 이 token 만 폐기 (검증 캐시에 남아 있어도 이후 요청은 401)
+    revoke_token(user)
+    return {"ok": True}
+
+
+@router.post("/password")
+async def password(body: PasswordChangeRequest, user=Depends(get_current_user)):
+    # ✅ 비밀번호 변경 -> 이 사용자의 기존 token 전부 폐기 (모든 worker, 다시 로그인)
+    if not body.new_password:
+        raise HTTPException(status_code=400, detail="new_password is required")
+    await change_password(user, body.old_password, body.new_password)
+    return {"ok": True}
+
+
+@router.post("/users/{user_id}/active")
+def user_active(user_id: int, active: bool, user=Depends(get_current_user)):
+    # ✅ 관리자 전용: 계정 정지 시 이미 발급된 token 도 무효
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="admin only")
+    set_user_active(user_id, active)
+    return {"ok": True, "id": user_id, "active": active}
+
+
 @router.get("/me")
 def me(user=Depends(get_current_user)):
     """
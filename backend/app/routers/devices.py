@@ -1,21 +1,14 @@
 # app/routers/devices.py
 import time
-from fastapi import APIRouter, Depends, Query, HTTPException
-from app.core.security import get_current_user
+import zlib
+from typing import Optional, Set
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from app.core.security import get_current_user, user_scope, scoped_keys, scope_allows_key, require_site_scope
 from app.domain.topic import make_key
-from app.domain.device_store import (
-    DEVICES,
-    LAST_PAYLOAD,
-    normalize_payload,
-    build_channels_from_payload,
-)
-
-# ✅ ONLINE_SEC가 없거나 잘못돼도 동작하도록 기본값(초) 제공
-try:
-    from app.core.config import ONLINE_SEC as _ONLINE_SEC
-    ONLINE_SEC = float(_ONLINE_SEC) if _ONLINE_SEC else 60.0
-except Exception:
-    ONLINE_SEC = 60.0
+from app.domain.device_store import registry
+from app.domain.device_registry import decode_cursor
+from app.core.metrics import HTTP_DEVICES_SECONDS
+from app.services.liveness_service import liveness
 
 router = APIRouter(prefix="/api", tags=["devices"])
 
@@ -30,48 +23,134 @@ def _safe_float(v, default: float) -> float:
         return float(default)
 
 
-@router.get("/devices")
-def api_devices(user=Depends(get_current_user)):
-    now = time.time()
-    items = []
+def _parse_fields(v: str) -> Set[str]:
+    return {f.strip() for f in (v or "").split(",") if f.strip()}
 
-    for key, d in DEVICES.items():
-        last_seen = _safe_float(d.get("last_seen"), now)
-        age = max(0.0, now - last_seen)  # ✅ 음수 방지(시간 역전/오류 대비)
 
-        payload = LAST_PAYLOAD.get(key)
-        if not isinstance(payload, dict):
-            payload = {}
+def _device_item(rec, now: float) -> dict:
+    d = rec.meta
+    last_seen = _safe_float(d.get("last_seen"), now)
+    age = max(0.0, now - last_seen)  # ✅ 음수 방지(시간 역전/오류 대비)
 
-        snap = normalize_payload(payload)
-        channels = build_channels_from_payload(payload)
+    snap = rec.summary
+    channels = rec.channels
+    key = rec.key
 
-        item = {
-            **d,
+    return {
+        **d,
 
-            # ✅ 오프라인 감지 핵심
-            "age_sec": round(age, 1),
-            "online": age < ONLINE_SEC,
+        # ✅ 오프라인 감지 핵심 (liveness tracker 가 전환 시점에 갱신)
+        "age_sec": round(age, 1),
+        "online": liveness.is_online(key),
+
+        "last_payload": rec.payload,
+        "summary_value": snap,
+
+        "channels": channels,
+        "channel_count": len(channels),
 
-            "last_payload": payload,
-            "summary_value": snap,
+        "kw": snap.get("kw"),
+        "pf": snap.get("pf_avg"),
 
-            "channels": channels,
-            "channel_count": len(channels),
+        # ✅ 프론트가 기대하는 필드들
+        "device_topic": key,
+        "device_short": d.get("device_id") or key.split("/")[-1],
+        "device_display": d.get("device_id") or key,
+    }
 
-            "kw": snap.get("kw"),
-            "pf": snap.get("pf_avg"),
 
-            # ✅ 프론트가 기대하는 필드들
-            "device_topic": key,
-            "device_short": d.get("device_id") or key.split("/")[-1],
-            "device_display": d.get("device_id") or key,
-        }
+def _etag(request: Request, version: int, online: str, user: dict) -> str:
+    """데이터 version + online 집합 요약 + 쿼리 파라미터 (+ 범위 제한 사용자면 scope)
+    version (worker 는 ingest 의 IPC seq) 과 online 요약 모두 프로세스와 무관 -> worker 가 달라도 같은 ETag"""
+    q = "&".join(sorted(request.url.query.split("&")))
+    scope = user_scope(user)
+    if scope is not None:
+        q += f"|{sorted(scope[0])}|{sorted(scope[1])}"
+    return f'W/"{version}-{online}-{zlib.crc32(q.encode()):08x}"'
+
+
+@router.get("/devices")
+def api_devices(
+    request: Request,
+    response: Response,
+    site_id: str = Query("", description="filter by site_id"),
+    model: str = Query("", description="filter by model"),
+    country: str = Query("", description="filter by country"),
+    online: Optional[bool] = Query(None, description="true: online only / false: offline only"),
+    fields: str = Query("", description="comma separated fields to return (projection)"),
+    exclude: str = Query("", description="comma separated fields to omit, e.g. last_payload,channels"),
+    cursor: str = Query("", description="next_cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="page size (default: all)"),
+    since: Optional[int] = Query(None, ge=0, description="only devices changed after this version"),
+    user=Depends(get_current_user),
+):
+    t0 = time.perf_counter()
+    now = time.time()
+
+    # ✅ 변경이 없으면 직렬화 없이 304 (If-None-Match)
+    version = registry.version
+    etag = _etag(request, version, liveness.online_digest, user)
+    if request.headers.get("if-none-match") == etag:
+        HTTP_DEVICES_SECONDS.observe(time.perf_counter() - t0)
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    # ✅ online 필터도 item 의 "online" 필드와 같은 liveness 상태로 판단 (기준이 하나)
+    keys = exclude_keys = None
+    if online is True:
+        keys = liveness.online_keys()
+    elif online is False:
+        exclude_keys = liveness.online_keys()
+
+    # ✅ token 의 sites / devices 범위 밖 장치는 목록/전체 수에서 제외 (범위 밖 site 를 지정하면 403)
+    require_site_scope(user, site_id)
+    scope = scoped_keys(user)
+
+    if cursor and decode_cursor(cursor) is None:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+    recs, next_cursor, total = registry.query(
+        {"site_id": site_id, "model": model, "country": country},
+        cursor=cursor or None, limit=limit, since=since, keys=keys, exclude_keys=exclude_keys, scope=scope,
+    )
+
+    # ✅ 정규화는 수신 시 1회만 -> 여기서는 이번 페이지 record 만 읽음 (이미 last_seen 내림차순)
+    want = _parse_fields(fields)
+    drop = _parse_fields(exclude)
+    items = []
+    for rec in recs:
+        item = _device_item(rec, now)
+        if want:
+            item = {k: v for k, v in item.items() if k in want}
+        for k in drop:
+            item.pop(k, None)
         items.append(item)
 
-    # ✅ last_seen이 None/문자여도 정렬 안전
-    items.sort(key=lambda x: _safe_float(x.get("last_seen"), 0), reverse=True)
-    return {"items": items, "count": len(items)}
+    HTTP_DEVICES_SECONDS.observe(time.perf_counter() - t0)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    # version: 다음 폴링에서 ?since=<version> 으로 넘기면 그 뒤 변경분만 받음
+    return {
+        "items": items,
+        "count": len(items),
+        "total": total,
+        "next_cursor": next_cursor,
+        "version": version,
+    }
+
+
+@router.get("/devices/online")
+def api_devices_online(user=Depends(get_current_user)):
+    # ✅ 전환 시점에만 갱신되는 카운터 -> 장치 수와 무관하게 O(1)
+    scope = scoped_keys(user)
+    if scope is None:
+        return {"online": liveness.online_count(), "total": len(registry), "sites": liveness.site_online()}
+    # 범위 제한 사용자: 볼 수 있는 장치만 센다
+    online = scope & liveness.online_keys()
+    sites: dict = {}
+    for key in online:
+        site = key.split("/")[1]
+        sites[site] = sites.get(site, 0) + 1
+    return {"online": len(online), "total": len(scope), "sites": sites}
 
 
 @router.get("/device/latest")
@@ -83,27 +162,27 @@ def api_device_latest(
     user=Depends(get_current_user),
 ):
     key = make_key(country, site_id, model, device_id)
-    d = DEVICES.get(key)
-    if not d:
+    if not scope_allows_key(user_scope(user), key):
+        raise HTTPException(status_code=403, detail="device out of scope")
+    rec = registry.get(key)
+    if not rec:
         raise HTTPException(status_code=404, detail="device not found")
+    d = rec.meta
 
     now = time.time()
     last_seen = _safe_float(d.get("last_seen"), now)
     age = max(0.0, now - last_seen)
 
-    payload = LAST_PAYLOAD.get(key)
-    if not isinstance(payload, dict):
-        payload = {}
-
-    snap = normalize_payload(payload)
-    channels = build_channels_from_payload(payload)
+    payload = rec.payload
+    snap = rec.summary
+    channels = rec.channels
 
     return {
         "ok": True,
         "key": key,
 
         # ✅ 오프라인 감지 핵심
-        "online": age < ONLINE_SEC,
+        "online": liveness.is_online(key),
         "age_sec": round(age, 1),
 
         "last_seen": d.get("last_seen"),
@@ -0,0 +1,33 @@
+# app/routers/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core import health
+from app.core.config import APP_ROLE, READY_REQUIRE
+
+router = APIRouter(tags=["health"])
+
+
+# ✅ 인증 없음 (로드밸런서 / 호스팅 health check 용), 상태 dict 복사만 -> 빠름
+@router.get("/healthz")
+def healthz():
+    """프로세스가 살아 있으면 항상 200 + 서브시스템별 상태"""
+    return {
+        "status": "ok",
+        "role": APP_ROLE,
+        "uptime_sec": round(health.uptime(), 1),
+        "subsystems": health.snapshot(),
+    }
+
+
+@router.get("/readyz")
+def readyz():
+    """READY_REQUIRE 의 서브시스템이 모두 ready(또는 disabled) 면 200, 아니면 503"""
+    ready, waiting = health.readiness()
+    body = {
+        "ready": ready,
+        "required": READY_REQUIRE,
+        "waiting": waiting,
+        "subsystems": health.snapshot(),
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
@@ -0,0 +1,54 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics as m
+from app.core.log import dropped_count as log_dropped
+from app.domain.device_store import registry
+from app.domain.timeseries import history
+from app.services.influx_service import get_influx_stats
+from app.services.mqtt_service import ingest_pool, get_mqtt_stats
+from app.services.series_service import cache_stats
+from app.services.liveness_service import liveness
+from app.ws.manager import ws_manager
+
+router = APIRouter(tags=["metrics"])
+
+# ✅ 수집 시점에만 읽는 값들 (기존 stats() 재사용 -> 핫패스 비용 0)
+m.GaugeFunc("monitor_devices", "Devices with a cached record", lambda: len(registry))
+m.GaugeFunc("monitor_devices_online", "Devices currently online", liveness.online_count)
+m.CounterFunc("monitor_device_offline_total", "Online -> offline transitions", lambda: liveness.went_offline)
+m.GaugeFunc("monitor_ws_clients", "Connected WebSocket clients", ws_manager.count)
+m.GaugeFunc("monitor_ws_queue_depth", "Messages waiting in WebSocket send queues", lambda: ws_manager.stats()["queue_depth_total"])
+m.CounterFunc("monitor_ws_dropped_total", "WebSocket messages dropped for slow clients", lambda: ws_manager.dropped)
+m.CounterFunc("monitor_ws_evicted_total", "WebSocket clients disconnected as too slow", lambda: ws_manager.evicted)
+m.CounterFunc("monitor_ws_pending_dropped_total", "Events dropped before reaching the event loop", lambda: ws_manager.pending_dropped)
+m.GaugeFunc("monitor_mqtt_connections_up", "MQTT broker connections currently connected", lambda: get_mqtt_stats().get("connected", 0))
+m.CounterFunc(
+    "monitor_mqtt_connection_messages_total", "MQTT messages received per broker connection",
+    lambda: {(c["client_id"],): c["messages"] for c in get_mqtt_stats().get("connections", [])},
+    ("client_id",),
+)
+m.CounterFunc(
+    "monitor_mqtt_connection_bytes_total", "MQTT payload bytes received per broker connection",
+    lambda: {(c["client_id"],): c["bytes"] for c in get_mqtt_stats().get("connections", [])},
+    ("client_id",),
+)
+m.GaugeFunc("monitor_ingest_queue_depth", "MQTT messages waiting for an ingest worker", ingest_pool.depth)
+m.CounterFunc("monitor_ingest_dropped_total", "MQTT messages dropped on a full ingest queue", ingest_pool.dropped)
+m.GaugeFunc("monitor_influx_queue_depth", "Points waiting in the Influx batch writer", lambda: get_influx_stats().get("queue_depth", 0))
+m.CounterFunc("monitor_influx_dropped_total", "Points dropped on a full Influx queue", lambda: get_influx_stats().get("dropped", 0))
+m.GaugeFunc("monitor_influx_spool_bytes", "Bytes of Influx points spooled to disk awaiting replay", lambda: get_influx_stats().get("spool", {}).get("bytes", 0))
+m.CounterFunc("monitor_influx_spool_dropped_total", "Spooled points discarded by the spool size cap", lambda: get_influx_stats().get("spool", {}).get("dropped", 0))
+m.GaugeFunc("monitor_history_bytes", "Memory held by the recent-history ring buffers", lambda: history.stats()["bytes"])
+m.CounterFunc(
+    "monitor_series_cache_total", "/api/series cache lookups",
+    lambda: {("hit",): cache_stats()["hits"], ("miss",): cache_stats()["misses"]},
+    ("result",),
+)
+m.CounterFunc("monitor_log_dropped_total", "Log records dropped on a full log queue", log_dropped)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(m.render(), media_type="text/plain; version=0.0.4")
@@ -1,11 +1,17 @@
 # app/routers/report.py
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from itertools import chain
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 import io
-import xlsxwriter
 
-from app.core.security import get_current_user
+from app.core.security import get_current_user, require_device_scope, require_site_scope
+from app.domain.device_store import registry
+from app.services import series_service as svc
+from app.services import report_service as rs
 
 router = APIRouter(prefix="/api/report", tags=["report"])
 
@@ -13,11 +19,38 @@ class SeriesReq(BaseModel):
     title: str = "Period Analysis"
     metric: str = "kwh"
     series: str = "total"
-    labels: list[str]
-    values: list[float]
+    labels: list[str] = []
+    values: list[float] = []
+    # ✅ labels/values 대신 조회 조건만 보내면 서버가 rollup 에서 직접 채움
+    device: str = ""
+    group: str = "day"
+    date_from: str = Field("", alias="from")
+    date_to: str = Field("", alias="to")
+
+
+def _fill_from_series(req: SeriesReq) -> None:
+    now = datetime.now(timezone.utc)
+    try:
+        q = svc.make_query(req.device, req.metric, req.series, req.group)
+        start, stop = svc.resolve_range(req.date_from, req.date_to, q.group, now)
+        data = svc.get_series(q, start, stop, now)
+    except svc.SeriesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"influx query failed: {e!r}")
+    req.labels = [svc.format_label(t, q.group) for t, _ in data]
+    req.values = [v for _, v in data]
 
 @router.post("/xlsx")
 def make_xlsx(req: SeriesReq, user=Depends(get_current_user)):
+    if not req.labels and req.device:
+        req.device = require_device_scope(user, req.device)
+        _fill_from_series(req)
+
+    import xlsxwriter   # ✅ 첫 리포트 요청에서 import (startup 비용 제외)
+
     output = io.BytesIO()
     wb = xlsxwriter.Workbook(output, {"in_memory": True})
     ws = wb.add_worksheet("Data")
@@ -53,4 +86,88 @@ def make_xlsx(req: SeriesReq, user=Depends(get_current_user)):
         output,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
\ No newline at end of file
+    )
+
+
+# =========================================================
+# ✅ 서버 측 리포트: 조건만 받아서 서버가 청크 단위로 조회
+#   GET /api/report?devices=a,b&site_id=..&metric=kwh&group=day&from=..&to=..&format=csv|xlsx
+# =========================================================
+def _device_set(devices: List[str], site_id: str, user: dict) -> List[str]:
+    """요청 장치 + site 의 장치 (사용자 범위 밖 장치/site 는 403, site 는 범위 안 장치만 펼침)"""
+    out = [require_device_scope(user, d) for item in devices for d in item.split(",") if d.strip()]
+    if site_id:
+        allowed = require_site_scope(user, site_id)
+        recs, _, _ = registry.query({"site_id": site_id}, scope=allowed)
+        out += [r.key for r in recs]
+    return out
+
+
+def _first_rows(report: rs.Report):
+    """첫 청크를 미리 조회 -> 조회 오류는 응답 시작 전에 HTTP 상태로"""
+    rows = rs.iter_rows(report)
+    try:
+        first = next(rows, None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"influx query failed: {e!r}")
+    return rows if first is None else chain([first], rows)
+
+
+@router.get("")
+def get_report(
+    request: Request,
+    devices: List[str] = Query([], description="device keys or ids (repeat or comma-separated)"),
+    site_id: str = Query("", description="add every device of this site"),
+    metric: str = Query("kwh"),
+    series: str = Query("total"),
+    group: str = Query("day"),
+    date_from: str = Query("", alias="from"),
+    date_to: str = Query("", alias="to"),
+    fmt: str = Query("csv", alias="format"),
+    title: str = Query("Period Analysis"),
+    user=Depends(get_current_user),
+):
+    try:
+        report = rs.build_report(
+            _device_set(devices, site_id, user), metric, series, group, date_from, date_to, fmt, title,
+        )
+    except svc.SeriesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = rs.MEDIA_TYPES[report.spec.fmt]
+    headers = {"Content-Disposition": f'attachment; filename="{report.filename}"'}
+    etag = f'"{report.digest}"'
+    if report.cacheable and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    path = rs.cached_file(report)
+    if path:
+        return FileResponse(path, media_type=media_type, headers={**headers, "ETag": etag})
+    if report.settled:
+        headers["ETag"] = etag   # Influx 장애 / 밀린 쓰기 중 결과에는 ETag 를 주지 않음 (브라우저 캐시 방지)
+
+    rows = _first_rows(report)
+    if report.spec.fmt == "csv":
+        if not rs.fits_in_memory(report):
+            return StreamingResponse(rs.stream_csv(report, rows), media_type=media_type, headers=headers)
+        try:
+            body = rs.build_csv(report, rows)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"report query failed: {e!r}")
+        return Response(body, media_type=media_type, headers=headers)
+
+    try:
+        path, cached = rs.build_xlsx(report, rows)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"report query failed: {e!r}")
+    background = None if cached else BackgroundTask(rs.remove_quietly, path)
+    return FileResponse(path, media_type=media_type, headers=headers, background=background)
+
+
+@router.get("/stats")
+def get_report_stats(user=Depends(get_current_user)):
+    return rs.get_report_stats()
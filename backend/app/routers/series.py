@@ -1,48 +1,62 @@
 # app/routers/series.py
-from fastapi import APIRouter, Depends, Query
-from app.core.security import get_current_user
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Query, HTTPException
+from app.core.security import get_current_user, require_device_scope
+from app.services import series_service as svc
 
 router = APIRouter(prefix="/api", tags=["series"])
 
 @router.get("/series")
 def get_series(
-    device: str = Query("", description="device id"),
+    device: str = Query("", description="device key (country/site_id/model/device_id) or device id"),
     metric: str = Query("kwh"),
     series: str = Query("total"),
     date_from: str = Query("", alias="from"),
     date_to: str = Query("", alias="to"),
     group: str = Query("day"),
+    interval: str = Query("", description="alias of group (view.monitor.js)"),
     user=Depends(get_current_user),
 ):
-    labels = ["2026-01-20", "2026-01-21", "2026-01-22", "2026-01-23", "2026-01-24"]
+    group = interval or group
+    device = require_device_scope(user, device)
+    now = datetime.now(timezone.utc)
+    try:
+        q = svc.make_query(device, metric, series, group)
+        start, stop = svc.resolve_range(date_from, date_to, q.group, now)
+        data = svc.get_series(q, start, stop, now)
+    except svc.SeriesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        # Influx 미설정
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"influx query failed: {e!r}")
 
-    base = 10.0
-    if metric == "v":
-        base = 220.0
-    elif metric == "a":
-        base = 5.0
-    elif metric == "pf":
-        base = 0.92
-    elif metric == "kw":
-        base = 3.0
-    elif metric == "kwh":
-        base = 12.0
-
-    bump = {"total": 0.0, "l1": 0.3, "l2": 0.6, "l3": 0.9}.get(series, 0.0)
-    step = 0.5 if metric in ("kwh", "kw") else 0.2
-    values = [base + bump + i * step for i in range(len(labels))]
-    rows = [{"t": labels[i], "v": values[i]} for i in range(len(labels))]
+    labels = [svc.format_label(t, q.group) for t, _ in data]
+    values = [v for _, v in data]
+    # ✅ 프론트 호환: rows/points 둘 다 (t 는 로컬 ISO 시각 -> view.monitor.js 가 slice 해서 씀)
+    rows = [{"t": t.astimezone(svc.TZ).strftime("%Y-%m-%dT%H:%M:%S"), "v": v} for t, v in data]
 
     return {
         "meta": {
             "device": device,
-            "metric": metric,
-            "series": series,
+            "metric": q.metric,
+            "series": q.series,
             "from": date_from,
             "to": date_to,
-            "group": group,
+            "group": q.group,
+            "start": start.isoformat(),
+            "stop": stop.isoformat(),
+            "tz": str(svc.TZ),
         },
         "labels": labels,
         "values": values,
         "rows": rows,
-    }
\ No newline at end of file
+        "points": rows,
+    }
+
+
+@router.get("/series/stats")
+def get_series_stats(user=Depends(get_current_user)):
+    # ✅ 캐시 적중률 + ring buffer 메모리 사용량
+    return svc.cache_stats()
@@ -1,24 +1,140 @@
 # app/routers/ws.py
 import asyncio
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 
+from app.core.config import WS_AUTH_REQUIRED
+from app.core.security import verify_token, user_scope
 from app.ws.manager import ws_manager
+from app.ws.subscriptions import scope_patterns
 
 router = APIRouter(tags=["ws"])
 
+PING = '{"type":"ping"}'
+KEEPALIVE_SEC = 30
+
+
+def _patterns(msg: dict) -> list:
+    pats = msg.get("patterns")
+    if pats is None and msg.get("pattern") is not None:
+        pats = [msg.get("pattern")]
+    if isinstance(pats, str):
+        pats = [pats]
+    return pats if isinstance(pats, list) else []
+
+
+async def _handle_client_message(ws: WebSocket, text: str) -> None:
+    """
+    클라이언트 -> 서버 메시지
+      {"type": "subscribe",   "patterns": ["th/site001/#", "th/+/pg46/#"]}
+      {"type": "unsubscribe", "patterns": ["th/site001/#"]}
+      {"type": "options", "max_fps": 2, "delta": true}
+    pattern 은 make_key() 의 country/site_id/model/device_id 에 대한 MQTT 스타일 와일드카드(+, #)
+    """
+    try:
+        msg = json.loads(text)
+    except Exception:
+        return
+    if not isinstance(msg, dict):
+        return
+
+    mtype = msg.get("type")
+    if mtype == "subscribe":
+        accepted, rejected = ws_manager.subscribe(ws, _patterns(msg))
+        reply = {"type": "subscribed", "accepted": accepted, "rejected": rejected}
+    elif mtype == "unsubscribe":
+        removed = ws_manager.unsubscribe(ws, _patterns(msg))
+        reply = {"type": "unsubscribed", "removed": removed}
+    elif mtype == "options":
+        # {"type": "options", "max_fps": 2, "delta": true}  (app/ws/stream.py 참고)
+        try:
+            max_fps = float(msg.get("max_fps") or 0)
+        except Exception:
+            max_fps = 0.0
+        opts = ws_manager.set_options(ws, max_fps=max_fps, delta=bool(msg.get("delta")))
+        reply = {"type": "options", **opts}
+    elif mtype == "ping":
+        reply = {"type": "pong"}
+    else:
+        return
+
+    reply["patterns"] = ws_manager.subscriptions(ws)
+    await ws_manager.send(ws, json.dumps(reply, ensure_ascii=False))
+
+
+def _handshake_token(ws: WebSocket) -> str:
+    """브라우저 WebSocket 은 헤더를 못 붙이므로 ?token= 우선, 그 외 클라이언트는 Authorization"""
+    token = ws.query_params.get("token") or ""
+    if not token:
+        auth = ws.headers.get("authorization") or ""
+        if auth.lower().startswith("bearer "):
+            token = auth[7:]
+    return token.strip()
+
+
+def _authenticate(ws: WebSocket) -> Optional[dict]:
+    """-> token payload. 인증 실패면 None (WS_AUTH_REQUIRED=0 이면 token 없어도 빈 dict)"""
+    token = _handshake_token(ws)
+    if not token:
+        return None if WS_AUTH_REQUIRED else {}
+    try:
+        return verify_token(token)
+    except HTTPException:
+        return None
+
+
+async def _keepalive(ws: WebSocket) -> None:
+    while True:
+        await asyncio.sleep(KEEPALIVE_SEC)
+        if not await ws_manager.send(ws, PING):
+            return  # 끊김 / 느린 클라이언트로 정리됨
+
+
 @router.websocket("/ws/telemetry")
 async def ws_telemetry(ws: WebSocket):
-    # (선택) 여기서 토큰 인증도 가능. 일단은 연결만.
-    await ws_manager.connect(ws)
+    # ✅ handshake 단계에서 REST 와 같은 JWT 검증 (실패 시 accept 전에 닫음 -> HTTP 403)
+    user = _authenticate(ws)
+    if user is None:
+        await ws.close(code=1008)  # policy violation
+        return
+    scope = user_scope(user)
+    await ws.accept()
+
+    # ✅ 연결을 ws_manager에 등록 (push_telemetry()가 여기로 broadcast함)
+    # 접근 범위가 있는 사용자는 구독 인덱스에 범위 안 pattern 만 등록됨
     try:
+        await ws_manager.connect(
+            ws,
+            scope=None if scope is None else scope_patterns(*scope),
+            user=user.get("sub"),
+        )
+    except Exception:
+        try:
+            await ws.close()
+        except Exception:
+            pass
+        return
+
+    # ✅ 연결 직후 확인용 1회 메시지 (범위 제한이 있으면 scope 도 알려줌)
+    hello = {"type": "ping", "hello": "connected"}
+    if scope is not None:
+        hello["scope"] = ws_manager.scope(ws)
+    await ws_manager.send(ws, json.dumps(hello, ensure_ascii=False))
+
+    ka = asyncio.create_task(_keepalive(ws))
+    try:
+        # ✅ subscribe / unsubscribe 수신 (연결이 끊기면 WebSocketDisconnect)
         while True:
-            # 클라이언트 메시지 받을 필요 없으면, keepalive만
-            await asyncio.sleep(30)
-            try:
-                await ws.send_text('{"type":"ping"}')
-            except Exception:
-                break
+            text = await ws.receive_text()
+            await _handle_client_message(ws, text)
     except WebSocketDisconnect:
         pass
+    except Exception:
+        pass
     finally:
-        await ws_manager.disconnect(ws)
\ No newline at end of file
+        ka.cancel()
+        try:
+            await ws_manager.disconnect(ws)
+        except Exception:
+            pass
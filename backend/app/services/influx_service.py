@@ -1,53 +1,406 @@
 # app/services/influx_service.py
+import time
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional
+
 from app.core.config import (
-    INFLUX_URL, INFLUX_TOKEN, INFLUX_ORG, INFLUX_BUCKET, INFLUX_MEASUREMENT
+    INFLUX_URL, INFLUX_TOKEN, INFLUX_ORG, INFLUX_BUCKET, INFLUX_MEASUREMENT,
+    INFLUX_BATCH_SIZE, INFLUX_FLUSH_MS, INFLUX_QUEUE_MAX,
+    INFLUX_MAX_RETRIES, INFLUX_RETRY_BASE_MS,
+    INFLUX_SPOOL_DIR, INFLUX_SPOOL_SEGMENT_MB, INFLUX_SPOOL_MAX_MB,
+    INFLUX_SPOOL_POLICY, INFLUX_SPOOL_REPLAY_SEC, CONNECT_RETRY_MAX_SEC,
 )
-from app.domain.device_store import normalize_payload, build_channels_from_payload
+from app.domain.device_store import TelemetryRecord
+from app.core.log import get_logger, log_limited
+from app.core.health import get_state, set_state
+from app.core.metrics import INFLUX_BATCH_POINTS, INFLUX_WRITE_SECONDS, INFLUX_WRITE_FAILURES
+from app.services.influx_spool import Spool, has_segments
+from app.services.line_protocol import LineEncoder
 
-try:
-    from influxdb_client import InfluxDBClient, Point, WritePrecision
-    from influxdb_client.client.write_api import SYNCHRONOUS
-except Exception:
-    InfluxDBClient = None
-    Point = None
-    WritePrecision = None
-    SYNCHRONOUS = None
+log = get_logger(__name__)
 
 _influx_client = None
 _influx_write = None
+_writer: Optional["InfluxBatchWriter"] = None
 
-def init_influx():
+# ✅ influxdb_client (~100ms import) 는 백그라운드 연결 스레드에서 import
+_connect_stop = threading.Event()
+_connect_thread: Optional[threading.Thread] = None
+
+
+class InfluxBatchWriter:
+    """
+    ✅ bounded 큐 + 백그라운드 flusher
+    - enqueue()는 절대 블로킹하지 않음 (큐가 가득 차면 drop 카운트만 증가)
+    - batch_size 개가 모이거나 flush_interval 이 지나면 write_fn(lines) 호출
+    - 실패 시 지수 backoff 로 max_retries 회 재시도, 그래도 실패하면
+      spool 이 있으면 디스크에 기록 (없으면 failed 카운트 = 유실)
+    - spool 에 쓴 뒤에는 장애 상태(down): 새 batch 는 재시도 없이 바로 spool 로,
+      replay_interval 마다 가장 오래된 segment 를 batch_size 씩 써보며 복구 확인
+      -> 복구되면 live batch 는 다시 바로 쓰고, 남은 spool 은 사이사이 순서대로 비움
+    큐 항목은 line-protocol 1줄(bytes, 개행 없음) = point 1개.
+    write_fn 은 그 리스트를 받아 쓰기만 하면 되므로
+    로컬 fake Influx HTTP 서버에 붙여 테스트할 수 있음.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[bytes]], None],
+        batch_size: int = INFLUX_BATCH_SIZE,
+        flush_interval: float = INFLUX_FLUSH_MS / 1000.0,
+        max_queue: int = INFLUX_QUEUE_MAX,
+        max_retries: int = INFLUX_MAX_RETRIES,
+        retry_base: float = INFLUX_RETRY_BASE_MS / 1000.0,
+        retry_max: float = 30.0,
+        spool: Optional[Spool] = None,
+        replay_interval: float = INFLUX_SPOOL_REPLAY_SEC,
+    ) -> None:
+        self._write_fn = write_fn
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base = max(0.0, float(retry_base))
+        self.retry_max = float(retry_max)
+        self.spool = spool
+        self.replay_interval = max(0.1, float(replay_interval))
+
+        self._q: "queue.Queue[bytes]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+
+        # replay 상태 (flusher 스레드 전용)
+        self._down = False
+        self._next_replay = 0.0
+        self._replay: Optional[tuple] = None     # (seq, lines, offset)
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.spooled = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_ts: Optional[float] = None
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """남은 큐를 한 번 flush 하고 종료 (timeout 안에서)"""
+        self._stop.set()
+        try:
+            self._q.put_nowait(b"")   # flush_interval 대기 중인 get 깨우기 (가득 차 있으면 어차피 안 기다림)
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        if self.spool:
+            self.spool.close()
+
+    def backlog(self) -> bool:
+        """장애 중이거나 spool 에 남은 point 가 있음 (Influx 조회 결과가 아직 완전하지 않음)"""
+        return self._down or self._replay is not None or bool(self.spool and self.spool.pending())
+
+    def resume(self) -> None:
+        """연결이 (다시) 확인됨 -> replay_interval 을 기다리지 않고 다음 루프에서 spool replay"""
+        self._next_replay = 0.0
+
+    # -----------------------------
+    # producer side (MQTT 스레드)
+    # -----------------------------
+    def enqueue(self, lines: List[bytes]) -> int:
+        """큐에 넣은 개수 반환. 가득 차면 나머지는 drop."""
+        put = 0
+        for line in lines:
+            try:
+                self._q.put_nowait(line)
+                put += 1
+            except queue.Full:
+                break
+        with self._stats_lock:
+            self.enqueued += put
+            self.dropped += len(lines) - put
+        return put
+
+    # -----------------------------
+    # consumer side (flusher 스레드)
+    # -----------------------------
+    def _run(self) -> None:
+        batch: List[bytes] = []
+        deadline = 0.0
+
+        while True:
+            if self._stop.is_set() and self._q.empty():
+                break
+
+            timeout = self.flush_interval if not batch else max(0.0, deadline - time.monotonic())
+            replay_due = self._replay_due()
+            if replay_due:
+                timeout = 0.0
+            try:
+                line = self._q.get(timeout=timeout)
+                if line:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(line)
+            except queue.Empty:
+                pass
+
+            # 종료 중에도 batch_size 씩 묶어서 (남은 큐를 point 1개씩 쓰지 않음)
+            if batch and (
+                len(batch) >= self.batch_size
+                or time.monotonic() >= deadline
+                or (self._stop.is_set() and self._q.empty())
+            ):
+                self._flush(batch)
+                batch = []
+
+            if replay_due:
+                self._replay_step()
+
+        if batch:
+            self._flush(batch)
+
+    def _write(self, batch: List[bytes]) -> None:
+        t0 = time.perf_counter()
+        self._write_fn(batch)
+        INFLUX_WRITE_SECONDS.observe(time.perf_counter() - t0)
+        with self._stats_lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_ts = time.time()
+
+    def _flush(self, batch: List[bytes]) -> None:
+        attempt = 0
+        INFLUX_BATCH_POINTS.observe(len(batch))
+        if self._down and self.spool:
+            # 장애 중: 복구 확인은 replay 가 담당 -> live batch 는 바로 spool
+            self._to_spool(batch)
+            return
+        while True:
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                with self._stats_lock:
+                    self.last_error = repr(e)
+                if attempt >= self.max_retries or self._stop.is_set():
+                    if self.spool:
+                        log_limited(log, "influx-write", "⚠️ Influx write failed: %r (spooling %d points)", e, len(batch), level=logging.WARNING)
+                        self._mark_down()
+                        self._to_spool(batch)
+                        return
+                    with self._stats_lock:
+                        self.failed += len(batch)
+                    INFLUX_WRITE_FAILURES.inc()
+                    log_limited(log, "influx-write", "❌ Influx write failed: %r (dropped %d points)", e, len(batch))
+                    return
+                delay = min(self.retry_max, self.retry_base * (2 ** attempt))
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                # stop 요청이 오면 backoff 대기도 바로 끝냄
+                self._stop.wait(delay)
+
+    # -----------------------------
+    # spool (flusher 스레드)
+    # -----------------------------
+    def _mark_down(self) -> None:
+        self._down = True
+        self._next_replay = time.monotonic() + self.replay_interval
+
+    def _to_spool(self, batch: List[bytes]) -> None:
+        try:
+            put = self.spool.append(batch)
+        except OSError as e:
+            put = 0
+            log_limited(log, "influx-spool", "❌ Influx spool write failed: %r", e)
+        with self._stats_lock:
+            self.spooled += put
+            self.failed += len(batch) - put
+        if put < len(batch):
+            INFLUX_WRITE_FAILURES.inc()
+
+    def _replay_due(self) -> bool:
+        if not self.spool or self._stop.is_set():
+            return False
+        if self._replay is None and not self.spool.pending():
+            return False
+        return not self._down or time.monotonic() >= self._next_replay
+
+    def _replay_step(self) -> None:
+        """가장 오래된 segment 에서 batch_size 만큼 1번 쓰기 (실패하면 replay_interval 뒤 다시)"""
+        if self._replay is None:
+            head = self.spool.peek()
+            if head is None:
+                return
+            self._replay = (head[0], head[1], 0)
+        seq, lines, offset = self._replay
+        chunk = lines[offset:offset + self.batch_size]
+        if chunk:
+            try:
+                self._write(chunk)
+            except Exception as e:
+                with self._stats_lock:
+                    self.last_error = repr(e)
+                self._mark_down()
+                return
+            if self._down:
+                self._down = False
+                log.info("✅ Influx reachable again -> replaying spool")
+            offset += len(chunk)
+        if offset >= len(lines):
+            self.spool.ack(seq)
+            self._replay = None
+        else:
+            self._replay = (seq, lines, offset)
+
+    # -----------------------------
+    # stats
+    # -----------------------------
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = {
+                "queue_depth": self._q.qsize(),
+                "queue_max": self._q.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "retries": self.retries,
+                "spooled": self.spooled,
+                "down": self._down,
+                "last_error": self.last_error,
+                "last_flush_ts": self.last_flush_ts,
+            }
+        if self.spool:
+            out["spool"] = self.spool.stats()
+        return out
+
+
+def _write_lines(lines: List[bytes]) -> None:
+    # flusher 스레드 전용: 여기서만 SYNCHRONOUS HTTP 왕복이 일어남
+    # body 는 join 1번 (bytes 로 넘기면 client 가 다시 직렬화하지 않음)
+    # 연결 전이면 실패 -> 재시도/spool 경로 (연결되면 replay)
+    write_api = _influx_write
+    if write_api is None:
+        raise RuntimeError("influx not connected")
+    write_api.write(
+        bucket=INFLUX_BUCKET,
+        org=INFLUX_ORG,
+        record=b"\n".join(lines),
+        write_precision="ns",
+    )
+
+
+def _open_spool() -> Optional[Spool]:
+    if not INFLUX_SPOOL_DIR:
+        return None
+    try:
+        spool = Spool(
+            INFLUX_SPOOL_DIR,
+            segment_bytes=int(INFLUX_SPOOL_SEGMENT_MB * 1024 * 1024),
+            max_bytes=int(INFLUX_SPOOL_MAX_MB * 1024 * 1024),
+            policy=INFLUX_SPOOL_POLICY,
+        )
+    except OSError as e:
+        log.warning("⚠️ Influx spool disabled (%s): %r", INFLUX_SPOOL_DIR, e)
+        return None
+    st = spool.stats()
+    if st["segments"]:
+        log.info("📦 Influx spool has %d segments (%d bytes) to replay", st["segments"], st["bytes"])
+    return spool
+
+
+def _connect() -> None:
+    """백그라운드: client 생성 + ping 성공할 때까지 backoff 재시도"""
     global _influx_client, _influx_write
-    if not (InfluxDBClient and Point and WritePrecision and SYNCHRONOUS):
-        print("⚠️ influxdb-client not available -> skip Influx")
-        return
-    if not (INFLUX_URL and INFLUX_TOKEN and INFLUX_ORG and INFLUX_BUCKET):
-        print("⚠️ Influx env missing -> skip Influx")
+    try:
+        from influxdb_client import InfluxDBClient
+        from influxdb_client.client.write_api import SYNCHRONOUS
+    except Exception as e:
+        log.warning("⚠️ influxdb-client not available -> skip Influx (%r)", e)
+        set_state("influx", "disabled", "influxdb-client not installed")
         return
 
-    try:
-        _influx_client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
+    delay = 1.0
+    while not _connect_stop.is_set():
+        client = None
         try:
-            ok = _influx_client.ping()
-            print("✅ Influx ping:", ok)
+            client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
+            if not client.ping():
+                raise RuntimeError("ping failed")
+            _influx_write = client.write_api(write_options=SYNCHRONOUS)
+            _influx_client = client
         except Exception as e:
-            print("⚠️ Influx ping failed:", repr(e))
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            set_state("influx", "connecting", f"{e!r} (retry in {delay:.0f}s)")
+            log_limited(log, "influx-connect", "⚠️ Influx connect failed: %r -> retry in %.0fs", e, delay, level=logging.WARNING)
+            _connect_stop.wait(delay)
+            delay = min(delay * 2, CONNECT_RETRY_MAX_SEC)
+            continue
 
-        _influx_write = _influx_client.write_api(write_options=SYNCHRONOUS)
+        set_state("influx", "ready")
+        if _writer:
+            _writer.resume()
+        log.info("✅ Influx connected: %s", INFLUX_URL)
+        return
 
-        print("✅ Influx ready:", {
-            "url": INFLUX_URL,
-            "org": INFLUX_ORG,
-            "bucket": INFLUX_BUCKET,
-            "meas": INFLUX_MEASUREMENT,
-        })
-    except Exception as e:
-        print("❌ Influx init failed:", repr(e))
-        _influx_client = None
-        _influx_write = None
+
+def init_influx():
+    """writer 는 바로 시작 (연결 전 point 는 spool), 연결은 백그라운드 스레드에서 재시도"""
+    global _writer, _connect_thread
+    if not (INFLUX_URL and INFLUX_TOKEN and INFLUX_ORG and INFLUX_BUCKET):
+        log.warning("⚠️ Influx env missing -> skip Influx")
+        set_state("influx", "disabled", "env missing")
+        return
+    if _writer:
+        return
+
+    _writer = InfluxBatchWriter(_write_lines, spool=_open_spool())
+    _writer.start()
+    log.info("✅ Influx writer started: %s", {
+        "url": INFLUX_URL,
+        "org": INFLUX_ORG,
+        "bucket": INFLUX_BUCKET,
+        "meas": INFLUX_MEASUREMENT,
+        "batch_size": _writer.batch_size,
+        "flush_sec": _writer.flush_interval,
+    })
+
+    set_state("influx", "connecting")
+    _connect_stop.clear()
+    _connect_thread = threading.Thread(target=_connect, name="influx-connect", daemon=True)
+    _connect_thread.start()
 
 def close_influx():
-    global _influx_client, _influx_write
+    global _influx_client, _influx_write, _writer, _connect_thread
+    _connect_stop.set()
+    if _connect_thread:
+        _connect_thread.join(timeout=2)
+        _connect_thread = None
+    try:
+        if _writer:
+            _writer.stop()
+    except Exception:
+        pass
     try:
         if _influx_client:
             _influx_client.close()
@@ -55,72 +408,52 @@ def close_influx():
         pass
     _influx_client = None
     _influx_write = None
+    _writer = None
 
-def write_to_influx(device_meta: dict, payload: dict, now_ts: float):
-    if not _influx_write:
-        return
+def influx_enabled() -> bool:
+    return _influx_client is not None
 
-    snap = normalize_payload(payload if isinstance(payload, dict) else {})
-    channels = build_channels_from_payload(payload if isinstance(payload, dict) else {})
-
-    country = device_meta.get("country")
-    site_id = device_meta.get("site_id")
-    model = device_meta.get("model")
-    device_id = device_meta.get("device_id")
-    last_type = device_meta.get("last_type")
-
-    ts_ns = int(now_ts * 1_000_000_000)
-    points = []
-
-    # 1) summary point
-    p_sum = Point(INFLUX_MEASUREMENT).time(ts_ns, WritePrecision.NS)
-    p_sum.tag("country", str(country))
-    p_sum.tag("site_id", str(site_id))
-    p_sum.tag("model", str(model))
-    p_sum.tag("device_id", str(device_id))
-    p_sum.tag("type", str(last_type))
-    p_sum.tag("scope", "summary")
-
-    for k in ["kw", "kwh", "v_avg", "a_avg", "pf_avg",
-              "v_l1", "v_l2", "v_l3",
-              "a_l1", "a_l2", "a_l3",
-              "pf_l1", "pf_l2", "pf_l3"]:
-        v = snap.get(k)
-        if v is not None:
-            p_sum.field(k, float(v))
-
-    di = snap.get("di")
-    if isinstance(di, dict):
-        for i, v in di.items():
-            if v is None:
-                continue
-            p_sum.field(f"di{i}", int(v))
-
-    points.append(p_sum)
-
-    # 2) channel points
-    for ch in channels:
-        term = ch.get("term", "in")
-        phase = ch.get("phase", "L1")
-
-        p_ch = Point(INFLUX_MEASUREMENT).time(ts_ns, WritePrecision.NS)
-        p_ch.tag("country", str(country))
-        p_ch.tag("site_id", str(site_id))
-        p_ch.tag("model", str(model))
-        p_ch.tag("device_id", str(device_id))
-        p_ch.tag("type", str(last_type))
-        p_ch.tag("scope", "channel")
-        p_ch.tag("term", str(term))
-        p_ch.tag("phase", str(phase))
-
-        for k in ["v", "a", "kw", "pf"]:
-            v = ch.get(k)
-            if v is not None:
-                p_ch.field(k, float(v))
-
-        points.append(p_ch)
+def query_flux(flux: str) -> List[tuple]:
+    """Flux 실행 -> [(_time, _value), ...] (Influx 미설정이면 RuntimeError)"""
+    if not _influx_client:
+        raise RuntimeError("influx not configured")
+    tables = _influx_client.query_api().query(flux, org=INFLUX_ORG)
+    out = []
+    for table in tables:
+        for rec in table.records:
+            out.append((rec.get_time(), rec.get_value()))
+    return out
 
-    try:
-        _influx_write.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=points)
-    except Exception as e:
-        print("❌ Influx write failed:", repr(e))
\ No newline at end of file
+def write_backlog() -> bool:
+    """Influx 에 아직 못 쓴 point 가 있는지: 연결 안 됨 / 이 프로세스 writer 장애·spool /
+    spool 디렉터리에 남은 segment (ingest 가 다른 프로세스여도 같은 INFLUX_SPOOL_DIR 로 확인)"""
+    if get_state("influx") != "ready":
+        return True
+    if _writer and _writer.backlog():
+        return True
+    return bool(INFLUX_SPOOL_DIR) and has_segments(INFLUX_SPOOL_DIR)
+
+def get_influx_stats() -> dict:
+    """큐 깊이 / drop / 실패 카운트 (writer 미기동이면 enabled=False)"""
+    if not _writer:
+        return {"enabled": False}
+    return {"enabled": True, **_writer.stats()}
+
+def write_lines(lines: List[str]) -> int:
+    """이미 만든 line-protocol 을 배치 writer 큐에 넣음 (rollup 등)"""
+    if not _writer:
+        return 0
+    return _writer.enqueue([ln.encode("utf-8") for ln in lines if ln])
+
+
+_encoder = LineEncoder(INFLUX_MEASUREMENT)
+
+
+def write_to_influx(rec: TelemetryRecord):
+    if not _writer:
+        return
+
+    # ✅ on_message 에서 만든 record 재사용 (여기서 다시 정규화하지 않음)
+    # ✅ Point 객체 없이 캐시된 태그 prefix + field 값만 포맷해서 bytes 로
+    # ✅ HTTP 왕복 없이 큐에만 넣음 (flusher 스레드가 배치로 전송)
+    _writer.enqueue(_encoder.encode(rec))
@@ -0,0 +1,214 @@
+# app/services/influx_spool.py
+"""
+✅ Influx 쓰기 실패 batch 의 디스크 spool (write-ahead)
+
+- 디렉터리 안에 segment 파일 spool-000000000001.lp, ... (line protocol, 줄 단위)
+  append 는 현재 segment 끝에 쓰고 fsync, segment_bytes 를 넘으면 다음 segment 로 회전
+- replay 는 가장 오래된 segment 부터 순서대로 (InfluxBatchWriter 가 peek -> 쓰기 성공 -> ack 로 삭제)
+  읽는 segment 가 현재 쓰는 segment 면 먼저 회전시켜서 읽는 파일은 더 이상 바뀌지 않음
+- 전체 크기 상한 max_bytes:
+    drop_oldest : 오래된 segment 부터 삭제하고 새 batch 를 받음 (최근 데이터 우선)
+    drop_newest : 새 batch 를 버림 (이미 쌓인 과거 데이터 우선)
+- 재시작해도 남은 segment 를 그대로 이어서 replay (같은 point 를 다시 써도 Influx 에서는 덮어쓰기)
+  쓰는 도중 죽어서 개행 없이 잘린 마지막 줄은 replay 에서 버림
+"""
+import os
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+_PREFIX = "spool-"
+_SUFFIX = ".lp"
+
+
+class _Segment:
+    __slots__ = ("seq", "path", "size", "lines")
+
+    def __init__(self, seq: int, path: str, size: int, lines: Optional[int]) -> None:
+        self.seq = seq
+        self.path = path
+        self.size = size
+        self.lines = lines   # 재시작 후 발견한 segment 는 None (필요할 때 셈)
+
+
+class Spool:
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_bytes: int = 512 * 1024 * 1024,
+        policy: str = DROP_OLDEST,
+        fsync: bool = True,
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = max(1024, int(segment_bytes))
+        self.max_bytes = max(self.segment_bytes, int(max_bytes))
+        self.policy = policy if policy in (DROP_OLDEST, DROP_NEWEST) else DROP_OLDEST
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._segments: Deque[_Segment] = deque()
+        self._active = None          # 열린 파일 객체 (마지막 segment 에 append 중)
+        self._total = 0
+
+        self.appended = 0
+        self.replayed = 0
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith(_PREFIX) and name.endswith(_SUFFIX)):
+                continue
+            try:
+                seq = int(name[len(_PREFIX):-len(_SUFFIX)])
+            except ValueError:
+                continue
+            path = os.path.join(directory, name)
+            size = os.path.getsize(path)
+            if size == 0:
+                os.unlink(path)
+                continue
+            self._segments.append(_Segment(seq, path, size, None))
+            self._total += size
+        self._next_seq = (self._segments[-1].seq + 1) if self._segments else 1
+
+    # -----------------------------
+    # write (flusher 스레드)
+    # -----------------------------
+    def append(self, lines: List[bytes]) -> int:
+        """spool 에 넣은 줄 수 (drop_newest 로 거절되면 0)"""
+        if not lines:
+            return 0
+        data = b"\n".join(lines) + b"\n"
+        with self._lock:
+            if self._total + len(data) > self.max_bytes:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += len(lines)
+                    return 0
+                while self._segments and self._total + len(data) > self.max_bytes:
+                    self._drop_oldest()
+
+            if self._active is None or self._segments[-1].size + len(data) > self.segment_bytes:
+                self._rotate()
+            seg = self._segments[-1]
+            self._active.write(data)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            seg.size += len(data)
+            seg.lines = (seg.lines or 0) + len(lines)
+            self._total += len(data)
+            self.appended += len(lines)
+            return len(lines)
+
+    def _rotate(self) -> None:
+        self._close_active()
+        seq = self._next_seq
+        self._next_seq += 1
+        path = os.path.join(self.directory, f"{_PREFIX}{seq:012d}{_SUFFIX}")
+        self._active = open(path, "ab")
+        self._segments.append(_Segment(seq, path, 0, 0))
+
+    def _close_active(self) -> None:
+        if self._active is not None:
+            try:
+                self._active.close()
+            except OSError:
+                pass
+            self._active = None
+
+    def _drop_oldest(self) -> None:
+        seg = self._segments.popleft()
+        if not self._segments:
+            self._close_active()
+        lines = seg.lines
+        if lines is None:
+            try:
+                with open(seg.path, "rb") as f:
+                    lines = f.read().count(b"\n")
+            except OSError:
+                lines = 0
+        self.dropped += lines
+        self._total -= seg.size
+        try:
+            os.unlink(seg.path)
+        except OSError:
+            pass
+
+    # -----------------------------
+    # replay
+    # -----------------------------
+    def peek(self) -> Optional[Tuple[int, List[bytes]]]:
+        """가장 오래된 segment (seq, lines). 없으면 None"""
+        with self._lock:
+            if not self._segments:
+                return None
+            seg = self._segments[0]
+            if len(self._segments) == 1 and self._active is not None:
+                # 쓰는 중인 segment -> 닫아서 고정 (다음 append 는 새 segment)
+                self._close_active()
+            path = seg.path
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        if not raw.endswith(b"\n"):
+            # append 도중 프로세스가 죽어 마지막 줄이 잘림 -> 깨진 point 는 보내지 않음
+            raw = raw[:raw.rfind(b"\n") + 1]
+        lines = [ln for ln in raw.split(b"\n") if ln]
+        if seg.lines is None:
+            seg.lines = len(lines)
+        return seg.seq, lines
+
+    def ack(self, seq: int) -> None:
+        """seq segment 전부 Influx 에 기록됨 -> 삭제"""
+        with self._lock:
+            if not self._segments or self._segments[0].seq != seq:
+                return
+            seg = self._segments.popleft()
+            self._total -= seg.size
+            self.replayed += seg.lines or 0
+        try:
+            os.unlink(seg.path)
+        except OSError:
+            pass
+
+    def pending(self) -> bool:
+        return bool(self._segments)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_active()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "dir": self.directory,
+                "segments": len(self._segments),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "appended": self.appended,
+                "replayed": self.replayed,
+                "dropped": self.dropped,
+            }
+
+
+def has_segments(directory: str) -> bool:
+    """디렉터리에 아직 replay 안 된 segment 가 있는지 (spool 을 연 프로세스가 아니어도 확인 가능)"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return False
+    for name in names:
+        if name.startswith(_PREFIX) and name.endswith(_SUFFIX):
+            try:
+                if os.path.getsize(os.path.join(directory, name)) > 0:
+                    return True
+            except OSError:
+                continue
+    return False
@@ -0,0 +1,167 @@
+# app/services/ingest_pool.py
+"""
+✅ MQTT 수신 처리 풀 (paho 네트워크 스레드에서 분리)
+
+- on_message 는 (topic, bytes, ts) 를 shard 큐에 넣기만 함 -> 처리 시간이 keepalive / QoS ack 를 밀지 않음
+- shard = topic 의 country/site_id/model/device_id 해시 -> 같은 장치는 항상 같은 스레드 (순서 보장)
+- shard 큐가 가득 차면 submit(timeout) 만큼 기다림 (네트워크 스레드 backpressure -> 브로커 전송도 늦춰짐)
+  그래도 차 있으면 drop + 카운트 후 False (호출한 쪽이 PUBACK 을 보내지 않음)
+- stats(): shard 별 큐 깊이, 처리 수, drop, 에러, 수신->처리완료 지연 (누적 sum/count/max)
+  읽어도 리셋하지 않음 -> 구간 평균은 호출하는 쪽에서 두 시점의 차이로 계산
+"""
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from app.core.log import get_logger, log_limited
+from app.core.metrics import Histogram
+
+log = get_logger(__name__)
+
+INGEST_LATENCY_SECONDS = Histogram("monitor_ingest_latency_seconds", "MQTT receive to processed latency")
+
+_STOP = None
+
+
+def shard_key(topic: str) -> str:
+    """th/site001/pg46/001/meter -> th/site001/pg46/001 (장치 단위)"""
+    return "/".join(topic.split("/", 4)[:4])
+
+
+class _Shard:
+    __slots__ = (
+        "queue", "thread", "processed", "dropped", "errors",
+        "lat_sum", "lat_max", "lat_n", "drop_lock",
+    )
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: "queue.Queue" = queue.Queue(maxsize)
+        self.thread: Optional[threading.Thread] = None
+        self.processed = 0
+        self.dropped = 0     # submit 쪽 (paho 스레드 여러 개) -> drop_lock 안에서만 증가
+        self.errors = 0      # 나머지 카운터는 이 shard 의 worker 스레드만 씀
+        # 시작 이후 누적 (stats() 가 리셋하지 않음)
+        self.lat_sum = 0.0
+        self.lat_max = 0.0
+        self.lat_n = 0
+        self.drop_lock = threading.Lock()   # drop 은 큐가 찼을 때만 -> 평소 경로에는 lock 없음
+
+
+class IngestPool:
+    def __init__(
+        self,
+        handler: Callable[[str, bytes, float], None],
+        workers: int = 4,
+        queue_max: int = 10000,
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_max = max(1, int(queue_max))
+        self._shards: List[_Shard] = []
+
+    def start(self) -> None:
+        if self._shards:
+            return
+        per_shard = max(1, self.queue_max // self.workers)
+        self._shards = [_Shard(per_shard) for _ in range(self.workers)]
+        for i, sh in enumerate(self._shards):
+            sh.thread = threading.Thread(target=self._run, args=(sh,), name=f"ingest-{i}", daemon=True)
+            sh.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """남은 큐를 처리한 뒤 종료"""
+        shards, self._shards = self._shards, []
+        for sh in shards:
+            sh.queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for sh in shards:
+            if sh.thread:
+                sh.thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def running(self) -> bool:
+        return bool(self._shards)
+
+    # -----------------------------
+    # paho 네트워크 스레드
+    # -----------------------------
+    def submit(self, topic: str, payload: bytes, ts: float, timeout: float = 0.0) -> bool:
+        """큐에 넣었으면 True. 가득 차면 timeout 초까지 기다리고, 그래도 못 넣으면 False"""
+        shards = self._shards
+        if not shards:
+            # stop() 이 이미 shard 를 비움 -> 받지 않음
+            return False
+        sh = shards[hash(shard_key(topic)) % len(shards)]
+        try:
+            if timeout > 0:
+                sh.queue.put((topic, payload, ts), timeout=timeout)
+            else:
+                sh.queue.put_nowait((topic, payload, ts))
+            return True
+        except queue.Full:
+            with sh.drop_lock:
+                sh.dropped += 1
+            return False
+
+    # -----------------------------
+    # worker 스레드
+    # -----------------------------
+    def _run(self, sh: _Shard) -> None:
+        handler = self.handler
+        get = sh.queue.get
+        while True:
+            item = get()
+            if item is _STOP:
+                return
+            topic, payload, ts = item
+            try:
+                handler(topic, payload, ts)
+            except Exception as e:
+                sh.errors += 1
+                log_limited(log, "ingest-handler", "❌ ingest handler error: %r", e)
+            lat = time.time() - ts
+            INGEST_LATENCY_SECONDS.observe(lat)
+            sh.processed += 1
+            sh.lat_sum += lat
+            sh.lat_n += 1
+            if lat > sh.lat_max:
+                sh.lat_max = lat
+
+    def depth(self) -> int:
+        return sum(sh.queue.qsize() for sh in self._shards)
+
+    def dropped(self) -> int:
+        return sum(sh.dropped for sh in self._shards)
+
+    def stats(self) -> dict:
+        """
+        누적 카운터만 반환 (읽어도 리셋 안 함)
+        구간 평균 지연 = Δlatency_sum_sec / Δlatency_count (두 번 읽어서 차이)
+        """
+        shards = []
+        for sh in self._shards:
+            n = sh.lat_n
+            shards.append({
+                "depth": sh.queue.qsize(),
+                "processed": sh.processed,
+                "dropped": sh.dropped,
+                "errors": sh.errors,
+                "latency_sum_sec": round(sh.lat_sum, 6),
+                "latency_count": n,
+                "latency_avg_ms": round(sh.lat_sum / n * 1000, 3) if n else 0.0,
+                "latency_max_ms": round(sh.lat_max * 1000, 3),
+            })
+        lat_sum = sum(s["latency_sum_sec"] for s in shards)
+        lat_n = sum(s["latency_count"] for s in shards)
+        return {
+            "workers": self.workers,
+            "depth": sum(s["depth"] for s in shards),
+            "processed": sum(s["processed"] for s in shards),
+            "dropped": sum(s["dropped"] for s in shards),
+            "errors": sum(s["errors"] for s in shards),
+            "latency_sum_sec": round(lat_sum, 6),
+            "latency_count": lat_n,
+            "latency_avg_ms": round(lat_sum / lat_n * 1000, 3) if lat_n else 0.0,
+            "latency_max_ms": max((s["latency_max_ms"] for s in shards), default=0.0),
+            "shards": shards,
+        }
@@ -0,0 +1,320 @@
+# app/services/ipc_service.py
+"""
+✅ ingest 프로세스 -> worker 프로세스 record 전달 (Unix domain socket)
+
+  ingest (MQTT 1개) --[frame]--> worker 1..N (uvicorn --workers N)
+
+- frame = header(4 bytes 길이 + 8 bytes seq, big-endian) + JSON(TelemetryRecord 필드 list)
+  (pickle 은 받는 쪽에서 코드 실행이 가능해서 쓰지 않음)
+- seq: ingest 가 publish 순서대로 붙이는 번호 (시작값 = 시작 시각 us -> 재시작해도 이전보다 큼)
+  worker 는 이를 registry version 으로 씀 -> 모든 worker 의 ETag / ?since= 가 같음
+  snapshot 도 seq 순서로 보내고, 등록 이후 publish 는 그보다 큰 seq -> worker 에서 항상 증가
+- 소켓은 소유자 전용(0700) 디렉터리 안, 양쪽 모두 SO_PEERCRED 로 상대가 같은 uid 인지 확인
+- 새 worker 가 붙으면 현재 registry 전체를 먼저 보내서 replica 를 채움
+  (snapshot 직렬화는 peer 송신 스레드에서 -> publish 를 막지 않음)
+- worker 별 송신 큐 + 송신 스레드: 느린 worker 가 MQTT 스레드를 막지 않음
+  (IPC_QUEUE_MAX 초과 시 새 record 는 drop -> 다음 메시지에서 따라잡음)
+- worker 는 이벤트 루프에서 읽어서 put_record / history / WS fan-out 까지 처리
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import stat
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import IPC_SOCKET, IPC_QUEUE_MAX
+from app.domain.device_store import registry, TelemetryRecord, put_record
+from app.domain.timeseries import history
+from app.core.log import get_logger, log_limited
+from app.core.health import set_state
+
+log = get_logger(__name__)
+
+_HEADER = struct.Struct(">IQ")   # body 길이, seq
+_STOP = object()
+
+
+def encode_body(rec: TelemetryRecord) -> bytes:
+    return json.dumps(
+        [rec.key, rec.meta, rec.payload, rec.summary, rec.channels, rec.ts],
+        ensure_ascii=False, separators=(",", ":"), default=str,
+    ).encode("utf-8")
+
+
+def encode_record(rec: TelemetryRecord, seq: int = 0) -> bytes:
+    body = encode_body(rec)
+    return _HEADER.pack(len(body), seq) + body
+
+
+def decode_record(body: bytes) -> TelemetryRecord:
+    key, meta, payload, summary, channels, ts = json.loads(body)
+    return TelemetryRecord(key, meta, payload, summary, channels, ts)
+
+
+def _peer_uid(sock: socket.socket) -> Optional[int]:
+    """Unix socket 상대 프로세스 uid (SO_PEERCRED 없는 OS 는 None)"""
+    opt = getattr(socket, "SO_PEERCRED", None)
+    if opt is None:
+        return None
+    _, uid, _ = struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, opt, struct.calcsize("3i")))
+    return uid
+
+
+def _same_user(sock: socket.socket) -> bool:
+    uid = _peer_uid(sock)
+    return uid is None or uid == os.geteuid()
+
+
+def _private_dir(path: str) -> None:
+    """소켓 디렉터리: 없으면 0700 으로 만들고, 있으면 내 소유 + group/other 권한 없음을 확인"""
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, mode=0o700, exist_ok=True)
+    st = os.lstat(d)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"IPC socket dir must be a private (0700) directory owned by this user: {d}")
+
+
+# =========================================================
+# ingest side
+# =========================================================
+class _Peer:
+    __slots__ = ("conn", "seqs", "queue", "thread", "sent", "dropped", "alive")
+    # queue 에는 등록 이후 publish 된 frame 만 쌓이고, run() 이 snapshot 을 먼저 보낸 뒤 꺼냄
+
+    def __init__(self, conn: socket.socket) -> None:
+        self.conn = conn
+        self.seqs: Dict[str, int] = {}   # 등록 시점의 key -> seq (snapshot version)
+        self.queue: "queue.Queue" = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.sent = 0
+        self.dropped = 0
+        self.alive = True
+
+    def offer(self, frame: bytes, limit: int) -> None:
+        if self.queue.qsize() >= limit:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(frame)
+
+    def run(self) -> None:
+        try:
+            # ✅ 등록 후에 읽은 snapshot -> 등록 전 publish 는 전부 포함, 이후 것은 queue 로 뒤따름
+            # seq 순서로 보냄 (아직 seq 가 없는 record 는 곧 publish 되어 queue 로 옴)
+            seqs, self.seqs = self.seqs, {}
+            snap = sorted((seqs[r.key], r) for r in registry.values() if r.key in seqs)
+            for seq, rec in snap:
+                self.conn.sendall(encode_record(rec, seq))
+                self.sent += 1
+            while True:
+                frame = self.queue.get()
+                if frame is _STOP:
+                    break
+                self.conn.sendall(frame)
+                self.sent += 1
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+
+
+class RecordPublisher:
+    def __init__(self, path: str = IPC_SOCKET, queue_max: int = IPC_QUEUE_MAX) -> None:
+        self.path = path
+        self.queue_max = max(1, int(queue_max))
+        self._sock: Optional[socket.socket] = None
+        self._peers: List[_Peer] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.published = 0
+        self._seq = time.time_ns() // 1000
+        self._seqs: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if self._sock:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        # publisher 전에 registry 에 들어온 record (스냅샷 로드 등) 도 seq 를 받음 (ts 순)
+        with self._lock:
+            for rec in registry.values():
+                self._seq += 1
+                self._seqs[rec.key] = self._seq
+        _private_dir(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        sock.listen(64)
+        self._sock = sock
+        self._thread = threading.Thread(target=self._accept_loop, name="ipc-accept", daemon=True)
+        self._thread.start()
+        log.info("✅ IPC publisher listening: %s", self.path)
+
+    def stop(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        with self._lock:
+            peers, self._peers = self._peers, []
+        for p in peers:
+            p.queue.put_nowait(_STOP)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _accept_loop(self) -> None:
+        while self._sock:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            if not _same_user(conn):
+                log.warning("⚠️ IPC connection from another uid rejected (uid=%s)", _peer_uid(conn))
+                conn.close()
+                continue
+            peer = _Peer(conn)
+            # ✅ lock 안에서는 등록 + seq 표 복사만 (snapshot 직렬화는 peer.run 에서)
+            with self._lock:
+                peer.seqs = dict(self._seqs)
+                self._peers.append(peer)
+            peer.thread = threading.Thread(target=peer.run, name="ipc-peer", daemon=True)
+            peer.thread.start()
+            log.info("🔗 IPC worker connected (workers=%d)", len(self._peers))
+
+    def publish(self, rec: TelemetryRecord) -> None:
+        """MQTT 수신 경로: 1회 직렬화 후 worker 별 큐에 넣기만 함 (seq 부여 + 큐 넣기는 lock 안 -> 순서 일치)"""
+        body = encode_body(rec) if self._peers else None
+        with self._lock:
+            self._seq += 1
+            self._seqs[rec.key] = self._seq
+            if not self._peers:
+                return
+            if body is None:
+                body = encode_body(rec)   # 방금 worker 가 붙음
+            frame = _HEADER.pack(len(body), self._seq) + body
+            dead = False
+            for p in self._peers:
+                if p.alive:
+                    p.offer(frame, self.queue_max)
+                else:
+                    dead = True
+            if dead:
+                self._peers = [p for p in self._peers if p.alive]
+            self.published += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            peers = list(self._peers)
+        return {
+            "path": self.path,
+            "workers": len(peers),
+            "published": self.published,
+            "seq": self._seq,
+            "peers": [
+                {"queue": p.queue.qsize(), "sent": p.sent, "dropped": p.dropped}
+                for p in peers
+            ],
+        }
+
+
+_publisher: Optional[RecordPublisher] = None
+
+
+def start_publisher() -> None:
+    global _publisher
+    if _publisher is None:
+        _publisher = RecordPublisher()
+        _publisher.start()
+
+
+def stop_publisher() -> None:
+    global _publisher
+    if _publisher:
+        _publisher.stop()
+    _publisher = None
+
+
+def publish_record(rec: TelemetryRecord) -> None:
+    if _publisher:
+        _publisher.publish(rec)
+
+
+# =========================================================
+# worker side
+# =========================================================
+_replica_stats = {"connected": False, "received": 0, "reconnects": 0}
+
+
+async def _read_records(reader: asyncio.StreamReader, loop: asyncio.AbstractEventLoop) -> None:
+    # realtime_service -> ws_manager 만 쓰므로 worker 에서만 import
+    from app.services.realtime_service import push_telemetry
+    from app.services.liveness_service import touch_record
+
+    while True:
+        head = await reader.readexactly(_HEADER.size)
+        size, seq = _HEADER.unpack(head)
+        rec = decode_record(await reader.readexactly(size))
+        put_record(rec, seq)
+        touch_record(rec)
+        history.append(rec)
+        _replica_stats["received"] += 1
+        push_telemetry(rec, loop)
+
+
+async def run_replica(path: str = IPC_SOCKET) -> None:
+    """ingest 프로세스에 붙어서 record 를 계속 받음 (끊기면 backoff 후 재연결)"""
+    loop = asyncio.get_running_loop()
+    delay = 0.5
+    set_state("ipc", "connecting")
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError as e:
+            set_state("ipc", "connecting", repr(e))
+            log_limited(log, "ipc-connect", "⚠️ IPC connect failed (%s): %r -> retry in %.1fs", path, e, delay, level=logging.WARNING)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10.0)
+            continue
+
+        if not _same_user(writer.get_extra_info("socket")):
+            set_state("ipc", "connecting", "peer uid mismatch")
+            log_limited(log, "ipc-peer", "⚠️ IPC socket %s is served by another uid -> retry in %.1fs", path, delay, level=logging.WARNING)
+            writer.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10.0)
+            continue
+
+        log.info("✅ IPC replica connected: %s", path)
+        _replica_stats["connected"] = True
+        set_state("ipc", "ready")
+        delay = 0.5
+        try:
+            await _read_records(reader, loop)
+        except (asyncio.IncompleteReadError, OSError):
+            log.warning("⚠️ IPC replica disconnected")
+        finally:
+            _replica_stats["connected"] = False
+            set_state("ipc", "connecting", "disconnected")
+            _replica_stats["reconnects"] += 1
+            writer.close()
+
+
+def get_ipc_stats() -> dict:
+    if _publisher:
+        return {"role": "ingest", **_publisher.stats()}
+    return {"role": "worker", **_replica_stats}
@@ -0,0 +1,155 @@
+# app/services/line_protocol.py
+"""
+✅ TelemetryRecord -> Influx line protocol (bytes) 직접 인코딩
+
+- influxdb_client.Point 를 메시지마다 (summary 1 + channel N) 만들지 않음
+- 태그 부분 "measurement,country=..,device_id=..,...,type=.. " 은
+  (장치 key, type[, term, phase]) 별로 한 번만 escape 해서 bytes 로 캐시
+- field 이름은 고정이라 미리 escape + 정렬해 둠 -> 메시지마다 값 포맷만
+- 출력은 Point.to_line_protocol() 과 바이트 단위로 같음
+  (태그/field 이름 정렬, 빈 태그 값 생략, NaN/inf 생략, 정수 값 float 의 ".0" 제거)
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+
+# write_to_influx 가 쓰던 field 순서 그대로, 출력은 이름순
+SUMMARY_FIELDS = (
+    "kw", "kwh", "v_avg", "a_avg", "pf_avg",
+    "v_l1", "v_l2", "v_l3",
+    "a_l1", "a_l2", "a_l3",
+    "pf_l1", "pf_l2", "pf_l3",
+)
+CHANNEL_FIELDS = ("v", "a", "kw", "pf")
+
+
+def escape_tag_value(value: str) -> str:
+    out = str(value).translate(_ESCAPE_KEY)
+    if out.endswith("\\"):
+        out += " "
+    return out
+
+
+def format_float(v: float) -> Optional[str]:
+    if not math.isfinite(v):
+        return None
+    s = repr(v)
+    return s[:-2] if s.endswith(".0") else s
+
+
+def _tag_prefix(measurement: str, tags: Dict[str, str]) -> bytes:
+    parts = [measurement.translate(_ESCAPE_MEASUREMENT)]
+    for k in sorted(tags):
+        v = escape_tag_value(tags[k])
+        if v:
+            parts.append(f"{k.translate(_ESCAPE_KEY)}={v}")
+    return (",".join(parts) + " ").encode("utf-8")
+
+
+def format_line(measurement: str, tags: Dict[str, str], fields: Dict[str, object], ts_ns: int) -> Optional[str]:
+    """point 1개 -> line (rollup 처럼 빈도 낮은 경로용, 캐시 없음). int 값은 "i" 접미사"""
+    parts = []
+    for k in sorted(fields):
+        v = fields[k]
+        if isinstance(v, int):
+            s = f"{v}i"
+        else:
+            s = format_float(float(v))
+            if s is None:
+                continue
+        parts.append(f"{k.translate(_ESCAPE_KEY)}={s}")
+    if not parts:
+        return None
+    return _tag_prefix(measurement, tags).decode("utf-8") + ",".join(parts) + f" {int(ts_ns)}"
+
+
+class LineEncoder:
+    def __init__(self, measurement: str, cache_max: int = 200_000) -> None:
+        self.measurement = measurement
+        self.cache_max = max(1, int(cache_max))
+        self._prefix: Dict[Tuple, bytes] = {}
+        self._lock = threading.Lock()
+        self._summary_fields = [(k, k.translate(_ESCAPE_KEY) + "=") for k in sorted(SUMMARY_FIELDS)]
+        self._channel_fields = [(k, k.translate(_ESCAPE_KEY) + "=") for k in sorted(CHANNEL_FIELDS)]
+
+    # -----------------------------
+    # tag prefix cache
+    # -----------------------------
+    def _prefix_for(self, cache_key: Tuple, meta: dict, extra: Dict[str, str]) -> bytes:
+        prefix = self._prefix.get(cache_key)
+        if prefix is not None:
+            return prefix
+        tags = {
+            "country": str(meta.get("country")),
+            "site_id": str(meta.get("site_id")),
+            "model": str(meta.get("model")),
+            "device_id": str(meta.get("device_id")),
+            "type": str(meta.get("last_type")),
+            **extra,
+        }
+        prefix = _tag_prefix(self.measurement, tags)
+        with self._lock:
+            if len(self._prefix) >= self.cache_max:
+                self._prefix.clear()
+            self._prefix[cache_key] = prefix
+        return prefix
+
+    # -----------------------------
+    # encode
+    # -----------------------------
+    def encode(self, rec) -> List[bytes]:
+        """record 1건 -> line 리스트 (summary 1 + channel N, 개행 없음)"""
+        meta = rec.meta
+        last_type = meta.get("last_type")
+        ts = b" %d" % int(rec.ts * 1_000_000_000)
+        out: List[bytes] = []
+
+        # 1) summary
+        snap = rec.summary
+        fields = []
+        di = snap.get("di")
+        di_fields = []
+        if isinstance(di, dict):
+            di_fields = sorted(
+                (f"di{i}", f"di{i}={int(v)}i") for i, v in di.items() if v is not None
+            )
+        for name, head in self._summary_fields:
+            if di_fields and name >= "di":
+                fields.extend(f for _, f in di_fields)
+                di_fields = []
+            v = snap.get(name)
+            if v is not None:
+                s = format_float(float(v))
+                if s is not None:
+                    fields.append(head + s)
+        fields.extend(f for _, f in di_fields)
+        if fields:
+            prefix = self._prefix_for((rec.key, last_type), meta, {"scope": "summary"})
+            out.append(prefix + ",".join(fields).encode("utf-8") + ts)
+
+        # 2) channels
+        for ch in rec.channels:
+            fields = []
+            for name, head in self._channel_fields:
+                v = ch.get(name)
+                if v is not None:
+                    s = format_float(float(v))
+                    if s is not None:
+                        fields.append(head + s)
+            if not fields:
+                continue
+            term = str(ch.get("term", "in"))
+            phase = str(ch.get("phase", "L1"))
+            prefix = self._prefix_for(
+                (rec.key, last_type, term, phase), meta,
+                {"scope": "channel", "term": term, "phase": phase},
+            )
+            out.append(prefix + ",".join(fields).encode("utf-8") + ts)
+
+        return out
+
+    def stats(self) -> dict:
+        return {"cached_prefixes": len(self._prefix)}
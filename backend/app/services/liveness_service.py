@@ -0,0 +1,194 @@
+# app/services/liveness_service.py
+"""
+✅ online/offline 전환 감지 (요청마다 age 를 다시 계산하지 않음)
+
+- 장치마다 deadline = last_seen + ONLINE_SEC
+- min-heap 에는 장치당 항목 1개만 (메시지마다 push 하지 않음)
+  꺼낸 항목의 deadline 이 그 사이 연장됐으면 새 deadline 으로 다시 넣고, 아니면 offline 전환
+- sweeper 스레드는 heap top 의 deadline 까지만 잠듦 -> 주기적인 전체 스캔 없음
+- 전환 시 WS 로 presence 이벤트 (구독 인덱스 그대로 사용 -> 해당 장치/사이트 구독자만)
+    {"type": "presence", "key", "online", "ts", "site_id", "site_online"}
+- site 별 online 수는 전환 시점에만 +-1 -> 조회 O(1)
+- online_digest: online key 집합의 XOR(crc32) -> 집합이 같으면 프로세스와 무관하게 같은 값
+  (/api/devices ETag 용. 전환 횟수는 worker 마다 시작 시점이 달라서 ETag 에 못 씀)
+"""
+import asyncio
+import heapq
+import json
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import ONLINE_SEC
+from app.core.log import get_logger, log_limited
+from app.ws.manager import ws_manager
+
+log = get_logger(__name__)
+
+
+class LivenessTracker:
+    def __init__(self, online_sec: float = ONLINE_SEC) -> None:
+        self.online_sec = float(online_sec or 60)
+        self._deadline: Dict[str, float] = {}
+        self._site: Dict[str, str] = {}
+        self._armed: Set[str] = set()             # heap 에 항목이 있는 key
+        self._heap: List[Tuple[float, str]] = []
+        self._online: Set[str] = set()
+        self._site_online: Dict[str, int] = {}
+        self._digest = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.went_online = 0
+        self.went_offline = 0
+
+    # -----------------------------
+    # ingest 경로
+    # -----------------------------
+    def touch(self, key: str, site_id: str, ts: float) -> None:
+        deadline = ts + self.online_sec
+        event = None
+        with self._lock:
+            prev = self._deadline.get(key)
+            if prev is not None and deadline <= prev:
+                return
+            self._deadline[key] = deadline
+            self._site[key] = site_id
+            if key not in self._armed:
+                self._armed.add(key)
+                top = self._heap[0][0] if self._heap else None
+                heapq.heappush(self._heap, (deadline, key))
+                if top is None or deadline < top:
+                    self._wake.set()
+            if key not in self._online and deadline > time.time():
+                self._online.add(key)
+                self._digest ^= zlib.crc32(key.encode())
+                n = self._site_online[site_id] = self._site_online.get(site_id, 0) + 1
+                self.went_online += 1
+                event = (key, True, ts, site_id, n)
+        if event:
+            self._emit(*event)
+
+    # -----------------------------
+    # 조회 (O(1))
+    # -----------------------------
+    def is_online(self, key: str) -> bool:
+        return key in self._online
+
+    def online_keys(self) -> Set[str]:
+        """현재 online 인 key 복사본 (/api/devices?online= 필터용)"""
+        with self._lock:
+            return set(self._online)
+
+    def online_count(self) -> int:
+        return len(self._online)
+
+    def site_online(self, site_id: Optional[str] = None):
+        with self._lock:
+            if site_id is not None:
+                return self._site_online.get(site_id, 0)
+            return {k: v for k, v in self._site_online.items() if v}
+
+    @property
+    def transitions(self) -> int:
+        return self.went_online + self.went_offline
+
+    @property
+    def online_digest(self) -> str:
+        """online 집합 요약 (수 + XOR crc32)"""
+        with self._lock:
+            return f"{len(self._online)}.{self._digest:08x}"
+
+    # -----------------------------
+    # sweeper
+    # -----------------------------
+    def expire(self, now: Optional[float] = None) -> Tuple[int, Optional[float]]:
+        """deadline 지난 장치 처리 -> (offline 전환 수, 다음 deadline)"""
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                _, key = heapq.heappop(heap)
+                deadline = self._deadline.get(key)
+                if deadline is None:
+                    self._armed.discard(key)
+                elif deadline > now:
+                    heapq.heappush(heap, (deadline, key))   # 그 사이 메시지가 옴 -> 재무장
+                else:
+                    self._armed.discard(key)
+                    if key in self._online:
+                        self._online.discard(key)
+                        self._digest ^= zlib.crc32(key.encode())
+                        site = self._site.get(key, "")
+                        n = self._site_online[site] = max(0, self._site_online.get(site, 0) - 1)
+                        self.went_offline += 1
+                        events.append((key, False, deadline - self.online_sec, site, n))
+            nxt = heap[0][0] if heap else None
+        for ev in events:
+            self._emit(*ev)
+        return len(events), nxt
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                _, nxt = self.expire()
+            except Exception as e:
+                log_limited(log, "liveness", "❌ liveness sweep error: %r", e)
+                nxt = None
+            self._wake.clear()
+            timeout = 5.0 if nxt is None else max(0.0, min(5.0, nxt - time.time()))
+            self._wake.wait(timeout)
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self._loop = loop
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="liveness", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    # -----------------------------
+    # WS
+    # -----------------------------
+    def _emit(self, key: str, online: bool, ts: float, site_id: str, site_online: int) -> None:
+        loop = self._loop
+        if not loop or not loop.is_running():
+            return
+        msg = json.dumps({
+            "type": "presence",
+            "key": key,
+            "online": online,
+            "ts": ts,
+            "site_id": site_id,
+            "site_online": site_online,
+        }, ensure_ascii=False)
+        ws_manager.publish_threadsafe(loop, msg, key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked": len(self._deadline),
+                "online": len(self._online),
+                "heap": len(self._heap),
+                "went_online": self.went_online,
+                "went_offline": self.went_offline,
+            }
+
+
+liveness = LivenessTracker()
+
+
+def touch_record(rec) -> None:
+    liveness.touch(rec.key, str(rec.meta.get("site_id")), rec.ts)
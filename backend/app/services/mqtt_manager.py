@@ -0,0 +1,368 @@
+# app/services/mqtt_manager.py
+"""
+✅ MQTT 연결 관리 (client N 개 + shared subscription + 영속 세션)
+
+- MQTT_CLIENTS 개의 paho client (연결마다 loop 스레드 1개 = TCP 연결 1개)
+- group 이 있으면 "$share/<group>/<topic>" 로 구독 -> 브로커가 group 안에서 메시지를 나눠 줌
+  (다른 프로세스/호스트도 같은 group 이면 같이 분담). client 가 2개 이상인데 group 이 없으면
+  모든 연결이 같은 메시지를 받으므로 기본 group("monitor") 사용
+  브로커가 메시지 단위로 분배하므로 같은 장치의 연속 메시지가 다른 연결로 올 수 있음
+  (장치 순서가 중요하면 브로커의 sticky / hash_topic 분배 전략 사용, 또는 MQTT_CLIENTS=1)
+- 영속 세션: client_id (<id>-<n>) + clean_start=False
+  v5 는 SessionExpiryInterval 동안, v3.1.1 은 clean_session=False 로 브로커가 세션을 보관
+  -> 잠깐 끊겨도 그 사이 QoS 1 메시지를 재연결 때 받음
+- client_id 를 안 주면 server_reader-<host>-<pid> (프로세스마다 다름 -> 같은 id 끼리 연결을 뺏는 루프 없음)
+  이 id 는 재시작하면 바뀌므로 stop() 에서 세션도 지움 (v5: DISCONNECT 에 SessionExpiryInterval=0)
+  재시작 사이 세션 유지는 MQTT_CLIENT_ID 를 명시한 경우만
+- 재연결: connect_async + loop 스레드의 지수 backoff (reconnect_min ~ reconnect_max 초)
+  첫 연결 실패도 같은 경로로 재시도 -> start() 는 네트워크를 기다리지 않음
+- on_message(topic, payload, now) 콜백만 받음 (paho 는 start() 에서 import)
+- manual ack: handler 가 False 를 돌려주면 (ingest 큐가 가득 참) PUBACK 전에 ack_wait 초까지 재시도
+  (loop 스레드가 멈춰 있는 동안 브로커도 더 보내지 않음 = backpressure, keepalive/2 를 넘지 않음)
+  그래도 못 넣으면 PUBACK 을 보내지 않고, 그런 메시지가 unacked_reconnect 개가 되면 소켓을 끊음
+  -> loop 스레드가 backoff 후 재연결하고 브로커가 세션의 미확인 메시지를 다시 보냄
+  (재연결 없이 두면 브로커 inflight 한도가 차서 그 연결이 영영 멈춤)
+  종료 중에는 포기하지 않고 큐에 넣을 때까지 재시도 (프로세스별 id 는 stop() 에서 세션을 지우므로)
+- 연결별 stats: 메시지/바이트, 최근 msgs/s, 연결/끊김 횟수, session_present, 미확인 수, 마지막 오류
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, List, Optional
+
+from app.core.config import (
+    MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS, MQTT_TOPIC, MQTT_TLS,
+    MQTT_CLIENTS, MQTT_SHARE_GROUP, MQTT_CLIENT_ID, MQTT_PROTOCOL, MQTT_QOS,
+    MQTT_SESSION_EXPIRY, MQTT_RECONNECT_MIN_SEC, MQTT_RECONNECT_MAX_SEC, MQTT_KEEPALIVE,
+    MQTT_ACK_WAIT_SEC, MQTT_UNACKED_RECONNECT,
+)
+from app.core.health import set_state
+from app.core.log import get_logger, log_limited
+
+log = get_logger(__name__)
+
+DEFAULT_GROUP = "monitor"
+RATE_WINDOW_SEC = 10.0
+RETRY_PAUSE_SEC = 0.05
+
+
+class MQTTConnection:
+    """client 1개 + 연결별 카운터 (카운터는 그 연결의 loop 스레드에서만 증가)"""
+
+    def __init__(self, manager: "MQTTManager", index: int, client_id: str) -> None:
+        self.manager = manager
+        self.index = index
+        self.client_id = client_id
+        self.client = None
+
+        self.connected = False
+        self.session_present: Optional[bool] = None
+        self.connects = 0
+        self.disconnects = 0
+        self.messages = 0
+        self.bytes = 0
+        self.unacked = 0
+        self.pending_unacked = 0   # 마지막 연결 이후 PUBACK 안 한 메시지 (재연결 판단)
+        self.ack_retries = 0
+        self.forced_reconnects = 0
+        self.last_message_ts: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._win_start = time.monotonic()
+        self._win_count = 0
+        self._rate = 0.0
+
+    # -----------------------------
+    # paho callbacks (loop 스레드)
+    # -----------------------------
+    def on_connect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        if reason_code.is_failure:
+            self.last_error = f"connect refused: {reason_code}"
+            log_limited(log, f"mqtt-refused-{self.index}", "❌ MQTT[%s] connect refused: %s", self.client_id, reason_code)
+            self.manager._update_state()
+            return
+        self.connected = True
+        self.connects += 1
+        self.pending_unacked = 0
+        self.session_present = bool(getattr(flags, "session_present", False))
+        log.info("✅ MQTT[%s] connected (session_present=%s)", self.client_id, self.session_present)
+        # 세션이 남아 있어도 다시 구독 (topic/group 설정이 바뀐 경우 포함, 중복 구독은 무해)
+        try:
+            client.subscribe(self.manager.subscription, qos=self.manager.qos)
+            log.info("📡 MQTT[%s] subscribed: %s (qos=%d)", self.client_id, self.manager.subscription, self.manager.qos)
+        except Exception as e:
+            self.last_error = f"subscribe failed: {e!r}"
+            log.error("❌ MQTT[%s] subscribe failed: %r", self.client_id, e)
+        self.manager._update_state()
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties=None) -> None:
+        was = self.connected
+        self.connected = False
+        if was:
+            self.disconnects += 1
+        if not self.manager.stopping:
+            self.last_error = f"disconnected: {reason_code}"
+            log_limited(log, f"mqtt-disconnect-{self.index}", "⚠️ MQTT[%s] disconnected (%s) -> reconnecting", self.client_id, reason_code, level=logging.WARNING)
+        self.manager._update_state()
+
+    def on_connect_fail(self, client, userdata) -> None:
+        # TCP/TLS 연결 자체 실패 (브로커 다운, DNS) -> loop 스레드가 backoff 후 재시도
+        self.last_error = "connect failed"
+        log_limited(log, f"mqtt-connect-{self.index}", "⚠️ MQTT[%s] connect to %s:%s failed -> retrying", self.client_id, self.manager.host, self.manager.port, level=logging.WARNING)
+        self.manager._update_state()
+
+    def on_message(self, client, userdata, msg) -> None:
+        now = time.time()
+        payload = msg.payload
+        self.messages += 1
+        self.bytes += len(payload)
+        self.last_message_ts = now
+        self._win_count += 1
+        t = time.monotonic()
+        if t - self._win_start >= RATE_WINDOW_SEC:
+            self._rate = self._win_count / (t - self._win_start)
+            self._win_start = t
+            self._win_count = 0
+        # ✅ PUBACK 은 handler 가 큐에 넣은 뒤에만 (manual_ack, QoS 0 이면 ack 는 no-op)
+        if self.manager.handler(msg.topic, payload, now) is False and not self._retry(msg.topic, payload, now):
+            self.unacked += 1
+            self.pending_unacked += 1
+            if self.pending_unacked >= self.manager.unacked_reconnect:
+                log_limited(log, f"mqtt-unacked-{self.index}", "⚠️ MQTT[%s] ingest queue full -> %d message(s) not acked, reconnecting for redelivery", self.client_id, self.pending_unacked, level=logging.WARNING)
+                self._force_reconnect(client)
+            return
+        client.ack(msg.mid, msg.qos)
+
+    def _retry(self, topic: str, payload: bytes, now: float) -> bool:
+        """큐가 빌 때까지 ack_wait 초 재시도 (종료 중에는 시간 제한 없음)"""
+        deadline = time.monotonic() + self.manager.ack_wait
+        while self.manager.stopping or time.monotonic() < deadline:
+            self.ack_retries += 1
+            time.sleep(RETRY_PAUSE_SEC)
+            if self.manager.handler(topic, payload, now) is not False:
+                return True
+        return False
+
+    def _force_reconnect(self, client) -> None:
+        """소켓만 닫음 -> paho loop 가 연결 끊김으로 처리 (on_disconnect + backoff 재연결, 세션 유지)"""
+        sock = client.socket()
+        if sock is None:
+            return
+        self.forced_reconnects += 1
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    # -----------------------------
+    # stats
+    # -----------------------------
+    def rate(self) -> float:
+        """최근 msgs/s (RATE_WINDOW_SEC 단위, 메시지가 끊기면 진행 중인 window 로 계산)"""
+        elapsed = time.monotonic() - self._win_start
+        if elapsed >= RATE_WINDOW_SEC:
+            return self._win_count / elapsed
+        return self._rate
+
+    def stats(self) -> dict:
+        return {
+            "client_id": self.client_id,
+            "connected": self.connected,
+            "session_present": self.session_present,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "unacked": self.unacked,
+            "ack_retries": self.ack_retries,
+            "forced_reconnects": self.forced_reconnects,
+            "msgs_per_sec": round(self.rate(), 1),
+            "last_message_ts": self.last_message_ts,
+            "last_error": self.last_error,
+        }
+
+
+class MQTTManager:
+    def __init__(
+        self,
+        handler: Callable[[str, bytes, float], None],
+        host: str = MQTT_HOST,
+        port: int = MQTT_PORT,
+        topic: str = MQTT_TOPIC,
+        clients: int = MQTT_CLIENTS,
+        group: str = MQTT_SHARE_GROUP,
+        client_id: str = MQTT_CLIENT_ID,
+        protocol: str = MQTT_PROTOCOL,
+        qos: int = MQTT_QOS,
+        session_expiry: int = MQTT_SESSION_EXPIRY,
+        username: str = MQTT_USER,
+        password: str = MQTT_PASS,
+        tls: bool = MQTT_TLS,
+        reconnect_min: float = MQTT_RECONNECT_MIN_SEC,
+        reconnect_max: float = MQTT_RECONNECT_MAX_SEC,
+        keepalive: int = MQTT_KEEPALIVE,
+        ack_wait: float = MQTT_ACK_WAIT_SEC,
+        unacked_reconnect: int = MQTT_UNACKED_RECONNECT,
+    ) -> None:
+        self.handler = handler
+        self.host = host
+        self.port = int(port)
+        self.topic = topic
+        self.n_clients = max(1, int(clients))
+        self.group = group or (DEFAULT_GROUP if self.n_clients > 1 else "")
+        # id 를 명시하지 않으면 프로세스별 id (재시작 사이 세션은 이어받지 않음)
+        self.fixed_id = bool(client_id)
+        self.client_id = client_id or f"server_reader-{socket.gethostname()}-{os.getpid()}"
+        self.v5 = str(protocol) != "311"
+        self.qos = min(2, max(0, int(qos)))
+        self.session_expiry = max(0, int(session_expiry))
+        self.username = username
+        self.password = password
+        self.tls = tls
+        self.reconnect_min = max(0.1, float(reconnect_min))
+        self.reconnect_max = max(self.reconnect_min, float(reconnect_max))
+        self.keepalive = int(keepalive)
+        # loop 스레드가 PINGREQ 를 못 보내는 시간 -> keepalive 안에서 끝나야 브로커가 끊지 않음
+        self.ack_wait = max(0.0, min(float(ack_wait), self.keepalive / 2 if self.keepalive > 0 else float(ack_wait)))
+        self.unacked_reconnect = max(1, int(unacked_reconnect))
+
+        self.connections: List[MQTTConnection] = []
+        self.stopping = False
+        self._lock = threading.Lock()
+
+    @property
+    def subscription(self) -> str:
+        return f"$share/{self.group}/{self.topic}" if self.group else self.topic
+
+    @property
+    def persistent(self) -> bool:
+        return self.session_expiry > 0
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+    def _make_client(self, conn: MQTTConnection):
+        import paho.mqtt.client as mqtt
+
+        kwargs = {}
+        if not self.v5:
+            kwargs["clean_session"] = not self.persistent
+        client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            client_id=conn.client_id,
+            protocol=mqtt.MQTTv5 if self.v5 else mqtt.MQTTv311,
+            manual_ack=True,
+            **kwargs,
+        )
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        if self.tls:
+            client.tls_set()
+        client.on_connect = conn.on_connect
+        client.on_disconnect = conn.on_disconnect
+        client.on_connect_fail = conn.on_connect_fail
+        client.on_message = conn.on_message
+        client.reconnect_delay_set(min_delay=self.reconnect_min, max_delay=self.reconnect_max)
+        return client
+
+    def _connect_async(self, client) -> None:
+        if not self.v5:
+            client.connect_async(self.host, self.port, keepalive=self.keepalive)
+            return
+        from paho.mqtt.packettypes import PacketTypes
+        from paho.mqtt.properties import Properties
+
+        props = None
+        if self.persistent:
+            props = Properties(PacketTypes.CONNECT)
+            props.SessionExpiryInterval = self.session_expiry
+        client.connect_async(
+            self.host, self.port, keepalive=self.keepalive,
+            clean_start=not self.persistent, properties=props,
+        )
+
+    def start(self) -> None:
+        """client 생성 후 바로 반환: 연결/재연결은 각 loop 스레드에서"""
+        if self.connections:
+            return
+        self.stopping = False
+        set_state("mqtt", "connecting")
+        conns = []
+        for i in range(self.n_clients):
+            cid = self.client_id if self.n_clients == 1 else f"{self.client_id}-{i}"
+            conn = MQTTConnection(self, i, cid)
+            conn.client = self._make_client(conn)
+            conns.append(conn)
+        # 콜백이 보는 연결 목록을 먼저 채운 뒤 loop 시작
+        self.connections = conns
+        for conn in conns:
+            self._connect_async(conn.client)
+            conn.client.loop_start()
+        log.info("✅ MQTT manager started: %s", {
+            "host": self.host,
+            "port": self.port,
+            "clients": self.n_clients,
+            "subscription": self.subscription,
+            "protocol": "5" if self.v5 else "3.1.1",
+            "qos": self.qos,
+            "session_expiry": self.session_expiry,
+        })
+
+    def _disconnect_props(self):
+        """프로세스별 id 면 세션을 남기지 않음 (다음 프로세스는 다른 id 라 이어받을 수 없음)"""
+        if not (self.v5 and self.persistent) or self.fixed_id:
+            return None
+        from paho.mqtt.packettypes import PacketTypes
+        from paho.mqtt.properties import Properties
+
+        props = Properties(PacketTypes.DISCONNECT)
+        props.SessionExpiryInterval = 0
+        return props
+
+    def stop(self) -> None:
+        # v5 + 고정 id: 정상 DISCONNECT 여도 세션은 SessionExpiryInterval 동안 유지 -> 재시작 사이 메시지 보관
+        self.stopping = True
+        props = self._disconnect_props() if self.connections else None
+        for conn in self.connections:
+            try:
+                conn.client.disconnect(properties=props)
+                conn.client.loop_stop()
+            except Exception:
+                pass
+        self.connections = []
+        set_state("mqtt", "disabled", "stopped")
+
+    # -----------------------------
+    # state / stats
+    # -----------------------------
+    def connected_count(self) -> int:
+        return sum(1 for c in self.connections if c.connected)
+
+    def _update_state(self) -> None:
+        if self.stopping:
+            return
+        with self._lock:
+            up = self.connected_count()
+            detail = f"{up}/{len(self.connections)} connected"
+            errors = [c.last_error for c in self.connections if not c.connected and c.last_error]
+            if up:
+                set_state("mqtt", "ready", detail)
+            elif any(e.startswith("connect refused") for e in errors):
+                set_state("mqtt", "error", f"{detail}, {errors[0]}")
+            else:
+                set_state("mqtt", "connecting", detail)
+
+    def stats(self) -> dict:
+        conns = [c.stats() for c in self.connections]
+        return {
+            "host": self.host,
+            "subscription": self.subscription,
+            "clients": len(conns),
+            "connected": sum(1 for c in conns if c["connected"]),
+            "messages": sum(c["messages"] for c in conns),
+            "unacked": sum(c["unacked"] for c in conns),
+            "msgs_per_sec": round(sum(c["msgs_per_sec"] for c in conns), 1),
+            "connections": conns,
+        }
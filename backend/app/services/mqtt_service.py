@@ -1,17 +1,30 @@
 # app/services/mqtt_service.py
 import time
 import json
+import logging
 import asyncio
-import paho.mqtt.client as mqtt
 
-from app.core.config import MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS, MQTT_TOPIC, MQTT_TLS
-from app.domain.topic import parse_topic, make_key
-from app.domain.device_store import DEVICES, LAST_PAYLOAD
+from app.core.config import (
+    MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS, MQTT_TOPIC, MQTT_TLS, APP_ROLE,
+    INGEST_WORKERS, INGEST_QUEUE_MAX, INGEST_SUBMIT_TIMEOUT_SEC,
+)
+from app.domain.topic import parse_topic
+from app.domain.device_store import make_record, put_record
+from app.domain.timeseries import history
 from app.services.influx_service import write_to_influx
 from app.services.realtime_service import push_telemetry
+from app.services.rollup_service import add_record as add_rollup
+from app.services.ipc_service import publish_record
+from app.services.liveness_service import touch_record
+from app.services.ingest_pool import IngestPool
+from app.services.mqtt_manager import MQTTManager
+from app.core.log import get_logger, log_limited, TopicSampler
+from app.core.metrics import MQTT_MESSAGES, MQTT_PARSE_FAILURES, NORMALIZE_SECONDS
 
-mqtt_client = None
-_RC_TEXT = {0: "Success", 4: "Bad username or password", 5: "Not authorized"}
+log = get_logger(__name__)
+_sampler = TopicSampler()
+
+_manager: MQTTManager | None = None
 
 # ✅ (핵심) uvicorn 메인 이벤트루프 저장용
 _MAIN_LOOP: asyncio.AbstractEventLoop | None = None
@@ -24,103 +37,101 @@ def set_main_loop(loop: asyncio.AbstractEventLoop):
     _MAIN_LOOP = loop
 
 
-def on_connect(client, userdata, flags, rc, properties=None):
-    rc_num = None
-    try:
-        rc_num = int(rc)
-    except Exception:
-        rc_num = None
-
-    if rc_num is not None:
-        print(f"✅ MQTT Connected rc={rc_num} ({_RC_TEXT.get(rc_num, 'Unknown')})")
-        if rc_num != 0:
-            print("❌ MQTT connect failed. Check credentials/permissions.")
-            return
-    else:
-        print(f"✅ MQTT Connected rc={rc}")
-        if str(rc).lower() not in ("0", "success"):
-            print("❌ MQTT connect failed. (rc is not success)")
-            return
-
-    try:
-        client.subscribe(MQTT_TOPIC)
-        print(f"📡 Subscribed: {MQTT_TOPIC}")
-    except Exception as e:
-        print("❌ subscribe failed:", e)
+def on_message(topic: str, payload: bytes, now: float) -> bool:
+    """
+    paho 네트워크 스레드 (연결마다 1개): 큐에 넣기만 하고 반환 (decode/정규화/저장은 ingest 풀)
+    -> False 면 큐에 못 넣은 것 (MQTTManager 가 PUBACK 을 보내지 않음 -> 재연결 때 브로커가 재전송)
+    """
+    if _pool.running():
+        return _pool.submit(topic, payload, now, INGEST_SUBMIT_TIMEOUT_SEC)
+    handle_message(topic, payload, now)
+    return True
 
 
-def on_message(client, userdata, msg):
-    topic = msg.topic
-    payload_raw = msg.payload.decode("utf-8", errors="ignore")
+def handle_message(topic: str, payload_bytes: bytes, now: float):
+    """ingest 풀 스레드: 같은 장치의 메시지는 항상 같은 스레드에서 순서대로 처리됨"""
+    payload_raw = payload_bytes.decode("utf-8", errors="ignore")
 
-    print("------------")
-    print(f"Topic: {topic}")
-    print(f"Message: {payload_raw}")
+    # ✅ 메시지 로그는 DEBUG + 장치별 샘플링 (운영 INFO 에서는 비용 0)
+    if log.isEnabledFor(logging.DEBUG) and _sampler.sample(topic):
+        log.debug("mqtt message topic=%s payload=%s", topic, payload_raw[:512], extra={"topic": topic})
 
     parsed = parse_topic(topic)
     if not parsed:
         return
 
     country, site_id, model, device_id, last_type = parsed
-    key = make_key(country, site_id, model, device_id)
-    now = time.time()
-
-    # -----------------------------
-    # ✅ 캐시 업데이트
-    # -----------------------------
-    DEVICES[key] = {
-        "country": country,
-        "site_id": site_id,
-        "model": model,
-        "device_id": device_id,
-        "last_seen": now,
-        "last_type": last_type,
-        "last_topic": topic,
-    }
+    MQTT_MESSAGES.inc(f"{country}/{site_id}")
 
     try:
         obj = json.loads(payload_raw)
-        if isinstance(obj, dict):
-            LAST_PAYLOAD[key] = obj
-        else:
-            LAST_PAYLOAD[key] = {"_raw": payload_raw}
+        payload = obj if isinstance(obj, dict) else {"_raw": payload_raw}
     except Exception:
-        LAST_PAYLOAD[key] = {"_raw": payload_raw}
+        payload = {"_raw": payload_raw}
+    if "_raw" in payload and len(payload) == 1:
+        MQTT_PARSE_FAILURES.inc()
+
+    # -----------------------------
+    # ✅ 정규화 1회 -> 캐시 업데이트 (Influx / WS / REST 가 같은 record 재사용)
+    # -----------------------------
+    t0 = time.perf_counter()
+    rec = make_record(country, site_id, model, device_id, last_type, topic, payload, now)
+    NORMALIZE_SECONDS.observe(time.perf_counter() - t0)
+    put_record(rec)
+    touch_record(rec)
+    history.append(rec)
 
     # -----------------------------
     # ✅ Influx 저장
     # -----------------------------
     try:
-        write_to_influx(DEVICES[key], LAST_PAYLOAD[key], now)
+        write_to_influx(rec)
+    except Exception as e:
+        log_limited(log, "influx", "❌ write_to_influx error: %r", e)
+
+    # -----------------------------
+    # ✅ minute/hour/day rollup (닫힌 버킷만 Influx 로)
+    # -----------------------------
+    try:
+        add_rollup(rec)
+    except Exception as e:
+        log_limited(log, "rollup", "❌ rollup error: %r", e)
+
+    # -----------------------------
+    # ✅ multi-worker: worker 프로세스들로 record 전달 (APP_ROLE=ingest 일 때만 동작)
+    # -----------------------------
+    try:
+        publish_record(rec)
     except Exception as e:
-        print("❌ write_to_influx error:", repr(e))
+        log_limited(log, "ipc", "❌ IPC publish error: %r", e)
 
     # -----------------------------
     # ✅ WebSocket 브로드캐스트 (스레드 안전)
     # -----------------------------
     try:
         if _MAIN_LOOP and _MAIN_LOOP.is_running():
-            asyncio.run_coroutine_threadsafe(
-                push_telemetry(
-                    key=key,
-                    payload=LAST_PAYLOAD[key],
-                    last_seen=now,
-                ),
-                _MAIN_LOOP
-            )
-        else:
+            # ✅ 코루틴을 쌓지 않고, 직렬화된 메시지만 루프로 넘김 (대기열 상한 있음)
+            push_telemetry(rec, _MAIN_LOOP)
+        elif APP_ROLE != "ingest":
             # 메인 루프가 아직 등록 안 됐으면 로그만 (startup 순서 문제)
-            print("⚠️ WS push skipped: main loop not ready")
+            # (ingest.py 단독 실행은 WS 가 worker 쪽에 있으므로 로그 생략)
+            log_limited(log, "ws-loop", "⚠️ WS push skipped: main loop not ready", level=logging.WARNING)
     except Exception as e:
-        print("❌ WebSocket push error:", repr(e))
+        log_limited(log, "ws", "❌ WebSocket push error: %r", e)
+
+
+# ✅ shard 별 ingest 스레드 (같은 장치 = 같은 shard -> 순서 보장)
+_pool = IngestPool(handle_message, INGEST_WORKERS, INGEST_QUEUE_MAX)
+ingest_pool = _pool
 
 
 def start_mqtt():
-    global mqtt_client
-    if mqtt_client:
+    """연결 관리자 시작 후 바로 반환: 연결/재연결은 각 client 의 loop 스레드에서 (startup 을 막지 않음)"""
+    global _manager
+    if _manager:
         return
 
-    print("✅ MQTT ENV:", {
+    log.info("✅ MQTT ENV: %s", {
         "host": MQTT_HOST,
         "port": MQTT_PORT,
         "user": MQTT_USER,
@@ -129,22 +140,25 @@ def start_mqtt():
         "pass_set": bool(MQTT_PASS),
     })
 
-    try:
-        mqtt_client = mqtt.Client(
-            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
-            client_id="server_reader_" + str(int(time.time()))
-        )
-    except Exception:
-        mqtt_client = mqtt.Client(client_id="server_reader_" + str(int(time.time())))
+    _pool.start()
+    _manager = MQTTManager(on_message)
+    _manager.start()
+
+def stop_mqtt():
+    global _manager
+    if not _manager:
+        return
+    _manager.stop()
+    _manager = None
+    _pool.stop()
 
-    if MQTT_USER:
-        mqtt_client.username_pw_set(MQTT_USER, MQTT_PASS)
 
-    if MQTT_TLS:
-        mqtt_client.tls_set()
+def get_ingest_stats() -> dict:
+    return _pool.stats()
 
-    mqtt_client.on_connect = on_connect
-    mqtt_client.on_message = on_message
 
-    mqtt_client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
-    mqtt_client.loop_start()
\ No newline at end of file
+def get_mqtt_stats() -> dict:
+    """연결별 수신 메시지/바이트/msgs_per_sec (관리자 미기동이면 enabled=False)"""
+    if not _manager:
+        return {"enabled": False}
+    return {"enabled": True, **_manager.stats()}
@@ -1,40 +1,41 @@
 # app/services/realtime_service.py
+import json
+import logging
 import time
-from typing import Any, Dict, Optional
+import asyncio
+from typing import Any, Dict
 
 from app.ws.manager import ws_manager
-from app.domain.device_store import normalize_payload, build_channels_from_payload
+from app.domain.device_store import TelemetryRecord
+from app.core.log import get_logger
 
-async def push_telemetry(key: str, payload: Dict[str, Any], last_seen: Optional[float] = None):
-    snap = normalize_payload(payload)
-    channels = build_channels_from_payload(payload)
+log = get_logger(__name__)
+
+def push_telemetry(rec: TelemetryRecord, loop: asyncio.AbstractEventLoop) -> bool:
+    """MQTT 스레드에서 호출: 여기서 1회 직렬화 후 이벤트 루프의 ws_manager 로 넘김"""
+    # ✅ 정규화는 on_message 에서 이미 끝남 -> record 재사용
+    channels = rec.channels
 
     # ✅ 프론트 호환성: payload 안에도 channels/channel_count를 넣어주기 (원본은 복사)
-    payload_out: Dict[str, Any] = dict(payload) if isinstance(payload, dict) else {"_raw": payload}
+    payload_out: Dict[str, Any] = dict(rec.payload)
     payload_out["channels"] = channels
     payload_out["channel_count"] = len(channels)
 
     event = {
         "type": "telemetry",
-        "ts": last_seen or time.time(),
-        "key": key,
+        "ts": rec.ts or time.time(),
+        "key": rec.key,
 
         # ✅ 여기!
         "payload": payload_out,
 
-        "summary": snap,
+        "summary": rec.summary,
         "channels": channels,
         "channel_count": len(channels),
     }
 
-    # ✅ (테스트용) 현재 연결 수 확인 로그 (manager에 이런 필드가 없다면 삭제해도 됨)
-    try:
-        cnt = getattr(ws_manager, "count", None)
-        if callable(cnt):
-            print("🚀 push_telemetry broadcast -> clients:", cnt())
-        else:
-            print("🚀 push_telemetry broadcast")
-    except Exception:
-        pass
-
-    await ws_manager.broadcast(event)
\ No newline at end of file
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("🚀 push_telemetry key=%s clients=%d", rec.key, ws_manager.count())
+
+    msg = json.dumps(event, ensure_ascii=False)
+    return ws_manager.publish_threadsafe(loop, msg, rec.key, event)
@@ -0,0 +1,371 @@
+# app/services/report_service.py
+"""
+✅ 서버 측 리포트 (장치 여러 개 x 기간 -> CSV / XLSX)
+
+- 데이터는 series_service.get_series 로 장치마다 REPORT_CHUNK_WINDOWS 개 window 씩 나눠 조회
+  (rollup / 캐시 / ring buffer 경로 그대로, 메모리에는 청크 1개분만)
+- 행은 long format: device, date, value (장치별로 연속 -> 장치마다 차트 series 범위가 하나)
+- CSV: 행을 만드는 대로 흘려보냄 (캐시 가능하면 동시에 임시 파일에도 기록)
+  REPORT_CSV_BUFFER_ROWS 이하로 예상되면 다 만든 뒤 전송 (조회 오류는 HTTP 상태로)
+  흘려보내는 중 조회 오류 -> 이미 200 이 나갔으므로 마지막 줄에 "# error: ..." trailer
+- XLSX: xlsxwriter constant_memory (행 순서대로 쓰고 지난 행은 디스크로) -> 임시 파일 -> 전송
+- 캐시: 정규화한 요청(장치 정렬, 실제 start/stop, metric/series/group/format/title)의 sha256 = 파일 이름
+  같은 요청이면 파일 그대로 전송. 열린(현재) window 가 포함되면 결과가 바뀌므로 캐시하지 않음
+  Influx 가 ready 가 아니거나 spool 에 못 쓴 point 가 남아 있으면 (조회 시작/끝 둘 다 확인) 결과가
+  빠져 있을 수 있으므로 캐시하지 않음. 그래도 늦게 도착한 point 가 있으므로 REPORT_CACHE_TTL_SEC 뒤 만료
+  REPORT_CACHE_MAX_MB 를 넘으면 오래 안 쓴 파일부터 삭제 (mtime = 만든 시각, atime = 마지막 사용)
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import (
+    REPORT_CACHE_DIR, REPORT_CACHE_MAX_MB, REPORT_CACHE_TTL_SEC, REPORT_CHUNK_WINDOWS,
+    REPORT_CSV_BUFFER_ROWS, REPORT_MAX_DEVICES,
+)
+from app.core.log import get_logger, log_limited
+from app.services import series_service as svc
+from app.services.influx_service import write_backlog
+
+log = get_logger(__name__)
+
+FORMATS = ("csv", "xlsx")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+CHART_MAX_SERIES = 20      # 장치가 더 많으면 차트는 앞 20개만
+CSV_FLUSH_ROWS = 500
+
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "uncacheable": 0, "unsettled": 0, "expired": 0, "evicted": 0, "errors": 0}
+
+Row = Tuple[str, str, float]
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """정규화된 리포트 요청 (digest 의 입력)"""
+    devices: Tuple[str, ...]
+    metric: str
+    series: str
+    group: str
+    start: str
+    stop: str
+    fmt: str
+    title: str
+
+    def digest(self) -> str:
+        raw = json.dumps(asdict(self), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Report:
+    spec: ReportSpec
+    queries: List[Tuple[str, svc.SeriesQuery]]
+    start: datetime
+    stop: datetime
+    cacheable: bool      # 닫힌 window 만 -> 캐시 파일을 읽어도 됨
+    settled: bool        # 조회 시작 시 Influx 정상 + 밀린 쓰기 없음 -> 결과를 캐시에 써도 됨
+
+    @property
+    def digest(self) -> str:
+        return self.spec.digest()
+
+    @property
+    def filename(self) -> str:
+        return f"report_{self.spec.metric}_{self.spec.group}.{self.spec.fmt}"
+
+
+# =========================================================
+# 요청 정규화
+# =========================================================
+def build_report(
+    devices: List[str],
+    metric: str,
+    series: str,
+    group: str,
+    date_from: str,
+    date_to: str,
+    fmt: str,
+    title: str,
+    now: Optional[datetime] = None,
+) -> Report:
+    now = now or datetime.now(timezone.utc)
+    fmt = (fmt or "csv").lower()
+    if fmt not in FORMATS:
+        raise svc.SeriesError(f"unsupported format: {fmt}")
+    devs = sorted({d.strip() for d in devices if d and d.strip()})
+    if not devs:
+        raise svc.SeriesError("devices is required")
+    if len(devs) > REPORT_MAX_DEVICES:
+        raise svc.SeriesError(f"too many devices (max {REPORT_MAX_DEVICES})")
+
+    queries = [(d, svc.make_query(d, metric, series, group)) for d in devs]
+    q0 = queries[0][1]
+    start, stop = svc.resolve_range(date_from, date_to, q0.group, now)
+    spec = ReportSpec(
+        devices=tuple(devs),
+        metric=q0.metric,
+        series=q0.series,
+        group=q0.group,
+        start=start.isoformat(),
+        stop=stop.isoformat(),
+        fmt=fmt,
+        title=title or "Period Analysis",
+    )
+    cacheable = stop <= svc.window_floor(now, q0.group)
+    settled = cacheable and not write_backlog()
+    return Report(spec, queries, start, stop, cacheable, settled)
+
+
+def fits_in_memory(report: Report) -> bool:
+    """예상 행 수 (장치 x window) 가 REPORT_CSV_BUFFER_ROWS 이하"""
+    limit = REPORT_CSV_BUFFER_ROWS // len(report.queries)
+    n = 0
+    a = report.start
+    while a < report.stop:
+        n += 1
+        if n > limit:
+            return False
+        a = svc.window_add(a, report.spec.group)
+    return True
+
+
+# =========================================================
+# 데이터 (장치 x 청크)
+# =========================================================
+def _chunks(start: datetime, stop: datetime, group: str) -> Iterator[Tuple[datetime, datetime]]:
+    n = max(1, REPORT_CHUNK_WINDOWS)
+    a = start
+    while a < stop:
+        b = min(stop, svc.window_add(a, group, n))
+        yield a, b
+        a = b
+
+
+def iter_rows(report: Report, now: Optional[datetime] = None) -> Iterator[Row]:
+    now = now or datetime.now(timezone.utc)
+    group = report.spec.group
+    for device, q in report.queries:
+        for a, b in _chunks(report.start, report.stop, group):
+            for t, v in svc.get_series(q, a, b, now):
+                yield device, svc.format_label(t, group), v
+
+
+# =========================================================
+# 캐시 (content-addressed 파일)
+# =========================================================
+def _cache_path(report: Report) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"{report.digest}.{report.spec.fmt}")
+
+
+def cached_file(report: Report) -> Optional[str]:
+    if not report.cacheable:
+        with _cache_lock:
+            _stats["uncacheable"] += 1
+        return None
+    path = _cache_path(report)
+    now = time.time()
+    try:
+        st = os.stat(path)
+        if now - st.st_mtime > REPORT_CACHE_TTL_SEC:
+            remove_quietly(path)
+            with _cache_lock:
+                _stats["expired"] += 1
+            raise FileNotFoundError(path)
+        os.utime(path, (now, st.st_mtime))   # LRU 순서 = atime (mtime 은 만든 시각 그대로)
+    except OSError:
+        with _cache_lock:
+            _stats["misses"] += 1
+        return None
+    with _cache_lock:
+        _stats["hits"] += 1
+    return path
+
+
+def _tmp_path(report: Report) -> str:
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=".tmp-", suffix=f".{report.spec.fmt}", dir=REPORT_CACHE_DIR)
+    os.close(fd)
+    return path
+
+
+def _commit(report: Report, tmp: str) -> Optional[str]:
+    """완성된 임시 파일 -> 캐시 (캐시 불가면 None, 임시 파일은 호출자가 정리)"""
+    if not report.cacheable:
+        return None
+    if not report.settled or write_backlog():
+        # 조회 중 Influx 장애 / spool 에 남은 point -> 빠진 값이 있을 수 있는 결과
+        with _cache_lock:
+            _stats["unsettled"] += 1
+        return None
+    path = _cache_path(report)
+    os.replace(tmp, path)
+    _evict()
+    return path
+
+
+def _evict() -> None:
+    limit = int(REPORT_CACHE_MAX_MB * 1024 * 1024)
+    with _cache_lock:
+        files = []
+        for name in os.listdir(REPORT_CACHE_DIR):
+            if name.startswith(".tmp-"):
+                continue
+            path = os.path.join(REPORT_CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_atime, st.st_size, path))
+        total = sum(f[1] for f in files)
+        files.sort()
+        for _, size, path in files:
+            if total <= limit:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            _stats["evicted"] += 1
+
+
+def remove_quietly(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+# =========================================================
+# CSV (stream)
+# =========================================================
+def _csv_chunks(report: Report, rows: Iterator[Row]) -> Iterator[bytes]:
+    """행을 만드는 대로 bytes 청크. 캐시 가능하면 같은 바이트를 임시 파일에도 쓰고 끝나면 캐시로 이동"""
+    tmp = _tmp_path(report) if report.settled else None
+    f = open(tmp, "wb") if tmp else None
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    done = False
+    try:
+        w.writerow(["device", "date", f"{report.spec.metric}_{report.spec.series}"])
+        n = 0
+        try:
+            for row in rows:
+                w.writerow(row)
+                n += 1
+                if n % CSV_FLUSH_ROWS == 0:
+                    chunk = buf.getvalue().encode("utf-8")
+                    buf.seek(0)
+                    buf.truncate()
+                    if f:
+                        f.write(chunk)
+                    yield chunk
+        except Exception:
+            yield buf.getvalue().encode("utf-8")   # 이미 만든 행까지 보내고 실패 (캐시에는 안 씀)
+            raise
+        chunk = buf.getvalue().encode("utf-8")
+        if f:
+            f.write(chunk)
+        yield chunk
+        done = True
+    finally:
+        if f:
+            f.close()
+            if not (done and _commit(report, tmp)):
+                remove_quietly(tmp)   # 중간에 끊김 / 조회 실패 / 조회 중 Influx 장애 -> 캐시하지 않음
+
+
+def stream_csv(report: Report, rows: Iterator[Row]) -> Iterator[bytes]:
+    """응답 시작 후 조회 실패 -> 잘린 파일이 정상처럼 보이지 않도록 마지막 줄에 오류 trailer"""
+    try:
+        yield from _csv_chunks(report, rows)
+    except Exception as e:
+        with _cache_lock:
+            _stats["errors"] += 1
+        log_limited(log, "report-csv", "❌ report stream failed: %r", e)
+        yield f"# error: report truncated ({e!r})\n".encode("utf-8")
+
+
+def build_csv(report: Report, rows: Iterator[Row]) -> bytes:
+    """작은 리포트: 전부 만든 뒤 전송 (조회 오류는 그대로 raise -> HTTP 상태)"""
+    return b"".join(_csv_chunks(report, rows))
+
+
+# =========================================================
+# XLSX (constant_memory)
+# =========================================================
+def build_xlsx(report: Report, rows: Iterator[Row]) -> Tuple[str, bool]:
+    """-> (파일 경로, 캐시 파일인지). 캐시 파일이 아니면 전송 후 삭제할 것"""
+    import xlsxwriter   # ✅ 첫 XLSX 요청에서 import (startup 비용 제외)
+
+    tmp = _tmp_path(report)
+    try:
+        wb = xlsxwriter.Workbook(tmp, {"constant_memory": True})
+        ws = wb.add_worksheet("Data")
+        ws.write_row(0, 0, ["Device", "Date", "Value"])
+
+        # 장치별 연속 행 범위 -> 차트 series
+        ranges: List[Tuple[str, int, int]] = []
+        r = 0
+        cur = None
+        first = 0
+        for device, label, value in rows:
+            r += 1
+            if device != cur:
+                if cur is not None:
+                    ranges.append((cur, first, r - 1))
+                cur, first = device, r
+            ws.write_string(r, 0, device)
+            ws.write_string(r, 1, label)
+            ws.write_number(r, 2, value)
+        if cur is not None:
+            ranges.append((cur, first, r))
+
+        spec = report.spec
+        if ranges:
+            chart = wb.add_chart({"type": "line"})
+            for device, a, b in ranges[:CHART_MAX_SERIES]:
+                chart.add_series({
+                    "name": device if len(ranges) > 1 else f"{spec.title} ({spec.metric}/{spec.series})",
+                    "categories": ["Data", a, 1, b, 1],
+                    "values": ["Data", a, 2, b, 2],
+                })
+            chart.set_title({"name": spec.title})
+            chart.set_x_axis({"name": "Date"})
+            chart.set_y_axis({"name": "Value"})
+            ws.insert_chart("E2", chart, {"x_scale": 1.4, "y_scale": 1.2})
+        wb.close()
+    except Exception:
+        remove_quietly(tmp)
+        raise
+
+    path = _commit(report, tmp)
+    return (path, True) if path else (tmp, False)
+
+
+def get_report_stats() -> dict:
+    files = 0
+    size = 0
+    try:
+        for name in os.listdir(REPORT_CACHE_DIR):
+            if not name.startswith(".tmp-"):
+                files += 1
+                size += os.path.getsize(os.path.join(REPORT_CACHE_DIR, name))
+    except OSError:
+        pass
+    with _cache_lock:
+        return {"dir": REPORT_CACHE_DIR, "files": files, "bytes": size, **_stats}
@@ -0,0 +1,330 @@
+# app/services/rollup_service.py
+"""
+✅ 수신 시점 rollup (minute / hour / day)
+
+- 장치 x 레벨마다 열린 버킷 1개: 컬럼별 count / sum / min / max (+ kwh 는 first / last)
+- 샘플이 다음 버킷으로 넘어가면 이전 버킷을 닫아서 INFLUX_ROLLUP_MEASUREMENT 로 기록
+  (조용한 장치는 sweeper 스레드가 end + ROLLUP_GRACE_SEC 지나면 닫음)
+- kwh_delta = 이번 버킷 마지막 kwh - 이전 버킷 마지막 kwh (버킷 사이 증가분까지 포함)
+- 닫힌 버킷보다 늦게 온 샘플은 버리고 late 카운트만 증가
+  (sweep 으로 버킷이 없어진 뒤에도 레벨별 마지막으로 닫은 버킷 end 를 기억 -> 닫힌 row 를 덮어쓰지 않음)
+- 종료(stop_rollup): 열린 버킷을 지금까지 값으로 기록 + 상태(열린 버킷, kwh_prev, 닫은 end)를 ROLLUP_STATE_PATH 에 저장
+  시작(start_rollup): 상태를 다시 읽어 같은 버킷에 이어서 집계 -> 닫힐 때 재시작 전후를 합친 값으로 같은 row 를 다시 씀
+  (재시작 사이 끝난 버킷은 sweeper 가 합친 값으로 닫음)
+
+row 1개 = (device, level, bucket start)
+  tags  : country, site_id, model, device_id, level
+  fields: {col}_min, {col}_max, {col}_sum, {col}_count, {col}_avg, kwh_last, kwh_delta
+/api/series, /api/report 는 raw 대신 이 row 를 읽음 (app/services/series_service.py)
+"""
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import (
+    INFLUX_ROLLUP_MEASUREMENT, ROLLUP_ENABLED, ROLLUP_GRACE_SEC, ROLLUP_SWEEP_SEC, ROLLUP_STATE_PATH,
+)
+from app.core.log import get_logger, log_limited
+from app.domain.timeseries import extract_values
+from app.services.influx_service import write_lines
+from app.services.series_service import window_floor, window_add
+from app.services.line_protocol import format_line
+
+log = get_logger(__name__)
+
+LEVELS = ("minute", "hour", "day")
+STATE_MAGIC = b"MONROLL1"
+
+# stats 리스트 index
+_COUNT, _SUM, _MIN, _MAX, _FIRST, _LAST = range(6)
+
+
+class _Bucket:
+    __slots__ = ("start", "end", "stats")
+
+    def __init__(self, start: float, end: float) -> None:
+        self.start = start
+        self.end = end
+        self.stats: Dict[str, list] = {}
+
+
+class _DeviceRollup:
+    __slots__ = ("meta", "buckets", "kwh_prev", "closed_end")
+
+    def __init__(self, meta: dict) -> None:
+        self.meta = meta
+        self.buckets: Dict[str, _Bucket] = {}
+        self.kwh_prev: Dict[str, float] = {}
+        self.closed_end: Dict[str, float] = {}   # 레벨별 마지막으로 닫은 버킷 end (이보다 이른 샘플 = late)
+
+
+def _bounds(ts: float, level: str):
+    start = window_floor(datetime.fromtimestamp(ts, timezone.utc), level)
+    return start.timestamp(), window_add(start, level).timestamp()
+
+
+class RollupEngine:
+    def __init__(
+        self,
+        emit: Callable[[List[str]], int],
+        levels=LEVELS,
+        grace: float = ROLLUP_GRACE_SEC,
+    ) -> None:
+        self.emit = emit
+        self.levels = tuple(levels)
+        self.grace = grace
+        self._devices: Dict[str, _DeviceRollup] = {}
+        self._lock = threading.Lock()
+
+        self.samples = 0
+        self.late = 0
+        self.closed = 0
+
+    # -----------------------------
+    # ingest (MQTT 수신 경로)
+    # -----------------------------
+    def add(self, rec) -> None:
+        values = extract_values(rec)
+        if not values:
+            return
+        ts = rec.ts
+        lines: List[str] = []
+
+        with self._lock:
+            dev = self._devices.get(rec.key)
+            if dev is None:
+                dev = self._devices[rec.key] = _DeviceRollup(rec.meta)
+            self.samples += 1
+
+            for level in self.levels:
+                b = dev.buckets.get(level)
+                if ts < dev.closed_end.get(level, 0.0):
+                    self.late += 1
+                    continue
+                if b is None or ts >= b.end:
+                    if b is not None:
+                        lines += self._close(dev, level, b)
+                    b = dev.buckets[level] = _Bucket(*_bounds(ts, level))
+                elif ts < b.start:
+                    self.late += 1
+                    continue
+
+                stats = b.stats
+                for name, v in values.items():
+                    st = stats.get(name)
+                    if st is None:
+                        stats[name] = [1, v, v, v, v, v]
+                        continue
+                    st[_COUNT] += 1
+                    st[_SUM] += v
+                    if v < st[_MIN]:
+                        st[_MIN] = v
+                    if v > st[_MAX]:
+                        st[_MAX] = v
+                    st[_LAST] = v
+
+        if lines:
+            self.emit(lines)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """end + grace 가 지난 버킷 닫기 (샘플이 끊긴 장치)"""
+        now = time.time() if now is None else now
+        lines: List[str] = []
+        with self._lock:
+            for dev in self._devices.values():
+                for level, b in list(dev.buckets.items()):
+                    if b.end + self.grace <= now:
+                        lines += self._close(dev, level, b)
+                        del dev.buckets[level]
+        if lines:
+            self.emit(lines)
+        return len(lines)
+
+    def flush_all(self) -> int:
+        """
+        종료 시 열린 버킷을 지금까지 값으로 기록 (버킷은 열린 채로 유지 -> export_state 로 저장)
+        재시작 후 load_state 로 이어서 집계하면 닫힐 때 합친 값으로 같은 row 를 다시 씀
+        """
+        lines: List[str] = []
+        with self._lock:
+            for dev in self._devices.values():
+                for level, b in dev.buckets.items():
+                    lines += self._row(dev, level, b, self._kwh_delta(dev, level, b))
+        if lines:
+            self.emit(lines)
+        return len(lines)
+
+    # -----------------------------
+    # 재시작 사이 상태
+    # -----------------------------
+    def export_state(self) -> dict:
+        """key -> (meta, {level: (start, end, stats)}, kwh_prev, closed_end)"""
+        with self._lock:
+            return {
+                key: (
+                    dev.meta,
+                    {lv: (b.start, b.end, {n: list(st) for n, st in b.stats.items()}) for lv, b in dev.buckets.items()},
+                    dict(dev.kwh_prev),
+                    dict(dev.closed_end),
+                )
+                for key, dev in self._devices.items()
+            }
+
+    def load_state(self, state: dict) -> int:
+        """export_state 결과 복원 (수신 시작 전에 호출, 이미 있는 장치는 건드리지 않음)"""
+        n = 0
+        with self._lock:
+            for key, (meta, buckets, kwh_prev, closed_end) in state.items():
+                if key in self._devices:
+                    continue
+                dev = self._devices[key] = _DeviceRollup(meta)
+                for level, (start, end, stats) in buckets.items():
+                    b = dev.buckets[level] = _Bucket(start, end)
+                    b.stats = stats
+                dev.kwh_prev.update(kwh_prev)
+                dev.closed_end.update(closed_end)
+                n += 1
+        return n
+
+    # -----------------------------
+    # 버킷 -> line protocol
+    # -----------------------------
+    def _kwh_delta(self, dev: _DeviceRollup, level: str, b: _Bucket) -> Optional[float]:
+        kwh = b.stats.get("kwh")
+        if kwh is None:
+            return None
+        prev = dev.kwh_prev.get(level)
+        delta = kwh[_LAST] - prev if prev is not None else kwh[_LAST] - kwh[_FIRST]
+        if delta < 0:
+            # 미터 리셋 등 -> 버킷 내부 증가분만
+            delta = max(0.0, kwh[_LAST] - kwh[_FIRST])
+        return delta
+
+    def _close(self, dev: _DeviceRollup, level: str, b: _Bucket) -> List[str]:
+        self.closed += 1
+        delta = self._kwh_delta(dev, level, b)
+        if delta is not None:
+            dev.kwh_prev[level] = b.stats["kwh"][_LAST]
+        dev.closed_end[level] = max(b.end, dev.closed_end.get(level, 0.0))
+        return self._row(dev, level, b, delta)
+
+    def _row(self, dev: _DeviceRollup, level: str, b: _Bucket, delta: Optional[float]) -> List[str]:
+        if not b.stats:
+            return []
+        kwh = b.stats.get("kwh")
+
+        # ✅ influxdb_client.Point 없이 line 직접 생성 (출력 동일, startup 에 client import 불필요)
+        meta = dev.meta
+        tags = {
+            "country": str(meta.get("country")),
+            "site_id": str(meta.get("site_id")),
+            "model": str(meta.get("model")),
+            "device_id": str(meta.get("device_id")),
+            "level": level,
+        }
+        fields = {}
+        for name, st in b.stats.items():
+            fields[f"{name}_min"] = float(st[_MIN])
+            fields[f"{name}_max"] = float(st[_MAX])
+            fields[f"{name}_sum"] = float(st[_SUM])
+            fields[f"{name}_count"] = int(st[_COUNT])
+            fields[f"{name}_avg"] = float(st[_SUM] / st[_COUNT])
+        if kwh is not None:
+            fields["kwh_last"] = float(kwh[_LAST])
+            fields["kwh_delta"] = float(delta)
+        line = format_line(INFLUX_ROLLUP_MEASUREMENT, tags, fields, int(b.start * 1_000_000_000))
+        return [line] if line else []
+
+    def stats(self) -> dict:
+        with self._lock:
+            open_buckets = sum(len(d.buckets) for d in self._devices.values())
+            return {
+                "devices": len(self._devices),
+                "open_buckets": open_buckets,
+                "samples": self.samples,
+                "closed": self.closed,
+                "late": self.late,
+            }
+
+
+rollups = RollupEngine(write_lines)
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _sweep_loop() -> None:
+    while not _stop.wait(ROLLUP_SWEEP_SEC):
+        try:
+            rollups.sweep()
+        except Exception as e:
+            log_limited(log, "rollup-sweep", "❌ rollup sweep error: %r", e)
+
+
+def save_state(path: str = ROLLUP_STATE_PATH) -> int:
+    """열린 버킷 / kwh_prev / 닫은 end 저장 (tmp + fsync + replace, snapshot 과 같은 방식)"""
+    if not path:
+        return 0
+    state = rollups.export_state()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(STATE_MAGIC)
+        f.write(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(state)
+
+
+def load_state(path: str = ROLLUP_STATE_PATH) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(STATE_MAGIC)) != STATE_MAGIC:
+                log.warning("⚠️ rollup state ignored (bad header): %s", path)
+                return 0
+            state = pickle.load(f)
+        n = rollups.load_state(state)
+    except Exception as e:
+        log.error("❌ rollup state load failed: %r", e)
+        return 0
+    log.info("✅ rollup state restored: %d devices (%s)", n, path)
+    return n
+
+
+def start_rollup() -> None:
+    global _thread
+    if not ROLLUP_ENABLED or (_thread and _thread.is_alive()):
+        return
+    # ✅ 수신 시작 전에 (start_mqtt 보다 먼저 불림) 이전 프로세스의 열린 버킷을 이어받음
+    load_state()
+    _stop.clear()
+    _thread = threading.Thread(target=_sweep_loop, name="rollup-sweeper", daemon=True)
+    _thread.start()
+    log.info("✅ Rollup enabled -> %s (levels=%s)", INFLUX_ROLLUP_MEASUREMENT, ",".join(rollups.levels))
+
+
+def stop_rollup() -> None:
+    _stop.set()
+    if _thread:
+        _thread.join(timeout=2)
+    if ROLLUP_ENABLED:
+        rollups.flush_all()
+        try:
+            save_state()
+        except Exception as e:
+            log.error("❌ rollup state save failed: %r", e)
+
+
+def add_record(rec) -> None:
+    if ROLLUP_ENABLED:
+        rollups.add(rec)
+
+
+def get_rollup_stats() -> dict:
+    return {"enabled": ROLLUP_ENABLED, **rollups.stats()}
@@ -0,0 +1,355 @@
+# app/services/series_service.py
+"""
+✅ /api/series: Influx 에서 Flux aggregateWindow 로 집계 (write_to_influx 가 쓴 태그 기준)
+
+- series=total        -> scope=summary, field = kw / kwh / v_avg / a_avg / pf_avg
+- series=l1|l2|l3     -> v/a/pf 는 summary 의 *_l1..3, kw 는 scope=channel + phase=L1..3
+- kwh 는 누적 카운터라 구간별 사용량 = spread(max-min), 나머지는 mean
+- 결과는 TTL+LRU 캐시: 이미 닫힌 과거 구간은 오래, 현재 열린 구간만 짧은 TTL 로 다시 계산
+- 닫힌 구간은 수신 시점 rollup(app/services/rollup_service.py) row 를 읽음 -> O(window 수)
+  (rollup 이 없는 window -- rollup 도입 이전 / 꺼져 있던 구간 -- 와 첫 rollup window 는 raw 로 채움,
+   방금 닫힌 window 는 rollup 이 기록될 때까지 raw)
+- 최근 구간은 in-memory ring buffer(app/domain/timeseries.py)가 덮고 있으면 Influx 없이 바로 집계
+  (요청 범위 전체가 ring 안이면 전부 메모리, 아니면 열린 구간만 메모리 + 닫힌 구간은 Influx 캐시)
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import (
+    INFLUX_BUCKET, INFLUX_MEASUREMENT, INFLUX_FLUSH_MS,
+    INFLUX_ROLLUP_MEASUREMENT, ROLLUP_ENABLED, ROLLUP_GRACE_SEC, ROLLUP_SWEEP_SEC,
+    SERIES_TZ, SERIES_CACHE_MAX, SERIES_CACHE_OPEN_TTL, SERIES_CACHE_CLOSED_TTL,
+)
+from app.domain.timeseries import history, CHANNEL_KW_COLUMNS
+from app.services.influx_service import query_flux
+from app.services.query_cache import TTLLRUCache
+
+try:
+    TZ = ZoneInfo(SERIES_TZ)
+except Exception:
+    TZ = timezone.utc
+
+GROUP_EVERY = {"minute": "1m", "hour": "1h", "day": "1d", "month": "1mo"}
+DEFAULT_WINDOWS = {"minute": 60, "hour": 24, "day": 30, "month": 12}
+ROLLUP_LEVEL = {"minute": "minute", "hour": "hour", "day": "day", "month": "day"}
+# 버킷이 닫혀서 Influx 에 보일 때까지 걸리는 최대 시간
+ROLLUP_SETTLE_SEC = ROLLUP_GRACE_SEC + ROLLUP_SWEEP_SEC + INFLUX_FLUSH_MS / 1000.0 + 5
+METRICS = ("kwh", "kw", "v", "a", "pf")
+SERIES = ("total", "l1", "l2", "l3")
+
+_cache = TTLLRUCache(SERIES_CACHE_MAX)
+
+
+class SeriesError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SeriesQuery:
+    """정규화된 조회 조건 (캐시 key 로도 사용)"""
+    tags: Tuple[Tuple[str, str], ...]
+    metric: str
+    series: str
+    group: str
+
+    def field(self) -> Tuple[str, str, Optional[str], str]:
+        """(scope, field, phase, agg)"""
+        agg = "spread" if self.metric == "kwh" else "mean"
+        if self.series == "total" or self.metric == "kwh":
+            name = self.metric if self.metric in ("kw", "kwh") else f"{self.metric}_avg"
+            return "summary", name, None, agg
+        n = self.series[-1]
+        if self.metric == "kw":
+            return "channel", "kw", f"L{n}", agg
+        return "summary", f"{self.metric}_l{n}", None, agg
+
+
+# =========================================================
+# 입력 정규화
+# =========================================================
+def parse_device(device: str) -> Tuple[Tuple[str, str], ...]:
+    """'country/site_id/model/device_id' (make_key) 또는 device_id 만"""
+    device = (device or "").strip()
+    if not device:
+        raise SeriesError("device is required")
+    parts = device.split("/")
+    if len(parts) == 4 and all(parts):
+        return tuple(zip(("country", "site_id", "model", "device_id"), parts))
+    return (("device_id", device),)
+
+
+def make_query(device: str, metric: str, series: str, group: str) -> SeriesQuery:
+    metric = (metric or "kwh").lower()
+    series = (series or "total").lower()
+    group = (group or "day").lower()
+    if metric not in METRICS:
+        raise SeriesError(f"unsupported metric: {metric}")
+    if series not in SERIES:
+        raise SeriesError(f"unsupported series: {series}")
+    if group not in GROUP_EVERY:
+        raise SeriesError(f"unsupported group: {group}")
+    return SeriesQuery(parse_device(device), metric, series, group)
+
+
+def window_floor(dt: datetime, group: str) -> datetime:
+    local = dt.astimezone(TZ)
+    if group == "minute":
+        return local.replace(second=0, microsecond=0)
+    if group == "hour":
+        return local.replace(minute=0, second=0, microsecond=0)
+    if group == "day":
+        return datetime.combine(local.date(), dtime(), tzinfo=TZ)
+    return datetime.combine(local.date().replace(day=1), dtime(), tzinfo=TZ)
+
+
+def window_add(dt: datetime, group: str, n: int = 1) -> datetime:
+    if group == "minute":
+        return dt + timedelta(minutes=n)
+    if group == "hour":
+        return dt + timedelta(hours=n)
+    local = dt.astimezone(TZ)
+    if group == "day":
+        return datetime.combine(local.date() + timedelta(days=n), dtime(), tzinfo=TZ)
+    m = local.year * 12 + (local.month - 1) + n
+    return datetime.combine(date(m // 12, m % 12 + 1, 1), dtime(), tzinfo=TZ)
+
+
+def _parse_dt(s: str, end: bool) -> Optional[datetime]:
+    s = (s or "").strip()
+    if not s:
+        return None
+    try:
+        if len(s) == 10:
+            d = date.fromisoformat(s)
+            if end:
+                d = d + timedelta(days=1)  # 날짜만 오면 그 날 포함
+            return datetime.combine(d, dtime(), tzinfo=TZ)
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        raise SeriesError(f"invalid datetime: {s}")
+    return dt if dt.tzinfo else dt.replace(tzinfo=TZ)
+
+
+def resolve_range(date_from: str, date_to: str, group: str, now: datetime) -> Tuple[datetime, datetime]:
+    """[start, stop) 를 window 경계에 맞춤. to 가 없으면 현재 window 끝까지."""
+    cur_end = window_add(window_floor(now, group), group)
+    stop = _parse_dt(date_to, end=True) or cur_end
+    stop = min(stop, cur_end)
+    start = _parse_dt(date_from, end=False)
+    if start is None:
+        start = window_add(window_floor(stop, group), group, -DEFAULT_WINDOWS[group])
+    start = window_floor(start, group)
+    if start >= stop:
+        raise SeriesError("from must be before to")
+    return start, stop
+
+
+# =========================================================
+# Flux
+# =========================================================
+def _flux_str(v: str) -> str:
+    return '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _rfc3339(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def build_flux(q: SeriesQuery, start: datetime, stop: datetime) -> str:
+    scope, field, phase, agg = q.field()
+    conds = [
+        f"r._measurement == {_flux_str(INFLUX_MEASUREMENT)}",
+        f"r._field == {_flux_str(field)}",
+        f"r.scope == {_flux_str(scope)}",
+    ]
+    conds += [f"r.{k} == {_flux_str(v)}" for k, v in q.tags]
+    if phase:
+        # ✅ ring / rollup 과 같은 기준: 입력(term=in) 채널의 상별 kW
+        conds.append(f"r.phase == {_flux_str(phase)}")
+        conds.append('r.term == "in"')
+
+    head = ""
+    loc = ""
+    if str(TZ) not in ("UTC", "Etc/UTC"):
+        head = 'import "timezone"\n'
+        loc = f", location: timezone.location(name: {_flux_str(SERIES_TZ)})"
+
+    return (
+        f"{head}from(bucket: {_flux_str(INFLUX_BUCKET)})\n"
+        f"  |> range(start: {_rfc3339(start)}, stop: {_rfc3339(stop)})\n"
+        f"  |> filter(fn: (r) => {' and '.join(conds)})\n"
+        f"  |> group()\n"
+        f"  |> aggregateWindow(every: {GROUP_EVERY[q.group]}, fn: {agg}, createEmpty: false, timeSrc: \"_start\"{loc})\n"
+        f'  |> keep(columns: ["_time", "_value"])\n'
+    )
+
+
+def build_rollup_flux(q: SeriesQuery, start: datetime, stop: datetime) -> str:
+    """rollup row 기준: kwh 는 kwh_delta 합, 나머지는 sum/count 가중 평균"""
+    _, _, _, agg = q.field()
+    col = _column(q)
+    conds = [
+        f"r._measurement == {_flux_str(INFLUX_ROLLUP_MEASUREMENT)}",
+        f"r.level == {_flux_str(ROLLUP_LEVEL[q.group])}",
+    ]
+    conds += [f"r.{k} == {_flux_str(v)}" for k, v in q.tags]
+
+    head = ""
+    loc = ""
+    if str(TZ) not in ("UTC", "Etc/UTC"):
+        head = 'import "timezone"\n'
+        loc = f", location: timezone.location(name: {_flux_str(SERIES_TZ)})"
+    window = f"aggregateWindow(every: {GROUP_EVERY[q.group]}, fn: sum, createEmpty: false, timeSrc: \"_start\"{loc})"
+
+    flux = (
+        f"{head}from(bucket: {_flux_str(INFLUX_BUCKET)})\n"
+        f"  |> range(start: {_rfc3339(start)}, stop: {_rfc3339(stop)})\n"
+    )
+    if agg == "spread":
+        conds.append('r._field == "kwh_delta"')
+        return flux + (
+            f"  |> filter(fn: (r) => {' and '.join(conds)})\n"
+            f"  |> group()\n"
+            f"  |> {window}\n"
+            f'  |> keep(columns: ["_time", "_value"])\n'
+        )
+    conds.append(f'(r._field == "{col}_sum" or r._field == "{col}_count")')
+    return flux + (
+        f"  |> filter(fn: (r) => {' and '.join(conds)})\n"
+        f"  |> map(fn: (r) => ({{r with _value: float(v: r._value)}}))\n"
+        f'  |> group(columns: ["_field"])\n'
+        f"  |> {window}\n"
+        f'  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")\n'
+        f"  |> filter(fn: (r) => r.{col}_count > 0.0)\n"
+        f"  |> map(fn: (r) => ({{_time: r._time, _value: r.{col}_sum / r.{col}_count}}))\n"
+    )
+
+
+def _run(
+    q: SeriesQuery, start: datetime, stop: datetime, ttl: float, rollup: bool = False,
+) -> List[Tuple[datetime, float]]:
+    key = (q, start.isoformat(), stop.isoformat(), rollup)
+    hit = _cache.get(key)
+    if hit is not None:
+        return hit
+    flux = build_rollup_flux(q, start, stop) if rollup else build_flux(q, start, stop)
+    rows = []
+    for t, v in query_flux(flux):
+        if v is None:
+            continue
+        try:
+            rows.append((t, float(v)))
+        except (TypeError, ValueError):
+            continue
+    _cache.set(key, rows, ttl)
+    return rows
+
+
+# =========================================================
+# in-memory ring buffer
+# =========================================================
+def _ring_key(q: SeriesQuery) -> Optional[str]:
+    tags = dict(q.tags)
+    if len(tags) == 4:
+        return "/".join(tags[k] for k in ("country", "site_id", "model", "device_id"))
+    return history.find(tags.get("device_id", ""))
+
+
+def _column(q: SeriesQuery) -> str:
+    scope, field, phase, _ = q.field()
+    return CHANNEL_KW_COLUMNS[phase] if scope == "channel" else field
+
+
+def _ring_from(q: SeriesQuery, key: str) -> Optional[datetime]:
+    """ring 이 빠짐없이 덮는 첫 window 시작 (가장 오래된 샘플 이후 경계)"""
+    oldest = history.oldest_ts(key)
+    if oldest is None:
+        return None
+    o = datetime.fromtimestamp(oldest, timezone.utc)
+    w = window_floor(o, q.group)
+    return w if w >= o else window_add(w, q.group)
+
+
+def _ring_rows(q: SeriesQuery, key: str, start: datetime, stop: datetime) -> List[Tuple[datetime, float]]:
+    wins = []
+    t = start
+    while t < stop:
+        wins.append(t)
+        t = window_add(t, q.group)
+    bounds = [w.timestamp() for w in wins] + [stop.timestamp()]
+    agg = q.field()[3]
+    return [(wins[i], v) for i, v in history.aggregate(key, _column(q), bounds, agg)]
+
+
+def _closed(q: SeriesQuery, start: datetime, stop: datetime) -> List[Tuple[datetime, float]]:
+    if not ROLLUP_ENABLED:
+        return _run(q, start, stop, SERIES_CACHE_CLOSED_TTL)
+    rows = _run(q, start, stop, SERIES_CACHE_CLOSED_TTL, rollup=True)
+    if not rows:
+        # rollup 도입 이전 구간 -> raw
+        return _run(q, start, stop, SERIES_CACHE_CLOSED_TTL)
+
+    # ✅ rollup 이 없는 window 만 raw 로 채움
+    # - 첫 rollup window 까지: rollup 도입 이전 + 도입 시점 window 는 일부 샘플만 rollup 에 있을 수 있음
+    # - 그 뒤 빈 window: rollup 이 꺼져 있던 구간 (장치가 쉬었던 구간이면 raw 도 비어 있음 -> 캐시)
+    have = {window_floor(t, q.group): v for t, v in rows}
+    first = window_add(min(have), q.group)
+    out = [(t, v) for t, v in have.items() if t >= first]
+    gaps = [(start, first)] if start < first else []
+    t = first
+    while t < stop:
+        nxt = window_add(t, q.group)
+        if t not in have:
+            if gaps and gaps[-1][1] == t:
+                gaps[-1] = (gaps[-1][0], nxt)
+            else:
+                gaps.append((t, nxt))
+        t = nxt
+    for a, b in gaps:
+        out += _run(q, a, min(b, stop), SERIES_CACHE_CLOSED_TTL)
+    return out
+
+
+def get_series(q: SeriesQuery, start: datetime, stop: datetime, now: Optional[datetime] = None):
+    """[(window_start, value), ...]  닫힌 구간 / 열린 구간을 나눠 캐시"""
+    now = now or datetime.now(timezone.utc)
+    cur_start = window_floor(now, q.group)
+
+    key = _ring_key(q)
+    ring_from = _ring_from(q, key) if key else None
+    if ring_from is not None and ring_from <= start:
+        return _ring_rows(q, key, start, stop)
+
+    # 방금 닫힌 window 는 rollup 이 Influx 에 보일 때까지 raw + 짧은 TTL
+    settled = cur_start
+    if ROLLUP_ENABLED and now < cur_start + timedelta(seconds=ROLLUP_SETTLE_SEC):
+        settled = window_add(cur_start, q.group, -1)
+
+    rows: List[Tuple[datetime, float]] = []
+    if start < settled:
+        rows += _closed(q, start, min(stop, settled))
+    if start < cur_start and stop > settled:
+        rows += _run(q, max(start, settled), min(stop, cur_start), SERIES_CACHE_OPEN_TTL)
+    if stop > cur_start:
+        open_start = max(start, cur_start)
+        if ring_from is not None and ring_from <= open_start:
+            rows += _ring_rows(q, key, open_start, stop)
+        else:
+            rows += _run(q, open_start, stop, SERIES_CACHE_OPEN_TTL)
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def format_label(dt: datetime, group: str) -> str:
+    local = dt.astimezone(TZ)
+    if group == "month":
+        return local.strftime("%Y-%m")
+    if group == "day":
+        return local.strftime("%Y-%m-%d")
+    return local.strftime("%Y-%m-%d %H:%M")
+
+
+def cache_stats() -> dict:
+    return {**_cache.stats(), "history": history.stats()}
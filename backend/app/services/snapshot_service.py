@@ -0,0 +1,144 @@
+# app/services/snapshot_service.py
+"""
+✅ 장치 캐시 스냅샷 / warm restart
+
+- SNAPSHOT_SEC 마다 registry 의 최신 record 전체를 SNAPSHOT_PATH 에 저장
+  파일 = MAGIC + pickle(list of (key, meta, payload, summary, channels, ts))
+  tmp 파일에 쓰고 fsync 후 os.replace -> 중간에 죽어도 이전 스냅샷은 그대로
+- 시작 시 load_snapshot(): last_seen 오래된 순으로 registry 에 넣고 liveness 도 복원
+  (ONLINE_SEC 이 지난 장치는 offline 으로 시작)
+  로드는 snapshot 스레드에서 (startup 을 막지 않음, 끝나면 health "snapshot" = ready)
+  MQTT 가 먼저 붙어 새 record 가 들어와도 put_many / liveness.touch 가 더 오래된 쪽을 버림
+  (live record 뒤에 더 오래된 스냅샷 record 가 붙으면 put_many 가 (ts, key) 순서로 재정렬)
+- msgpack 은 requirements 에 없어서 pickle(HIGHEST_PROTOCOL) 사용. 자기 프로세스가 쓴 로컬 파일만 읽음
+"""
+import gc
+import os
+import pickle
+import threading
+import time
+from typing import Optional
+
+from app.core.config import SNAPSHOT_PATH, SNAPSHOT_SEC
+from app.core.log import get_logger, log_limited
+from app.core.health import set_state
+from app.domain.device_store import registry, TelemetryRecord
+from app.services.liveness_service import touch_record
+
+log = get_logger(__name__)
+
+MAGIC = b"MONSNAP1"
+
+_stop = threading.Event()
+_loaded = threading.Event()   # 로드 끝나기 전에는 종료 시 저장 안 함
+_thread: Optional[threading.Thread] = None
+_stats = {"saved": 0, "last_save_ts": None, "last_save_ms": None, "last_bytes": None, "loaded": 0, "load_ms": None}
+
+
+def save_snapshot(path: str = SNAPSHOT_PATH) -> int:
+    t0 = time.perf_counter()
+    rows = [(r.key, r.meta, r.payload, r.summary, r.channels, r.ts) for r in registry.values()]
+    body = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    _stats["saved"] += 1
+    _stats["last_save_ts"] = time.time()
+    _stats["last_save_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    _stats["last_bytes"] = len(body) + len(MAGIC)
+    return len(rows)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    t0 = time.perf_counter()
+    # ✅ 작은 dict 수십만 개를 만드는 동안 GC 가 계속 돌지 않게 (로드 시간 절반 이상이 GC)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                log.warning("⚠️ snapshot ignored (bad header): %s", path)
+                return 0
+            rows = pickle.load(f)
+
+        rows.sort(key=lambda r: r[5])  # registry 가 비어 있으면 이 순서 그대로 (재정렬 없음)
+        recs = [TelemetryRecord(*r) for r in rows]
+        # 재시작 사이에 이미 새 메시지가 들어온 장치는 put_many 가 건너뜀
+        registry.put_many(recs)
+        for rec in recs:
+            touch_record(rec)
+    except Exception as e:
+        log.error("❌ snapshot load failed: %r", e)
+        return 0
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    _stats["loaded"] = len(rows)
+    _stats["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    log.info("✅ snapshot loaded: %d devices in %.1f ms (%s)", len(rows), _stats["load_ms"], path)
+    return len(rows)
+
+
+def _run() -> None:
+    load_snapshot()
+    _loaded.set()
+    set_state("snapshot", "ready")
+    while not _stop.wait(SNAPSHOT_SEC):
+        try:
+            save_snapshot()
+        except Exception as e:
+            log_limited(log, "snapshot", "❌ snapshot save failed: %r", e)
+
+
+def start_snapshots() -> None:
+    """스레드 시작: 1회 로드 + 주기 저장"""
+    global _thread
+    if not SNAPSHOT_PATH or SNAPSHOT_SEC <= 0:
+        set_state("snapshot", "disabled")
+        return
+    if _thread and _thread.is_alive():
+        return
+    set_state("snapshot", "starting", "loading")
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="snapshot", daemon=True)
+    _thread.start()
+
+
+def wait_loaded(timeout: Optional[float] = None) -> bool:
+    """시작 시 로드가 끝날 때까지 대기 (스냅샷 꺼져 있으면 바로 True)"""
+    if _thread is None:
+        return True
+    return _loaded.wait(timeout)
+
+
+def stop_snapshots() -> None:
+    """종료 시 마지막 상태 저장"""
+    global _thread
+    if not _thread:
+        return
+    _stop.set()
+    _thread.join(timeout=2)
+    _thread = None
+    if not _loaded.is_set():
+        # 로드가 끝나기 전에 저장하면 이전 스냅샷을 빈/일부 registry 로 덮어씀
+        log.warning("⚠️ snapshot not saved on shutdown: load still in progress")
+        return
+    try:
+        n = save_snapshot()
+        log.info("✅ snapshot saved on shutdown: %d devices", n)
+    except Exception as e:
+        log.error("❌ snapshot save failed: %r", e)
+
+
+def get_snapshot_stats() -> dict:
+    return {"path": SNAPSHOT_PATH, "interval_sec": SNAPSHOT_SEC, **_stats}
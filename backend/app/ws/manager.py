@@ -1,46 +1,412 @@
 # app/ws/manager.py
 import asyncio
 import json
-from typing import Any, Dict, Set
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from fastapi import WebSocket
 
+from app.core.config import WS_SEND_QUEUE, WS_SLOW_POLICY, WS_SEND_TIMEOUT, WS_MAX_PENDING
+from app.core.metrics import WS_BROADCAST_SECONDS
+from app.ws.subscriptions import SubscriptionIndex, validate_pattern, intersect
+from app.ws.stream import ClientStream
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+ALL = "#"                  # 구독 메시지를 안 보낸 기존 클라이언트 = 전체 수신
+MAX_PATTERNS_PER_CLIENT = 64
+
+
+class _Client:
+    """연결 1개 = bounded 송신 큐 1개 + writer task 1개
+    (asyncio.Queue 대신 deque + Event: 메시지마다 waiter 를 깨우지 않고 쌓인 만큼 한 번에 보냄)"""
+
+    __slots__ = ("ws", "queue", "maxsize", "wake", "task", "sent", "dropped", "last_lag", "max_lag", "busy_since", "implicit_all", "stream", "closed", "scope", "requested", "user")
+
+    def __init__(self, ws: WebSocket, maxsize: int, scope: Optional[List[str]] = None) -> None:
+        self.ws = ws
+        self.queue: "deque[tuple[float, str]]" = deque()
+        self.maxsize = maxsize
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.busy_since = 0.0   # send_text 진행 중이면 시작 시각, 아니면 0
+        self.implicit_all = True
+        self.stream: Optional[ClientStream] = None   # options(max_fps/delta) 설정 시에만
+        self.closed = False
+        # 접근 범위 pattern (None = 제한 없음). 인덱스에는 requested ∩ scope 만 등록됨
+        self.scope = scope
+        self.requested: set = set()
+        self.user: Optional[str] = None
+
+
 class WSManager:
-    def __init__(self) -> None:
-        self._clients: Set[WebSocket] = set()
+    """
+    ✅ 직렬화 1회 + 클라이언트별 큐로 fan-out
+    - publish()는 각 클라이언트 큐에 넣기만 함 (await 없음) -> 느린 브라우저가 다른 클라이언트를 막지 않음
+    - 큐가 가득 차면 policy 에 따라 가장 오래된 메시지를 버리거나(drop_oldest) 연결을 끊음(disconnect)
+    """
+
+    def __init__(
+        self,
+        queue_size: int = WS_SEND_QUEUE,
+        policy: str = WS_SLOW_POLICY,
+        send_timeout: float = WS_SEND_TIMEOUT,
+        max_pending: int = WS_MAX_PENDING,
+    ) -> None:
+        self._clients: Dict[WebSocket, _Client] = {}
+        self._index = SubscriptionIndex()
         self._lock = asyncio.Lock()
+        self.queue_size = max(1, int(queue_size))
+        self.policy = policy if policy in (DROP_OLDEST, DISCONNECT) else DROP_OLDEST
+        self.send_timeout = float(send_timeout)
 
-    async def connect(self, ws: WebSocket) -> None:
+        # MQTT 스레드 -> 이벤트 루프로 넘어가는 중인 메시지 수 (무한정 쌓이지 않게)
+        self.max_pending = max(1, int(max_pending))
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+        # metrics
+        self.published = 0
+        self.sent = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.pending_dropped = 0
+
+    async def connect(self, ws: WebSocket, scope: Optional[List[str]] = None, user: Optional[str] = None) -> None:
+        """scope: 이 연결이 볼 수 있는 key pattern 목록 (None = 전체, [] = 아무것도)"""
         # ❌ await ws.accept()  ← 이 줄 제거 (중복 accept 방지)
+        c = _Client(ws, self.queue_size, None if scope is None else list(scope))
+        c.user = user
+        c.task = asyncio.create_task(self._writer(c))
         async with self._lock:
-            self._clients.add(ws)
+            self._clients[ws] = c
+            # ✅ 하위 호환: subscribe 를 보내기 전까지는 전체 수신 (scope 안에서)
+            c.requested.add(ALL)
+            self._sync_index(c)
+
+    def _effective(self, c: _Client, pattern: str) -> List[str]:
+        if c.scope is None:
+            return [pattern]
+        out = []
+        for sp in c.scope:
+            x = intersect(pattern, sp)
+            if x is not None:
+                out.append(x)
+        return out
+
+    def _sync_index(self, c: _Client) -> None:
+        """requested 가 바뀔 때마다 인덱스 등록분을 requested ∩ scope 로 맞춤"""
+        want = set()
+        for pat in c.requested:
+            want.update(self._effective(c, pat))
+        have = set(self._index.patterns(c))
+        for pat in have - want:
+            self._index.discard(c, pat)
+        for pat in want - have:
+            self._index.add(c, pat)
 
     async def disconnect(self, ws: WebSocket) -> None:
         async with self._lock:
-            self._clients.discard(ws)
+            c = self._clients.pop(ws, None)
+        if c:
+            self._close_client(c)
+
+    # -----------------------------
+    # subscription
+    # -----------------------------
+    def subscribe(self, ws: WebSocket, patterns: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """(accepted, rejected). 첫 명시적 subscribe 에서 기본 전체 구독("#")은 해제됨."""
+        c = self._clients.get(ws)
+        if not c:
+            return [], list(patterns)
+        if c.implicit_all:
+            c.requested.discard(ALL)
+            c.implicit_all = False
+
+        accepted: List[str] = []
+        rejected: List[str] = []
+        for raw in patterns:
+            pat = validate_pattern(raw)
+            if (
+                pat is None
+                or len(c.requested) >= MAX_PATTERNS_PER_CLIENT
+                or not self._effective(c, pat)   # 접근 범위와 겹치지 않음
+            ):
+                rejected.append(raw)
+                continue
+            c.requested.add(pat)
+            accepted.append(pat)
+        self._sync_index(c)
+        return accepted, rejected
+
+    def unsubscribe(self, ws: WebSocket, patterns: Iterable[str]) -> List[str]:
+        c = self._clients.get(ws)
+        if not c:
+            return []
+        if c.implicit_all:
+            c.requested.discard(ALL)
+            c.implicit_all = False
+        removed = []
+        for raw in patterns:
+            pat = validate_pattern(raw)
+            if pat is not None and pat in c.requested:
+                c.requested.discard(pat)
+                removed.append(pat)
+        self._sync_index(c)
+        return removed
+
+    def subscriptions(self, ws: WebSocket) -> List[str]:
+        c = self._clients.get(ws)
+        return sorted(c.requested) if c else []
+
+    def scope(self, ws: WebSocket) -> Optional[List[str]]:
+        c = self._clients.get(ws)
+        return c.scope if c else None
 
+    # -----------------------------
+    # coalescing / delta options
+    # -----------------------------
+    def set_options(self, ws: WebSocket, max_fps: float = 0.0, delta: bool = False) -> Dict[str, Any]:
+        """max_fps > 0 또는 delta 면 stream 모드 (app/ws/stream.py), 둘 다 끄면 일반 모드"""
+        c = self._clients.get(ws)
+        if not c:
+            return {}
+        if (max_fps or 0) <= 0 and not delta:
+            st = c.stream
+            c.stream = None
+            if st:
+                if st.timer:
+                    st.timer.cancel()
+                # 대기 중이던 최신값은 일반 큐로 넘김
+                for ts, msg, _ in st.pending.values():
+                    self._enqueue(c, ts, msg)
+            return {"max_fps": 0, "delta": False}
+
+        if c.stream is None:
+            c.stream = ClientStream(max_fps, delta)
+        else:
+            c.stream.configure(max_fps, delta)
+        st = c.stream.stats()
+        return {"max_fps": st["max_fps"], "delta": st["delta"]}
+
+    # -----------------------------
+    # publish
+    # -----------------------------
     async def broadcast(self, event: Dict[str, Any]) -> None:
-        msg = json.dumps(event, ensure_ascii=False)
+        self.publish(json.dumps(event, ensure_ascii=False), event.get("key"), event)
 
-        async with self._lock:
-            clients = list(self._clients)
+    def publish(self, msg: str, key: Optional[str] = None, event: Optional[Dict[str, Any]] = None) -> None:
+        """이미 직렬화된 메시지를 큐에 넣음 (루프 스레드에서 호출)
+        key 가 있으면 구독 인덱스로 관심 있는 클라이언트만, 없으면 전체.
+        event(원본 dict)가 있으면 stream 모드 클라이언트는 coalescing/delta 처리."""
+        self.published += 1
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        if key is not None:
+            targets = self._index.match(key)
+        else:
+            # key 없는 메시지는 범위 제한 없는 연결에만
+            targets = tuple(c for c in self._clients.values() if c.scope is None)
+        for c in targets:
+            if c.stream is not None and event is not None and key is not None:
+                self._offer(c, now, key, msg, event)
+            else:
+                self._enqueue(c, now, msg)
+        WS_BROADCAST_SECONDS.observe(time.perf_counter() - t0)
+
+    def publish_threadsafe(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        msg: str,
+        key: Optional[str] = None,
+        event: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """MQTT 등 다른 스레드에서 호출. 루프 대기열이 상한을 넘으면 drop 하고 False."""
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                self.pending_dropped += 1
+                return False
+            self._pending += 1
+        try:
+            loop.call_soon_threadsafe(self._publish_pending, msg, key, event)
+        except RuntimeError:
+            # 루프 종료됨
+            with self._pending_lock:
+                self._pending -= 1
+            return False
+        return True
+
+    def _publish_pending(self, msg: str, key: Optional[str], event: Optional[Dict[str, Any]]) -> None:
+        with self._pending_lock:
+            self._pending -= 1
+        self.publish(msg, key, event)
+
+    async def send(self, ws: WebSocket, msg: str) -> bool:
+        """특정 연결 1개에만 보냄 (ping 등). writer task 를 거치므로 send 가 겹치지 않음.
+        이미 정리된(evict 된) 연결이면 False."""
+        c = self._clients.get(ws)
+        if not c or c.closed:
+            return False
+        self._enqueue(c, time.monotonic(), msg)
+        return not c.closed
+
+    def _enqueue(self, c: _Client, now: float, msg: str) -> None:
+        if c.closed:
+            return
+        q = c.queue
+        if len(q) >= c.maxsize:
+            # send 1건이 send_timeout 넘게 안 끝나면 policy 와 무관하게 정리
+            # (메시지마다 wait_for 를 걸면 task 생성 비용이 fan-out 보다 커짐)
+            stuck = c.busy_since and (now - c.busy_since) > self.send_timeout
+            if self.policy == DISCONNECT or stuck:
+                self._evict(c)
+                return
+            q.popleft()
+            c.dropped += 1
+            self.dropped += 1
+        q.append((now, msg))
+        if not c.wake.is_set():
+            c.wake.set()
+
+    def _offer(self, c: _Client, now: float, key: str, msg: str, event: Dict[str, Any]) -> None:
+        if c.closed:
+            return
+        st = c.stream
+        if key not in st.pending and len(st.pending) >= c.maxsize:
+            stuck = c.busy_since and (now - c.busy_since) > self.send_timeout
+            if self.policy == DISCONNECT or stuck:
+                self._evict(c)
+                return
+            st.drop_oldest()
+            c.dropped += 1
+            self.dropped += 1
+        st.offer(key, now, msg, event)
+
+        at = st.ready_at(key)
+        if at <= now:
+            if not c.wake.is_set():
+                c.wake.set()
+        else:
+            # 아직 rate 제한 중 -> due 시각에 깨우기만 예약 (메시지마다 writer 를 깨우지 않음)
+            self._arm(c, at, now)
 
-        if not clients:
+    def _arm(self, c: _Client, at: float, now: float) -> None:
+        st = c.stream
+        if st.timer is not None and st.timer_at <= at:
             return
+        if st.timer is not None:
+            st.timer.cancel()
+        st.timer_at = at
+        st.timer = asyncio.get_running_loop().call_later(max(0.0, at - now), self._timer_wake, c)
+
+    @staticmethod
+    def _timer_wake(c: _Client) -> None:
+        if c.stream is not None:
+            c.stream.timer = None
+        if not c.closed:
+            c.wake.set()
 
-        dead: list[WebSocket] = []
-        for ws in clients:
-            try:
-                await ws.send_text(msg)
-            except Exception:
-                dead.append(ws)
+    # -----------------------------
+    # per-client writer
+    # -----------------------------
+    async def _writer(self, c: _Client) -> None:
+        q, wake = c.queue, c.wake
+        mono = time.monotonic
+        try:
+            while True:
+                await wake.wait()
+                wake.clear()
+                while q:
+                    ts, msg = q.popleft()
+                    await self._send(c, ts, msg)
 
-        if dead:
-            async with self._lock:
-                for ws in dead:
-                    self._clients.discard(ws)
+                st = c.stream
+                if st is not None and st.pending:
+                    now = mono()
+                    ready, wait = st.due(now)
+                    for key, ts, msg, event in ready:
+                        # ✅ delta 는 "보내는 시점"에 마지막 전송본과 비교해서 인코딩
+                        await self._send(c, ts, st.encode(key, msg, event, now))
+                    if wait is not None and c.stream is st:
+                        self._arm(c, now + wait, now)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 끊긴 연결 / send timeout -> 정리
+            self._evict(c)
 
-    # (선택) 현재 연결 수 확인용
+    async def _send(self, c: _Client, ts: float, msg: str) -> None:
+        mono = time.monotonic
+        c.busy_since = mono()
+        await c.ws.send_text(msg)
+        c.busy_since = 0.0
+        lag = mono() - ts
+        c.sent += 1
+        c.last_lag = lag
+        if lag > c.max_lag:
+            c.max_lag = lag
+        self.sent += 1
+
+    def _evict(self, c: _Client) -> None:
+        if c.closed:
+            return
+        self.evicted += 1
+        self._clients.pop(c.ws, None)
+        self._close_client(c)
+        asyncio.get_running_loop().create_task(self._close_ws(c.ws))
+
+    def _close_client(self, c: _Client) -> None:
+        c.closed = True
+        self._index.remove_all(c)
+        if c.stream is not None and c.stream.timer is not None:
+            c.stream.timer.cancel()
+        if c.task and c.task is not asyncio.current_task():
+            c.task.cancel()
+
+    @staticmethod
+    async def _close_ws(ws: WebSocket) -> None:
+        try:
+            await ws.close(code=1013)  # try again later (slow consumer)
+        except Exception:
+            pass
+
+    # -----------------------------
+    # metrics
+    # -----------------------------
     def count(self) -> int:
         return len(self._clients)
 
-ws_manager = WSManager()
\ No newline at end of file
+    def stats(self) -> Dict[str, Any]:
+        clients = tuple(self._clients.values())
+        depths = [len(c.queue) + (len(c.stream.pending) if c.stream else 0) for c in clients]
+        streams = [c.stream.stats() for c in clients if c.stream is not None]
+        return {
+            "clients": len(clients),
+            "scoped_clients": sum(1 for c in clients if c.scope is not None),
+            "subscribers": len(self._index),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "pending": self._pending,
+            "pending_dropped": self.pending_dropped,
+            "queue_depth_max": max(depths) if depths else 0,
+            "queue_depth_total": sum(depths),
+            "lag_last_max_sec": round(max((c.last_lag for c in clients), default=0.0), 4),
+            "lag_max_sec": round(max((c.max_lag for c in clients), default=0.0), 4),
+            "stream_clients": len(streams),
+            "stream_coalesced": sum(x["coalesced"] for x in streams),
+            "stream_frames_full": sum(x["frames_full"] for x in streams),
+            "stream_frames_delta": sum(x["frames_delta"] for x in streams),
+            "stream_bytes_sent": sum(x["bytes_sent"] for x in streams),
+        }
+
+ws_manager = WSManager()
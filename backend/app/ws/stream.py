@@ -0,0 +1,133 @@
+# app/ws/stream.py
+"""
+✅ 클라이언트별 coalescing / delta 스트림
+
+클라이언트가 {"type": "options", "max_fps": 2, "delta": true} 를 보내면 그 연결은 stream 모드가 됨
+- coalescing: 장치(key)별로 "가장 최신 이벤트 1개"만 대기 -> 장치당 초당 max_fps 프레임까지만 전송
+- delta: 장치별로 이 클라이언트에 마지막으로 "실제로 보낸" 이벤트와 비교해 바뀐 필드만 전송
+  (인코딩을 writer 가 보내는 시점에 하므로, 중간에 버려진 프레임 때문에 상태가 어긋나지 않음)
+
+delta 프레임 형식
+  {"type": "telemetry_delta", "key": ..., "ts": ...,
+   "changed": {"summary": {"kw": 1.2}, "payload": {...}, "channels": [...]},
+   "removed": {"payload": ["old_field"]}}
+장치별 첫 프레임(기준)은 항상 일반 "telemetry" 전체 프레임.
+최상위 필드가 없어진 경우도 전체 프레임 (클라이언트는 전체 프레임을 받으면 기준을 통째로 교체).
+"""
+import json
+from typing import Any, Dict, Optional, Tuple
+
+MAX_FPS_LIMIT = 50.0
+_SKIP = ("type", "key", "ts")
+_MISSING = object()
+
+
+class ClientStream:
+    __slots__ = ("interval", "delta", "pending", "last_event", "last_sent_at", "timer", "timer_at",
+                 "frames_full", "frames_delta", "coalesced", "bytes_sent")
+
+    def __init__(self, max_fps: float = 0.0, delta: bool = False) -> None:
+        # key -> (enqueue_ts, msg, event)  (dict 는 삽입 순서 유지 -> 오래 기다린 장치부터)
+        self.pending: Dict[str, Tuple[float, str, Dict[str, Any]]] = {}
+        self.last_event: Dict[str, Dict[str, Any]] = {}
+        self.last_sent_at: Dict[str, float] = {}
+        self.timer = None   # 다음 due 시각에 writer 를 깨우는 call_later 핸들
+        self.timer_at = 0.0
+
+        self.interval = 0.0
+        self.delta = False
+        self.configure(max_fps, delta)
+
+        self.frames_full = 0
+        self.frames_delta = 0
+        self.coalesced = 0
+        self.bytes_sent = 0
+
+    def configure(self, max_fps: float = 0.0, delta: bool = False) -> None:
+        fps = max(0.0, min(float(max_fps or 0), MAX_FPS_LIMIT))
+        self.interval = (1.0 / fps) if fps > 0 else 0.0
+        if bool(delta) != self.delta:
+            # delta 를 켜거나 끄면 기준 프레임부터 다시
+            self.last_event.clear()
+        self.delta = bool(delta)
+
+    def offer(self, key: str, now: float, msg: str, event: Dict[str, Any]) -> bool:
+        """최신 이벤트로 교체. 이미 대기 중이던 key 면 True (= coalesced)"""
+        hit = key in self.pending
+        self.pending[key] = (now, msg, event)
+        if hit:
+            self.coalesced += 1
+        return hit
+
+    def ready_at(self, key: str) -> float:
+        """key 를 다시 보낼 수 있는 시각 (monotonic). 0 이면 바로."""
+        t = self.last_sent_at.get(key)
+        if t is None or self.interval <= 0:
+            return 0.0
+        return t + self.interval
+
+    def drop_oldest(self) -> None:
+        if self.pending:
+            self.pending.pop(next(iter(self.pending)))
+
+    def due(self, now: float) -> Tuple[list, Optional[float]]:
+        """지금 보낼 수 있는 항목 [(key, ts, msg, event)] 과 다음 due 까지 남은 시간"""
+        ready = []
+        wait: Optional[float] = None
+        interval = self.interval
+        for key in list(self.pending):
+            t = self.last_sent_at.get(key)
+            if t is None or interval <= 0 or now - t >= interval:
+                ts, msg, event = self.pending.pop(key)
+                ready.append((key, ts, msg, event))
+            else:
+                left = interval - (now - t)
+                wait = left if wait is None or left < wait else wait
+        return ready, wait
+
+    def encode(self, key: str, msg: str, event: Dict[str, Any], now: float) -> str:
+        prev = self.last_event.get(key) if self.delta else None
+        self.last_sent_at[key] = now
+        if self.delta:
+            self.last_event[key] = event
+
+        if prev is None or any(f not in event for f in prev if f not in _SKIP):
+            # 기준 프레임 없음 / 최상위 필드가 빠짐 (removed 는 dict 필드 안의 key 만 표현) -> 전체 프레임
+            self.frames_full += 1
+            self.bytes_sent += len(msg)
+            return msg
+
+        changed: Dict[str, Any] = {}
+        removed: Dict[str, list] = {}
+        for f, v in event.items():
+            if f in _SKIP:
+                continue
+            pv = prev.get(f, _MISSING)
+            if isinstance(v, dict) and isinstance(pv, dict):
+                d = {k: x for k, x in v.items() if pv.get(k, _MISSING) != x}
+                r = [k for k in pv if k not in v]
+                if d:
+                    changed[f] = d
+                if r:
+                    removed[f] = r
+            elif pv != v:
+                changed[f] = v
+
+        frame: Dict[str, Any] = {"type": "telemetry_delta", "key": key, "ts": event.get("ts"), "changed": changed}
+        if removed:
+            frame["removed"] = removed
+        out = json.dumps(frame, ensure_ascii=False)
+        self.frames_delta += 1
+        self.bytes_sent += len(out)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_fps": round(1.0 / self.interval, 3) if self.interval else 0,
+            "delta": self.delta,
+            "pending": len(self.pending),
+            "frames_full": self.frames_full,
+            "frames_delta": self.frames_delta,
+            "coalesced": self.coalesced,
+            "bytes_sent": self.bytes_sent,
+        }
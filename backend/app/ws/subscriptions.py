@@ -0,0 +1,197 @@
+# app/ws/subscriptions.py
+"""
+✅ topic 스타일 구독 인덱스 (pattern -> 구독자)
+
+key 형식은 make_key() 와 같음: country/site_id/model/device_id
+pattern 은 MQTT 와 같은 와일드카드를 씀
+  - "+" : 세그먼트 1개
+  - "#" : 나머지 전부 (마지막 세그먼트에만)
+예) "th/site001/#", "th/+/pg46/#", "th/site001/pg46/001", "#"
+
+match(key) 는 trie 를 key 세그먼트 수(4) 만큼만 내려가므로
+비용이 전체 구독자 수가 아니라 "관심 있는 구독자 수"에 비례함.
+
+접근 범위(scope)가 있는 클라이언트는 요청 pattern 과 scope pattern 의 교집합(intersect)만
+인덱스에 등록 -> 범위 밖 장치 이벤트는 match() 단계에서 아예 걸리지 않음 (이벤트당 추가 비용 없음)
+"""
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+KEY_DEPTH = 4  # country/site_id/model/device_id
+MAX_PATTERN_LEN = 256
+
+
+class _Node:
+    __slots__ = ("children", "plus", "exact", "rest")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.plus: Optional["_Node"] = None
+        self.exact: Set[Hashable] = set()   # 여기서 끝나는 pattern
+        self.rest: Set[Hashable] = set()    # 여기서 "#" 로 끝나는 pattern
+
+    def empty(self) -> bool:
+        return not (self.children or self.plus or self.exact or self.rest)
+
+
+def validate_pattern(pattern: str) -> Optional[str]:
+    """정규화된 pattern 반환, 잘못된 pattern 이면 None"""
+    if not isinstance(pattern, str):
+        return None
+    pattern = pattern.strip()
+    if not pattern or len(pattern) > MAX_PATTERN_LEN:
+        return None
+    parts = pattern.split("/")
+    if len(parts) > KEY_DEPTH:
+        return None
+    for i, seg in enumerate(parts):
+        if seg == "":
+            return None
+        if "#" in seg and (seg != "#" or i != len(parts) - 1):
+            return None
+        if "+" in seg and seg != "+":
+            return None
+    if parts[-1] != "#" and len(parts) != KEY_DEPTH:
+        # 와일드카드 없이 짧은 pattern 은 어떤 key 와도 안 맞음 -> "…/#" 로 쓰도록
+        return None
+    return pattern
+
+
+def _expand(pattern: str) -> List[str]:
+    """key 는 항상 4 세그먼트 -> '#' 를 '+' 로 펼친 4 세그먼트"""
+    parts = pattern.split("/")
+    if parts[-1] == "#":
+        parts = parts[:-1] + ["+"] * (KEY_DEPTH - len(parts) + 1)
+    return parts
+
+
+def intersect(a: str, b: str) -> Optional[str]:
+    """두 pattern 에 모두 맞는 key 집합의 pattern (겹치지 않으면 None)
+    예) intersect("th/#", "+/site001/#") -> "th/site001/#" """
+    out = []
+    for x, y in zip(_expand(a), _expand(b)):
+        if x == "+":
+            out.append(y)
+        elif y == "+" or x == y:
+            out.append(x)
+        else:
+            return None
+    while out and out[-1] == "+":
+        out.pop()
+    return "/".join(out + ["#"]) if len(out) < KEY_DEPTH else "/".join(out)
+
+
+def scope_patterns(sites: Iterable[str] = (), devices: Iterable[str] = ()) -> List[str]:
+    """허용 site_id / 장치(key 또는 device_id) -> pattern 목록"""
+    out = []
+    for site in sites or ():
+        site = str(site)
+        if site and not any(ch in site for ch in "/+#"):
+            out.append(f"+/{site}/#")
+    for dev in devices or ():
+        dev = str(dev)
+        if not dev or "+" in dev or "#" in dev:
+            continue   # 와일드카드로 범위를 넓히지 못하게
+        pat = validate_pattern(dev if dev.count("/") == KEY_DEPTH - 1 else f"+/+/+/{dev}")
+        if pat:
+            out.append(pat)
+    return sorted(set(out))
+
+
+class SubscriptionIndex:
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._by_sub: Dict[Hashable, Set[str]] = {}
+
+    # -----------------------------
+    # 등록 / 해제
+    # -----------------------------
+    def add(self, sub: Hashable, pattern: str) -> bool:
+        pats = self._by_sub.setdefault(sub, set())
+        if pattern in pats:
+            return False
+        pats.add(pattern)
+
+        node = self._root
+        parts = pattern.split("/")
+        for seg in parts:
+            if seg == "#":
+                node.rest.add(sub)
+                return True
+            if seg == "+":
+                if node.plus is None:
+                    node.plus = _Node()
+                node = node.plus
+            else:
+                nxt = node.children.get(seg)
+                if nxt is None:
+                    nxt = node.children[seg] = _Node()
+                node = nxt
+        node.exact.add(sub)
+        return True
+
+    def discard(self, sub: Hashable, pattern: str) -> bool:
+        pats = self._by_sub.get(sub)
+        if not pats or pattern not in pats:
+            return False
+        pats.discard(pattern)
+        if not pats:
+            self._by_sub.pop(sub, None)
+        self._discard(self._root, pattern.split("/"), 0, sub)
+        return True
+
+    def _discard(self, node: _Node, parts: List[str], i: int, sub: Hashable) -> None:
+        seg = parts[i]
+        if seg == "#":
+            node.rest.discard(sub)
+            return
+        last = i == len(parts) - 1
+        if seg == "+":
+            child = node.plus
+        else:
+            child = node.children.get(seg)
+        if child is None:
+            return
+        if last:
+            child.exact.discard(sub)
+        else:
+            self._discard(child, parts, i + 1, sub)
+        # 빈 가지 정리
+        if child.empty():
+            if seg == "+":
+                node.plus = None
+            else:
+                node.children.pop(seg, None)
+
+    def remove_all(self, sub: Hashable) -> None:
+        for pattern in list(self._by_sub.get(sub, ())):
+            self.discard(sub, pattern)
+
+    def patterns(self, sub: Hashable) -> List[str]:
+        return sorted(self._by_sub.get(sub, ()))
+
+    # -----------------------------
+    # 조회
+    # -----------------------------
+    def match(self, key: str) -> Set[Hashable]:
+        out: Set[Hashable] = set()
+        self._match(self._root, key.split("/"), 0, out)
+        return out
+
+    def _match(self, node: _Node, parts: List[str], i: int, out: Set[Hashable]) -> None:
+        if node.rest:
+            out |= node.rest
+        if i == len(parts):
+            if node.exact:
+                out |= node.exact
+            return
+        child = node.children.get(parts[i])
+        if child is not None:
+            self._match(child, parts, i + 1, out)
+        if node.plus is not None:
+            self._match(node.plus, parts, i + 1, out)
+
+    def subscribers(self) -> Iterable[Hashable]:
+        return self._by_sub.keys()
+
+    def __len__(self) -> int:
+        return len(self._by_sub)
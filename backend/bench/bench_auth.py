@@ -0,0 +1,63 @@
+# bench/bench_auth.py
+"""
+인증 dependency 요청당 비용: 매번 jwt.decode vs 검증 token 캐시
+
+    cd backend && python -m bench.bench_auth --tokens 200 --requests 50000
+
+- 대시보드 tokens 개가 번갈아 폴링하는 상황 (같은 token 이 반복)
+- legacy: 기존 get_current_user 처럼 요청마다 jwt.decode (HS256 서명 검증 + claims 검사)
+- cached: verify_token (token 수명 동안 decode 1번, 이후 LRU 조회 + 폐기 확인)
+"""
+import argparse
+import time
+
+from jose import jwt
+
+from app.core.config import JWT_SECRET, JWT_ALG
+from app.core.security import create_access_token, verify_token, revoke_token, get_token_cache_stats
+from app.domain.user_store import MemoryUserStore, set_user_store
+
+
+def _legacy(token: str) -> dict:
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+    if not payload.get("sub"):
+        raise ValueError("invalid")
+    return payload
+
+
+def _bench(fn, tokens, n: int) -> float:
+    t0 = time.perf_counter()
+    k = len(tokens)
+    for i in range(n):
+        fn(tokens[i % k])
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tokens", type=int, default=200)
+    ap.add_argument("--requests", type=int, default=50000)
+    args = ap.parse_args()
+    set_user_store(MemoryUserStore())   # 폐기 목록을 data/users.db 에 남기지 않음
+
+    tokens = [
+        create_access_token({"sub": str(i), "email": f"u{i}@local", "role": "user"})
+        for i in range(args.tokens)
+    ]
+    legacy = _bench(_legacy, tokens, args.requests)
+    cached = _bench(verify_token, tokens, args.requests)
+    print(f"tokens={args.tokens} requests={args.requests}")
+    print(f"auth / request   jwt.decode {legacy:7.2f} us  cached {cached:7.2f} us  x{legacy / cached:.1f}")
+
+    # 폐기 후에는 캐시에 있어도 거절
+    revoke_token(verify_token(tokens[0]))
+    try:
+        verify_token(tokens[0])
+        print("revocation: FAILED (token still accepted)")
+    except Exception:
+        print("revocation: ok")
+    print(get_token_cache_stats())
+
+
+if __name__ == "__main__":
+    main()
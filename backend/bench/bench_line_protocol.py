@@ -0,0 +1,120 @@
+# bench/bench_line_protocol.py
+"""
+write_to_influx 인코딩 비교: influxdb_client.Point vs LineEncoder
+
+    cd backend && python -m bench.bench_line_protocol --devices 1000 --rounds 20
+
+- 기존 경로(아래 _legacy_points: summary Point 1 + channel Point N, 매번 태그 5개 설정 후 to_line_protocol)
+  와 LineEncoder.encode() 를 같은 record 로 돌려
+  1) 출력 line 이 바이트 단위로 같은지 확인하고 2) record 당 시간을 비교한다.
+"""
+import argparse
+import time
+
+from influxdb_client import Point, WritePrecision
+
+from app.domain.device_store import make_record
+from app.services.line_protocol import LineEncoder
+from bench.bench_normalize import SAMPLES
+
+MEAS = "power"
+
+
+# ---------------------------------------------------------
+# 기존 구현 (비교용 사본)
+# ---------------------------------------------------------
+def _legacy_points(rec):
+    snap = rec.summary
+    meta = rec.meta
+    ts_ns = int(rec.ts * 1_000_000_000)
+    points = []
+
+    p_sum = Point(MEAS).time(ts_ns, WritePrecision.NS)
+    p_sum.tag("country", str(meta.get("country")))
+    p_sum.tag("site_id", str(meta.get("site_id")))
+    p_sum.tag("model", str(meta.get("model")))
+    p_sum.tag("device_id", str(meta.get("device_id")))
+    p_sum.tag("type", str(meta.get("last_type")))
+    p_sum.tag("scope", "summary")
+    for k in ["kw", "kwh", "v_avg", "a_avg", "pf_avg",
+              "v_l1", "v_l2", "v_l3",
+              "a_l1", "a_l2", "a_l3",
+              "pf_l1", "pf_l2", "pf_l3"]:
+        v = snap.get(k)
+        if v is not None:
+            p_sum.field(k, float(v))
+    di = snap.get("di")
+    if isinstance(di, dict):
+        for i, v in di.items():
+            if v is None:
+                continue
+            p_sum.field(f"di{i}", int(v))
+    points.append(p_sum)
+
+    for ch in rec.channels:
+        p_ch = Point(MEAS).time(ts_ns, WritePrecision.NS)
+        p_ch.tag("country", str(meta.get("country")))
+        p_ch.tag("site_id", str(meta.get("site_id")))
+        p_ch.tag("model", str(meta.get("model")))
+        p_ch.tag("device_id", str(meta.get("device_id")))
+        p_ch.tag("type", str(meta.get("last_type")))
+        p_ch.tag("scope", "channel")
+        p_ch.tag("term", str(ch.get("term", "in")))
+        p_ch.tag("phase", str(ch.get("phase", "L1")))
+        for k in ["v", "a", "kw", "pf"]:
+            v = ch.get(k)
+            if v is not None:
+                p_ch.field(k, float(v))
+        points.append(p_ch)
+
+    lines = [p.to_line_protocol() for p in points]
+    return [ln for ln in lines if ln]
+
+
+def _records(devices: int):
+    now = time.time()
+    out = []
+    for i in range(devices):
+        payload = SAMPLES[i % len(SAMPLES)]
+        out.append(make_record(
+            "KR", f"site {i % 20}", "pm,3p", f"dev={i}", "telemetry",
+            f"KR/site{i % 20}/pm/dev{i}/telemetry", payload, now + i * 0.001,
+        ))
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--devices", type=int, default=1000)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    recs = _records(args.devices)
+    enc = LineEncoder(MEAS)
+
+    # 1) 출력 동일성 (태그 escape 가 필요한 site/model/device 이름 포함)
+    n_lines = 0
+    for rec in recs:
+        old = [ln.encode() for ln in _legacy_points(rec)]
+        new = enc.encode(rec)
+        assert old == new, (old, new)
+        n_lines += len(new)
+    print(f"records={len(recs)} lines={n_lines} (identical output)")
+
+    # 2) record 당 인코딩 시간 (prefix 캐시가 찬 상태 = 정상 운영)
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for rec in recs:
+            [ln.encode() for ln in _legacy_points(rec)]
+    legacy = (time.perf_counter() - t0) / (args.rounds * len(recs)) * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for rec in recs:
+            enc.encode(rec)
+    direct = (time.perf_counter() - t0) / (args.rounds * len(recs)) * 1e6
+    print(f"encode / record   Point {legacy:7.2f} us  LineEncoder {direct:7.2f} us  x{legacy / direct:.2f}")
+
+
+if __name__ == "__main__":
+    main()
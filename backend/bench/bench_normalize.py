@@ -0,0 +1,209 @@
+# bench/bench_normalize.py
+"""
+normalize_payload / build_channels_from_payload 마이크로벤치마크
+
+    cd backend && python -m bench.bench_normalize
+
+기존 alias-chain 구현(아래 _legacy_*)과 alias 테이블 normalizer 를 같은 payload 로 돌려
+1) 결과가 같은지 (0 값 처리 차이는 제외) 확인하고 2) 메시지당 시간을 비교한다.
+"""
+import time
+import timeit
+
+from app.domain.device_store import normalize_payload, build_channels_from_payload
+
+
+# ---------------------------------------------------------
+# 기존 구현 (비교용 사본)
+# ---------------------------------------------------------
+def _to_float(x):
+    try:
+        if x is None or x == "":
+            return None
+        return float(x)
+    except Exception:
+        return None
+
+def _avg3(x1, x2, x3):
+    nums = [n for n in [_to_float(x1), _to_float(x2), _to_float(x3)] if n is not None]
+    return round(sum(nums) / len(nums), 3) if nums else None
+
+def _legacy_normalize_payload(payload: dict):
+    p = payload if isinstance(payload, dict) else {}
+
+    # --- V ---
+    v_l1 = _to_float(p.get("v_l1") or p.get("v1") or p.get("vl1"))
+    v_l2 = _to_float(p.get("v_l2") or p.get("v2") or p.get("vl2"))
+    v_l3 = _to_float(p.get("v_l3") or p.get("v3") or p.get("vl3"))
+    v_avg = _to_float(p.get("v_avg") or p.get("v") or p.get("volt") or p.get("voltage"))
+
+    if v_avg is not None and (v_l1 is None and v_l2 is None and v_l3 is None):
+        v_l1 = v_l2 = v_l3 = v_avg
+    if v_avg is None:
+        v_avg = _avg3(v_l1, v_l2, v_l3)
+
+    # --- A ---
+    a_l1 = _to_float(p.get("a_l1") or p.get("a1") or p.get("al1"))
+    a_l2 = _to_float(p.get("a_l2") or p.get("a2") or p.get("al2"))
+    a_l3 = _to_float(p.get("a_l3") or p.get("a3") or p.get("al3"))
+    a_avg = _to_float(p.get("a_avg") or p.get("a") or p.get("amp") or p.get("current"))
+
+    if a_avg is not None and (a_l1 is None and a_l2 is None and a_l3 is None):
+        a_l1 = a_l2 = a_l3 = a_avg
+    if a_avg is None:
+        a_avg = _avg3(a_l1, a_l2, a_l3)
+
+    # --- PF ---
+    pf_l1 = _to_float(p.get("pf_l1") or p.get("pf1") or p.get("pfl1"))
+    pf_l2 = _to_float(p.get("pf_l2") or p.get("pf2") or p.get("pfl2"))
+    pf_l3 = _to_float(p.get("pf_l3") or p.get("pf3") or p.get("pfl3"))
+    pf_avg = _to_float(p.get("pf_avg") or p.get("pf") or p.get("power_factor"))
+
+    if pf_avg is not None and (pf_l1 is None and pf_l2 is None and pf_l3 is None):
+        pf_l1 = pf_l2 = pf_l3 = pf_avg
+    if pf_avg is None:
+        pf_avg = _avg3(pf_l1, pf_l2, pf_l3)
+
+    # --- 합계 ---
+    kw = _to_float(p.get("kw") or p.get("kW") or p.get("p") or p.get("power_kw"))
+    kwh = _to_float(p.get("kwh") or p.get("kWh") or p.get("energy_kwh"))
+
+    # --- DI 1~16 ---
+    di_map = {}
+    di_obj = p.get("di")
+
+    if isinstance(di_obj, dict):
+        for k, v in di_obj.items():
+            try:
+                i = int(k)
+                if 1 <= i <= 16:
+                    di_map[i] = 1 if str(v) in ("1", "true", "True", "ON", "on") or v == 1 else 0
+            except Exception:
+                pass
+
+    if not di_map and isinstance(di_obj, list):
+        for idx, v in enumerate(di_obj, start=1):
+            if idx > 16:
+                break
+            if v in (0, 1):
+                di_map[idx] = v
+            else:
+                di_map[idx] = None
+
+    for i in range(1, 17):
+        k = f"di{i}"
+        if k in p:
+            v = p.get(k)
+            di_map[i] = 1 if str(v) in ("1", "true", "True", "ON", "on") or v == 1 else 0
+
+    di_final = {i: di_map.get(i) for i in range(1, 17)} if di_map else None
+
+    return {
+        "kw": kw,
+        "kwh": kwh,
+
+        "v_l1": v_l1, "v_l2": v_l2, "v_l3": v_l3, "v_avg": v_avg,
+        "a_l1": a_l1, "a_l2": a_l2, "a_l3": a_l3, "a_avg": a_avg,
+        "pf_l1": pf_l1, "pf_l2": pf_l2, "pf_l3": pf_l3, "pf_avg": pf_avg,
+
+        "di": di_final,
+    }
+
+def _legacy_build_channels(payload: dict):
+    if not isinstance(payload, dict):
+        return []
+
+    ch = payload.get("channels")
+    if isinstance(ch, list) and len(ch) > 0:
+        fixed = []
+        for c in ch:
+            if not isinstance(c, dict):
+                continue
+            term = c.get("term") or c.get("io") or c.get("side")
+            phase = c.get("phase") or c.get("ph")
+            if phase in (1, "1"): phase = "L1"
+            if phase in (2, "2"): phase = "L2"
+            if phase in (3, "3"): phase = "L3"
+            fixed.append({
+                "term": term or "in",
+                "phase": phase or "L1",
+                "v": _to_float(c.get("v") or c.get("volt") or c.get("voltage")),
+                "a": _to_float(c.get("a") or c.get("amp") or c.get("current")),
+                "kw": _to_float(c.get("kw") or c.get("kW") or c.get("p") or c.get("power_kw")),
+                "pf": _to_float(c.get("pf") or c.get("power_factor")),
+            })
+        return fixed
+
+    # ✅ 단일 값 payload fallback
+    v = _to_float(payload.get("v") or payload.get("volt") or payload.get("voltage"))
+    a = _to_float(payload.get("a") or payload.get("amp") or payload.get("current"))
+    kw = _to_float(payload.get("kw") or payload.get("kW") or payload.get("p") or payload.get("power_kw"))
+    pf = _to_float(payload.get("pf") or payload.get("power_factor"))
+
+    if v is None and a is None and kw is None and pf is None:
+        return []
+
+    return [
+        {"term": "in", "phase": "L1", "v": v, "a": a, "kw": kw, "pf": pf},
+        {"term": "in", "phase": "L2", "v": v, "a": a, "kw": kw, "pf": pf},
+        {"term": "in", "phase": "L3", "v": v, "a": a, "kw": kw, "pf": pf},
+    ]
+
+
+# ---------------------------------------------------------
+# 샘플 payload
+# ---------------------------------------------------------
+SAMPLES = [
+    {"v": 221.3, "a": 4.2, "kw": 2.81, "kwh": 1034.5, "pf": 0.93},
+    {"v_l1": 220.1, "v_l2": 221.4, "v_l3": 219.8,
+     "a_l1": 3.1, "a_l2": 3.4, "a_l3": 2.9,
+     "pf1": 0.91, "pf2": 0.92, "pf3": 0.95,
+     "kW": 2.2, "kWh": 88.1, "di": {"1": 1, "2": 0, "3": "on"}},
+    {"channels": [
+        {"term": "in", "phase": 1, "v": 220.5, "a": 5.0, "kw": 1.1, "pf": 0.9},
+        {"term": "in", "phase": 2, "volt": "221.0", "amp": "5.1", "p": 1.2},
+        {"io": "out", "ph": "3", "voltage": 219.0, "current": 4.9, "power_kw": 1.0},
+     ], "kwh": "512.25", "di1": "1", "di2": 0},
+    {"volt": "230.2", "current": "1.5", "power_kw": "0.33", "di": [1, 0, 1, 1]},
+]
+
+
+def _check_equal():
+    for p in SAMPLES:
+        assert normalize_payload(p) == _legacy_normalize_payload(p), p
+        assert build_channels_from_payload(p) == _legacy_build_channels(p), p
+
+    # ✅ 정의된 동작 변경: 0 은 누락이 아니라 정상값
+    zero = {"kw": 0, "p": 5.0, "v": 0}
+    assert _legacy_normalize_payload(zero)["kw"] == 5.0
+    assert normalize_payload(zero)["kw"] == 0.0
+    assert normalize_payload(zero)["v_avg"] == 0.0
+    assert build_channels_from_payload(zero)[0]["kw"] == 0.0
+    assert build_channels_from_payload({"channels": [{"phase": 2, "v": 0, "volt": 230.0, "pf": ""}]})[0] == \
+        {"term": "in", "phase": "L2", "v": 0.0, "a": None, "kw": None, "pf": None}
+
+
+def _bench(fn, n: int) -> float:
+    t = timeit.timeit(lambda: [fn(p) for p in SAMPLES], number=n)
+    return t / (n * len(SAMPLES)) * 1e6  # us / message
+
+
+def main(n: int = 20000):
+    _check_equal()
+    print(f"payloads={len(SAMPLES)} rounds={n}")
+
+    old_s = _bench(_legacy_normalize_payload, n)
+    new_s = _bench(normalize_payload, n)
+    old_c = _bench(_legacy_build_channels, n)
+    new_c = _bench(build_channels_from_payload, n)
+
+    print(f"normalize_payload      legacy {old_s:7.2f} us  table {new_s:7.2f} us  x{old_s / new_s:.2f}")
+    print(f"build_channels         legacy {old_c:7.2f} us  table {new_c:7.2f} us  x{old_c / new_c:.2f}")
+    old_t, new_t = old_s + old_c, new_s + new_c
+    print(f"per message (both)     legacy {old_t:7.2f} us  table {new_t:7.2f} us  x{old_t / new_t:.2f}")
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    main()
+    print(f"done in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,104 @@
+# bench/bench_ws_fanout.py
+"""
+WSManager fan-out 부하 테스트 (브라우저 없이 가짜 WebSocket 으로)
+
+    cd backend && python -m bench.bench_ws_fanout --clients 300 --rate 1000 --seconds 5
+
+- 일부 클라이언트는 send 가 느린(slow) 브라우저를 흉내냄
+- 빠른 클라이언트의 수신 지연(lag)이 느린 클라이언트에 끌려가지 않는지,
+  drop / evict 수, publish 1건당 루프 점유 시간을 출력한다.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.ws.manager import WSManager, DROP_OLDEST, DISCONNECT
+
+
+class FakeWS:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.received = 0
+        self.lags: list[float] = []
+        self.closed = False
+
+    async def send_text(self, msg: str) -> None:
+        # 빠른 클라이언트: 실제 transport.write 처럼 버퍼에 쓰고 바로 반환
+        # 느린 클라이언트: drain 대기(네트워크 지연)를 sleep 으로 흉내
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        # 샘플링: 100건마다 1번 지연 기록
+        if self.received % 100 == 0:
+            ts = json.loads(msg)["ts"]
+            self.lags.append(time.perf_counter() - ts)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+async def run(clients: int, rate: int, seconds: float, slow_ratio: float, slow_delay: float, policy: str) -> None:
+    mgr = WSManager(policy=policy)
+    n_slow = int(clients * slow_ratio)
+    fakes = [FakeWS(slow_delay if i < n_slow else 0.0) for i in range(clients)]
+    for ws in fakes:
+        await mgr.connect(ws)
+
+    total = int(rate * seconds)
+    interval = 1.0 / rate
+    publish_cost: list[float] = []
+    payload = {"v": 220.1, "a": 3.2, "kw": 1.1, "pf": 0.93}
+
+    t0 = time.perf_counter()
+    for i in range(total):
+        msg = json.dumps({"type": "telemetry", "ts": time.perf_counter(), "key": f"th/s1/pg46/{i % 50:03d}", "payload": payload})
+        t = time.perf_counter()
+        mgr.publish(msg)
+        publish_cost.append(time.perf_counter() - t)
+
+        # rate 유지
+        target = t0 + (i + 1) * interval
+        delay = target - time.perf_counter()
+        await asyncio.sleep(delay if delay > 0 else 0)
+
+    elapsed = time.perf_counter() - t0
+    await asyncio.sleep(0.5)  # 큐에 남은 것 flush
+
+    fast = fakes[n_slow:]
+    slow = fakes[:n_slow]
+    fast_lags = [x for ws in fast for x in ws.lags]
+    st = mgr.stats()
+
+    print(f"clients={clients} (slow={n_slow}, delay={slow_delay * 1000:.0f}ms) rate={rate}/s msgs={total} policy={policy}")
+    print(f"elapsed={elapsed:.2f}s  achieved={total / elapsed:.0f} msg/s")
+    print(f"publish() per msg: avg {statistics.mean(publish_cost) * 1e6:.1f} us, "
+          f"p99 {sorted(publish_cost)[int(len(publish_cost) * 0.99)] * 1e6:.1f} us")
+    if fast:
+        print(f"fast clients: avg received {statistics.mean(ws.received for ws in fast):.0f}/{total}")
+    if fast_lags:
+        print(f"fast client lag: median {statistics.median(fast_lags) * 1000:.1f} ms, max {max(fast_lags) * 1000:.1f} ms")
+    if slow:
+        print(f"slow clients: avg received {statistics.mean(ws.received for ws in slow):.0f}/{total}, "
+              f"closed={sum(ws.closed for ws in slow)}")
+    print("stats:", {k: st[k] for k in ("clients", "sent", "dropped", "evicted", "queue_depth_max", "lag_max_sec")})
+
+    for ws in list(fakes):
+        await mgr.disconnect(ws)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=300)
+    ap.add_argument("--rate", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--slow-ratio", type=float, default=0.05)
+    ap.add_argument("--slow-delay", type=float, default=0.05)
+    ap.add_argument("--policy", choices=[DROP_OLDEST, DISCONNECT], default=DROP_OLDEST)
+    a = ap.parse_args()
+    asyncio.run(run(a.clients, a.rate, a.seconds, a.slow_ratio, a.slow_delay, a.policy))
+
+
+if __name__ == "__main__":
+    main()
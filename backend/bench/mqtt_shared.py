@@ -0,0 +1,348 @@
+# bench/mqtt_shared.py
+"""
+MQTTManager 확인: shared subscription 분담 + 브로커 blip 중 영속 세션(QoS 1) 보관 + 재연결 backoff
+
+    cd backend && python -m bench.mqtt_shared --clients 4 --messages 20000 --rate 4000 --blip-at 0.4 --blip-sec 2
+
+- 프로세스 안에서 최소 MQTT v5 fake 브로커를 띄움 (CONNECT/SUBSCRIBE/PUBLISH QoS 0,1/PUBACK/PINGREQ,
+  $share/<group>/ 라운드로빈, clean_start=False 세션 보관, 끊긴 동안 QoS 1 메시지 queue)
+- MQTTManager(clients=N) 가 $share/<group>/th/# 로 구독, 별도 paho client 가 QoS 1 로 publish
+- blip: 구독 연결만 전부 끊고 blip-sec 동안 새 연결 거부 (publisher 는 계속 보냄)
+  -> 재연결 후 session_present=True 로 밀린 메시지를 받는지, 빠진 seq 가 없는지 확인
+"""
+import argparse
+import asyncio
+import collections
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from app.services.mqtt_manager import MQTTManager
+
+
+# ---------------------------------------------------------
+# 최소 MQTT v5 브로커
+# ---------------------------------------------------------
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n % 128
+        n //= 128
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def _read_varint(buf: bytes, pos: int):
+    mult, val = 1, 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        val += (b & 0x7F) * mult
+        if not b & 0x80:
+            return val, pos
+        mult *= 128
+
+
+def _str(s: str) -> bytes:
+    b = s.encode()
+    return len(b).to_bytes(2, "big") + b
+
+
+def _read_str(buf: bytes, pos: int):
+    n = int.from_bytes(buf[pos:pos + 2], "big")
+    return buf[pos + 2:pos + 2 + n].decode(), pos + 2 + n
+
+
+def _packet(h: int, body: bytes) -> bytes:
+    return bytes([h]) + _varint(len(body)) + body
+
+
+def _match(filt: str, topic: str) -> bool:
+    f, t = filt.split("/"), topic.split("/")
+    for i, p in enumerate(f):
+        if p == "#":
+            return True
+        if i >= len(t) or (p != "+" and p != t[i]):
+            return False
+    return len(f) == len(t)
+
+
+def _session_expiry(props: bytes) -> int:
+    pos = 0
+    while pos < len(props):
+        pid = props[pos]
+        pos += 1
+        if pid == 0x11:
+            return int.from_bytes(props[pos:pos + 4], "big")
+        if pid in (0x17, 0x19):
+            pos += 1
+        elif pid in (0x21, 0x22):
+            pos += 2
+        elif pid == 0x27:
+            pos += 4
+        elif pid in (0x15, 0x16):
+            pos += 2 + int.from_bytes(props[pos:pos + 2], "big")
+        elif pid == 0x26:
+            for _ in range(2):
+                pos += 2 + int.from_bytes(props[pos:pos + 2], "big")
+        else:
+            break
+    return 0
+
+
+class _Session:
+    def __init__(self, cid: str) -> None:
+        self.cid = cid
+        self.expiry = 0
+        self.subs = {}                 # filter -> (group, qos)
+        self.queue = collections.deque()
+        self.inflight = {}             # pid -> (topic, payload)
+        self.writer = None
+        self.next_pid = 0
+
+    def pid(self) -> int:
+        self.next_pid = self.next_pid % 65535 + 1
+        return self.next_pid
+
+
+class FakeBroker:
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.sessions = {}
+        self.rr = collections.Counter()
+        self.down_until = 0.0
+        self.queued = 0
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._main, daemon=True).start()
+        self._ready.wait()
+
+    def _main(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self._client, "127.0.0.1", self.port))
+        self._ready.set()
+        self.loop.run_forever()
+        server.close()
+
+    def blip(self, seconds: float, prefix: str) -> None:
+        def _do():
+            self.down_until = time.monotonic() + seconds
+            for s in self.sessions.values():
+                if s.writer and s.cid.startswith(prefix):
+                    s.writer.transport.abort()
+        self.loop.call_soon_threadsafe(_do)
+
+    # -----------------------------
+    # routing
+    # -----------------------------
+    def _send(self, s: _Session, topic: str, payload: bytes, qos: int, dup: bool = False) -> None:
+        if s.writer is None:
+            s.queue.append((topic, payload))
+            self.queued += 1
+            return
+        if qos == 0:
+            s.writer.write(_packet(0x30, _str(topic) + b"\x00" + payload))
+            return
+        pid = s.pid()
+        s.inflight[pid] = (topic, payload)
+        s.writer.write(_packet(0x32 | (0x08 if dup else 0), _str(topic) + pid.to_bytes(2, "big") + b"\x00" + payload))
+
+    def _publish(self, topic: str, payload: bytes) -> None:
+        groups = collections.defaultdict(list)
+        for s in self.sessions.values():
+            for filt, (group, qos) in s.subs.items():
+                if not _match(filt, topic):
+                    continue
+                if group:
+                    groups[(group, filt)].append((s, qos))
+                else:
+                    self._send(s, topic, payload, qos)
+        for key, members in groups.items():
+            members.sort(key=lambda m: m[0].cid)
+            online = [m for m in members if m[0].writer is not None] or members
+            i = self.rr[key] % len(online)
+            self.rr[key] += 1
+            s, qos = online[i]
+            self._send(s, topic, payload, qos)
+
+    # -----------------------------
+    # connection
+    # -----------------------------
+    async def _read(self, reader):
+        h = (await reader.readexactly(1))[0]
+        mult, n = 1, 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            n += (b & 0x7F) * mult
+            if not b & 0x80:
+                break
+            mult *= 128
+        return h, (await reader.readexactly(n)) if n else b""
+
+    async def _client(self, reader, writer) -> None:
+        if time.monotonic() < self.down_until:
+            writer.close()
+            return
+        sess = None
+        try:
+            h, body = await self._read(reader)
+            if h >> 4 != 1:
+                return
+            _, pos = _read_str(body, 0)
+            flags = body[pos + 1]
+            pos += 4
+            plen, pos = _read_varint(body, pos)
+            expiry = _session_expiry(body[pos:pos + plen])
+            pos += plen
+            cid, pos = _read_str(body, pos)
+
+            old = self.sessions.get(cid)
+            if old and old.writer:
+                old.writer.transport.abort()
+                old.writer = None
+            if flags & 0x02 or old is None:
+                old = None
+                sess = self.sessions[cid] = _Session(cid)
+            else:
+                sess = old
+            sess.expiry = expiry
+            sess.writer = writer
+            writer.write(_packet(0x20, bytes([1 if old else 0, 0, 0])))
+
+            # 끊긴 동안 쌓인 메시지 (미확인 inflight 먼저, DUP)
+            pending = list(sess.inflight.values())
+            sess.inflight.clear()
+            for topic, payload in pending:
+                self._send(sess, topic, payload, 1, dup=True)
+            while sess.queue and sess.writer is writer:
+                topic, payload = sess.queue.popleft()
+                self._send(sess, topic, payload, 1)
+
+            while True:
+                h, body = await self._read(reader)
+                kind = h >> 4
+                if kind == 3:        # PUBLISH
+                    qos = (h >> 1) & 3
+                    topic, pos = _read_str(body, 0)
+                    pid = None
+                    if qos:
+                        pid = body[pos:pos + 2]
+                        pos += 2
+                    plen, pos = _read_varint(body, pos)
+                    self._publish(topic, body[pos + plen:])
+                    if qos == 1:
+                        writer.write(_packet(0x40, pid))
+                elif kind == 4:      # PUBACK
+                    sess.inflight.pop(int.from_bytes(body[:2], "big"), None)
+                elif kind == 8:      # SUBSCRIBE
+                    pid = body[:2]
+                    plen, pos = _read_varint(body, 2)
+                    pos += plen
+                    codes = bytearray()
+                    while pos < len(body):
+                        filt, pos = _read_str(body, pos)
+                        qos = min(1, body[pos] & 3)
+                        pos += 1
+                        group = None
+                        if filt.startswith("$share/"):
+                            _, group, filt = filt.split("/", 2)
+                        sess.subs[filt] = (group, qos)
+                        codes.append(qos)
+                    writer.write(_packet(0x90, pid + b"\x00" + bytes(codes)))
+                elif kind == 12:     # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:     # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if sess is not None and sess.writer is writer:
+                sess.writer = None
+                if sess.expiry == 0:
+                    self.sessions.pop(sess.cid, None)
+            writer.close()
+
+
+# ---------------------------------------------------------
+# 실행
+# ---------------------------------------------------------
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--rate", type=int, default=4000, help="msgs/sec")
+    ap.add_argument("--blip-at", type=float, default=0.4, help="이 비율만큼 보낸 뒤 구독 연결 끊기 (0 이면 안 함)")
+    ap.add_argument("--blip-sec", type=float, default=2.0)
+    ap.add_argument("--session-expiry", type=int, default=300, help="0 = clean session (대조군: blip 중 메시지 유실)")
+    ap.add_argument("--port", type=int, default=18830)
+    args = ap.parse_args()
+
+    broker = FakeBroker(args.port)
+
+    seen = collections.Counter()
+    lock = threading.Lock()
+
+    def handler(topic: str, payload: bytes, now: float) -> None:
+        with lock:
+            seen[int(payload)] += 1
+
+    mgr = MQTTManager(
+        handler, host="127.0.0.1", port=args.port, topic="th/#",
+        clients=args.clients, group="bench", client_id="bench-sub",
+        protocol="5", qos=1, session_expiry=args.session_expiry,
+        username="", password="", tls=False,
+        reconnect_min=0.2, reconnect_max=2.0, keepalive=30,
+    )
+    mgr.start()
+    deadline = time.time() + 5
+    while mgr.connected_count() < args.clients and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)   # SUBACK
+    print(f"connected {mgr.connected_count()}/{args.clients} -> {mgr.subscription}")
+
+    pub = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="pub", protocol=mqtt.MQTTv5)
+    pub.max_inflight_messages_set(200)
+    pub.connect("127.0.0.1", args.port)
+    pub.loop_start()
+
+    blip_at = int(args.messages * args.blip_at) if args.blip_at > 0 else -1
+    interval = 1.0 / args.rate
+    t0 = time.perf_counter()
+    for i in range(args.messages):
+        if i == blip_at:
+            broker.blip(args.blip_sec, "bench-sub")
+            print(f"💥 blip at message {i}: subscribers dropped, broker refuses them for {args.blip_sec}s")
+        pub.publish(f"th/site{i % 20}/pm/dev{i % 500}/telemetry", str(i).encode(), qos=1)
+        delay = t0 + (i + 1) * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    sent_sec = time.perf_counter() - t0
+
+    deadline = time.time() + (30 if args.session_expiry else 5)
+    while time.time() < deadline:
+        with lock:
+            if len(seen) >= args.messages:
+                break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - t0
+
+    st = mgr.stats()
+    mgr.stop()
+    pub.loop_stop()
+    pub.disconnect()
+
+    missing = args.messages - len(seen)
+    dup = sum(n - 1 for n in seen.values() if n > 1)
+    print(f"sent={args.messages} in {sent_sec:.1f}s  received unique={len(seen)} missing={missing} duplicates={dup}  ({elapsed:.1f}s)")
+    print(f"broker queued for offline sessions: {broker.queued}")
+    for c in st["connections"]:
+        print(f"  {c['client_id']:<12} messages={c['messages']:>6} bytes={c['bytes']:>7} connects={c['connects']} "
+              f"disconnects={c['disconnects']} session_present={c['session_present']}")
+    print("OK" if not missing else "LOST MESSAGES")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# bench/spool_recovery.py
+"""
+Influx 장애 -> 디스크 spool -> 복구 후 replay 확인 (로컬 fake Influx HTTP 서버)
+
+    cd backend && python -m bench.spool_recovery --points 20000 --rate 4000 --down-at 0.3 --down-sec 3
+
+- fake Influx 를 띄우고 InfluxBatchWriter 로 point 를 흘려보내다가 중간에 서버를 죽임
+- --restart-writer 면 장애 중에 writer 도 내렸다가 새로 띄움 (프로세스 재시작 흉내: 디스크에서 이어서 replay)
+- 서버를 다시 띄운 뒤 spool 이 비워질 때까지 기다리고, 보낸 point 가 전부 도착했는지 확인
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.influx_service import InfluxBatchWriter
+from app.services.influx_spool import Spool
+
+RECEIVED: set = set()
+_lock = threading.Lock()
+
+
+class FakeInflux(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with _lock:
+            RECEIVED.update(ln for ln in body.split(b"\n") if ln)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve(port: int) -> ThreadingHTTPServer:
+    ThreadingHTTPServer.allow_reuse_address = True
+    srv = ThreadingHTTPServer(("127.0.0.1", port), FakeInflux)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def make_writer(url: str, spool_dir: str, args) -> InfluxBatchWriter:
+    def write(lines):
+        req = urllib.request.Request(url, data=b"\n".join(lines), method="POST")
+        with urllib.request.urlopen(req, timeout=2) as resp:
+            resp.read()
+
+    spool = Spool(spool_dir, segment_bytes=args.segment_kb * 1024, max_bytes=args.max_mb * 1024 * 1024)
+    w = InfluxBatchWriter(
+        write, batch_size=500, flush_interval=0.1, max_queue=100000,
+        max_retries=2, retry_base=0.05, spool=spool, replay_interval=0.5,
+    )
+    w.start()
+    return w
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--points", type=int, default=20000)
+    ap.add_argument("--rate", type=int, default=4000, help="points/sec")
+    ap.add_argument("--down-at", type=float, default=0.3, help="이 비율만큼 보낸 뒤 서버 종료")
+    ap.add_argument("--down-sec", type=float, default=3.0)
+    ap.add_argument("--segment-kb", type=int, default=64)
+    ap.add_argument("--max-mb", type=int, default=64)
+    ap.add_argument("--restart-writer", action="store_true")
+    ap.add_argument("--port", type=int, default=18086)
+    args = ap.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}/api/v2/write"
+    spool_dir = tempfile.mkdtemp(prefix="influx-spool-")
+    srv = serve(args.port)
+    writer = make_writer(url, spool_dir, args)
+
+    sent = [b"power,device_id=d%d kw=%di %d" % (i % 50, i, 1_700_000_000_000_000_000 + i) for i in range(args.points)]
+    down_at = int(args.points * args.down_at)
+    up_at = None
+    interval = 1.0 / args.rate
+    t0 = time.perf_counter()
+    max_segments = 0
+
+    for i, line in enumerate(sent):
+        if i == down_at:
+            srv.shutdown()
+            srv.server_close()
+            print(f"💥 fake Influx down at point {i}")
+            up_at = time.perf_counter() + args.down_sec
+            if args.restart_writer:
+                time.sleep(0.5)
+                writer.stop()
+                print(f"🔁 writer restarted: {writer.stats()['spool']}")
+                writer = make_writer(url, spool_dir, args)
+        if up_at and time.perf_counter() >= up_at:
+            srv = serve(args.port)
+            up_at = None
+            print(f"✅ fake Influx up at point {i}")
+        writer.enqueue([line])
+        max_segments = max(max_segments, writer.spool.stats()["segments"])
+        target = t0 + (i + 1) * interval
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    if up_at:
+        time.sleep(max(0.0, up_at - time.perf_counter()))
+        srv = serve(args.port)
+        print("✅ fake Influx up after stream")
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        st = writer.stats()
+        if st["queue_depth"] == 0 and not st["spool"]["segments"] and len(RECEIVED) >= len(sent):
+            break
+        time.sleep(0.2)
+    writer.stop()
+    srv.shutdown()
+
+    st = writer.stats()
+    missing = set(sent) - RECEIVED
+    print(f"sent={len(sent)} received={len(RECEIVED)} missing={len(missing)} max_segments={max_segments}")
+    print(f"writer: written={st['written']} spooled={st['spooled']} failed={st['failed']} dropped={st['dropped']}")
+    print(f"spool:  {st['spool']}")
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    print("OK" if not missing else "LOST POINTS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# ingest.py
+"""
+✅ multi-worker 모드의 ingest 전용 프로세스 (HTTP 없음)
+
+  APP_ROLE=ingest python ingest.py                    # MQTT (MQTT_CLIENTS 개 연결) + Influx + rollup + IPC publish
+  APP_ROLE=worker uvicorn server:app --workers 4      # REST/WS, record 는 IPC_SOCKET 으로 수신
+
+worker 는 ingest 보다 먼저 떠도 됨 (IPC 재연결 backoff).
+"""
+import os
+import signal
+import threading
+
+os.environ["APP_ROLE"] = "ingest"
+
+from app.core.config import MQTT_HOST
+from app.core.log import setup_logging, shutdown_logging, get_logger
+from app.services.influx_service import init_influx, close_influx
+from app.services.mqtt_service import start_mqtt, stop_mqtt
+from app.services.rollup_service import start_rollup, stop_rollup
+from app.services.ipc_service import start_publisher, stop_publisher
+from app.services.snapshot_service import start_snapshots, stop_snapshots, wait_loaded
+
+log = get_logger("app.ingest")
+
+
+def main() -> None:
+    if not MQTT_HOST:
+        log.error("❌ MQTT_HOST empty -> nothing to ingest")
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    setup_logging()
+    init_influx()
+    start_snapshots()
+    start_rollup()
+    start_mqtt()
+    try:
+        # ✅ put_many(스냅샷 로드)는 IPC 로 publish 되지 않음 -> 로드가 끝난 뒤 publisher 시작
+        # worker 는 접속 시 registry 전체를 받으므로 그 사이 MQTT 로 들어온 record 도 포함됨
+        while not wait_loaded(0.5):
+            if stop.is_set():
+                return
+        start_publisher()
+        stop.wait()
+    finally:
+        stop_mqtt()
+        stop_snapshots()
+        stop_publisher()
+        stop_rollup()
+        close_influx()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
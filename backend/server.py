@@ -1,14 +1,22 @@
 # server.py
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 
 from app.services.influx_service import init_influx, close_influx
-from app.services.mqtt_service import start_mqtt, set_main_loop
-from app.core.config import MQTT_HOST
-from app.routers import auth, devices, series, report
+from app.services.mqtt_service import start_mqtt, stop_mqtt, set_main_loop
+from app.services.rollup_service import start_rollup, stop_rollup
+from app.services.ipc_service import start_publisher, stop_publisher, run_replica
+from app.services.liveness_service import liveness
+from app.services.snapshot_service import start_snapshots, stop_snapshots, wait_loaded
+from app.core.config import MQTT_HOST, APP_ROLE
+from app.core.security import init_user_store, shutdown_auth
+from app.core.health import set_state
+from app.core.log import setup_logging, shutdown_logging, get_logger
+from app.routers import auth, devices, series, report, ws, metrics, health
 
-from app.ws.manager import ws_manager  # ✅ 추가: ws_manager 사용
+setup_logging()
+log = get_logger("app.server")
 
 app = FastAPI()
 
@@ -47,58 +55,77 @@ app.include_router(devices.router)
 app.include_router(series.router)
 app.include_router(report.router)
 
-# =========================================================
-# ✅ WebSocket endpoint (ws_manager 기반으로 통일)
-# =========================================================
-@app.websocket("/ws/telemetry")
-async def ws_telemetry(ws: WebSocket):
-    await ws.accept()
-
-    # ✅ 연결을 ws_manager에 등록 (push_telemetry()가 여기로 broadcast함)
-    try:
-        await ws_manager.connect(ws)  # ✅ 핵심
-    except Exception:
-        try:
-            await ws.close()
-        except Exception:
-            pass
-        return
+# ✅ WebSocket (/ws/telemetry): 구독 필터링 포함, app/routers/ws.py 로 통일
+app.include_router(ws.router)
 
-    # ✅ 연결 직후 확인용 1회 메시지
-    try:
-        await ws.send_json({"type": "ping", "hello": "connected"})
-    except Exception:
-        pass
+# ✅ Prometheus scrape (/metrics)
+app.include_router(metrics.router)
 
-    try:
-        # ✅ keepalive(선택)
-        while True:
-            await asyncio.sleep(30)
-            await ws.send_json({"type": "ping"})
-    except WebSocketDisconnect:
-        pass
-    except Exception:
-        pass
-    finally:
-        try:
-            await ws_manager.disconnect(ws)  # ✅ 핵심
-        except Exception:
-            pass
+# ✅ /healthz (liveness) + /readyz (READY_REQUIRE 서브시스템 준비 여부)
+app.include_router(health.router)
 
 # =========================================================
 # Lifecycle
 # =========================================================
+_replica_task: asyncio.Task | None = None
+_publisher_task: asyncio.Task | None = None
+
+
+async def _start_publisher_after_load() -> None:
+    # ✅ 스냅샷 로드(put_many)는 IPC 로 publish 되지 않음 -> 로드가 끝난 뒤 publisher 시작
+    # worker 는 접속 시 registry 전체를 받으므로 그 사이 MQTT 로 들어온 record 도 포함됨
+    while not await asyncio.to_thread(wait_loaded, 0.5):
+        pass
+    start_publisher()
+
+
 @app.on_event("startup")
 async def on_startup():
+    global _replica_task, _publisher_task
     # ✅ MQTT 콜백 스레드가 코루틴을 안전하게 실행하도록 메인 루프 등록
     set_main_loop(asyncio.get_running_loop())
 
+    # ✅ 사용자 저장소 (SQLite) 준비 - 비어 있으면 seed 계정 hash 는 hash 스레드에서 (끝나면 users = ready)
+    init_user_store()
+
+    # ✅ Influx / MQTT 연결은 백그라운드 재시도 -> startup 은 바로 끝나고 요청을 받음
+    #    (상태는 /healthz, /readyz)
     init_influx()
+
+    # ✅ online/offline 전환 감지 -> WS presence 이벤트 (worker 는 replica record 기준)
+    liveness.start(asyncio.get_running_loop())
+
+    # ✅ worker: MQTT 없이 ingest 프로세스의 record 로 replica 유지 (uvicorn --workers N)
+    if APP_ROLE == "worker":
+        set_state("snapshot", "disabled", "worker role")
+        set_state("mqtt", "disabled", "worker role")
+        _replica_task = asyncio.create_task(run_replica())
+        return
+
+    # ✅ 이전 스냅샷으로 장치 목록/online 상태를 채움 (snapshot 스레드에서 로드)
+    start_snapshots()
+    start_rollup()
+    if APP_ROLE == "ingest":
+        _publisher_task = asyncio.create_task(_start_publisher_after_load())
     if MQTT_HOST:
         start_mqtt()
     else:
-        print("⚠️ MQTT_HOST empty -> MQTT not started")
+        log.warning("⚠️ MQTT_HOST empty -> MQTT not started")
+        set_state("mqtt", "disabled", "MQTT_HOST empty")
 
 @app.on_event("shutdown")
 def on_shutdown():
-    close_influx()
\ No newline at end of file
+    if _replica_task:
+        _replica_task.cancel()
+    if _publisher_task:
+        _publisher_task.cancel()
+    # ✅ 수신부터 멈춤 (연결 -> ingest 풀 drain) -> 마지막 스냅샷/rollup 에 남은 메시지까지 반영 (ingest.py 와 같은 순서)
+    stop_mqtt()
+    liveness.stop()
+    stop_snapshots()
+    stop_publisher()
+    # ✅ 열린 rollup 버킷을 writer 큐에 넣은 뒤 Influx 종료 (close 가 남은 큐를 flush)
+    stop_rollup()
+    close_influx()
+    shutdown_auth()
+    shutdown_logging()
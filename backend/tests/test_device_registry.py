@@ -0,0 +1,78 @@
+# tests/test_device_registry.py
+"""
+DeviceRegistry 순서 확인: 도착 순서 != ts 순서 (ingest shard 여러 개, 스냅샷 로드 중 live 수신)
+
+    cd backend && python -m pytest -q tests
+"""
+from app.domain.device_registry import DeviceRegistry
+from app.domain.device_store import TelemetryRecord
+
+
+def _rec(key: str, ts: float, site: str = "s1") -> TelemetryRecord:
+    meta = {"country": "th", "site_id": site, "model": "pg46", "device_id": key, "last_seen": ts}
+    return TelemetryRecord(key=key, meta=meta, payload={}, summary={}, channels=[], ts=ts)
+
+
+def _pages(reg: DeviceRegistry, **kw) -> list:
+    keys, cursor = [], None
+    while True:
+        out, cursor, _ = reg.query(cursor=cursor, limit=1, **kw)
+        keys += [r.key for r in out]
+        if cursor is None:
+            return keys
+
+
+def test_out_of_order_puts_page_in_ts_order():
+    reg = DeviceRegistry()
+    for key, ts in (("C", 0.5), ("B", 1.1), ("A", 1.0)):
+        reg.put(_rec(key, ts))
+
+    assert [r.key for r in reg.query()[0]] == ["B", "A", "C"]
+    assert _pages(reg) == ["B", "A", "C"]
+    assert _pages(reg, filters={"site_id": "s1"}) == ["B", "A", "C"]
+    assert [r.key for r in reg.query(min_ts=0.9)[0]] == ["B", "A"]
+
+
+def test_update_moves_device_to_its_new_ts():
+    reg = DeviceRegistry()
+    reg.put(_rec("A", 1.0))
+    reg.put(_rec("B", 3.0))
+    reg.put(_rec("A", 2.0))   # B 보다 먼저 받은 메시지가 늦게 처리됨
+
+    assert [r.key for r in reg.query()[0]] == ["B", "A"]
+    reg.put(_rec("A", 4.0))
+    assert [r.key for r in reg.query()[0]] == ["A", "B"]
+
+
+def test_put_many_after_live_put_keeps_ts_order():
+    now = 1000.0
+    reg = DeviceRegistry()
+    reg.put(_rec("live", now))
+    assert reg.put_many([_rec("old", now - 600), _rec("live", now - 700)]) == 1
+
+    assert [r.key for r in reg.query(min_ts=now - 60)[0]] == ["live"]
+    assert [r.key for r in reg.query()[0]] == ["live", "old"]
+    assert reg.get("live").ts == now
+
+
+def test_since_uses_update_order_not_ts_order():
+    reg = DeviceRegistry()
+    reg.put(_rec("A", 5.0))
+    v = reg.version
+    reg.put(_rec("B", 1.0))   # ts 는 더 오래됐지만 since 이후 갱신
+
+    out, _, total = reg.query(since=v)
+    assert [r.key for r in out] == ["B"]
+    assert total == 2
+    assert [r.key for r in reg.query(since=v, filters={"site_id": "s1"})[0]] == ["B"]
+
+
+def test_keys_and_exclude_keys_filter_without_changing_total():
+    reg = DeviceRegistry()
+    for key, ts in (("A", 1.0), ("B", 2.0), ("C", 3.0)):
+        reg.put(_rec(key, ts))
+
+    out, _, total = reg.query(keys={"A", "C"})
+    assert [r.key for r in out] == ["C", "A"] and total == 3
+    assert [r.key for r in reg.query(exclude_keys={"A", "C"})[0]] == ["B"]
+    assert _pages(reg, keys={"A", "B", "C"}) == ["C", "B", "A"]
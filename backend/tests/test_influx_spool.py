@@ -0,0 +1,108 @@
+# tests/test_influx_spool.py
+"""
+Influx spool: 쓰기 실패 batch 를 디스크에 기록 -> 프로세스가 죽은 뒤 새 writer 가 순서대로 replay
+
+    cd backend && python -m pytest -q tests
+"""
+import os
+import threading
+
+from app.services.influx_service import InfluxBatchWriter
+from app.services.influx_spool import DROP_NEWEST, Spool, has_segments
+
+
+class FakeWriteApi:
+    def __init__(self, up: bool = True) -> None:
+        self.up = up
+        self.points = []
+        self.cond = threading.Condition()
+
+    def write(self, lines) -> None:
+        with self.cond:
+            if not self.up:
+                raise ConnectionError("influx down")
+            self.points += lines
+            self.cond.notify_all()
+
+    def wait_points(self, n: int, timeout: float = 3.0) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.points) >= n, timeout)
+
+
+def _lines(n: int, start: int = 0):
+    return [b"m v=%d %d" % (i, i) for i in range(start, start + n)]
+
+
+def _writer(api: FakeWriteApi, spool: Spool) -> InfluxBatchWriter:
+    return InfluxBatchWriter(
+        api.write, batch_size=4, flush_interval=0.02, max_queue=100,
+        max_retries=0, retry_base=0.0, spool=spool, replay_interval=0.1,
+    )
+
+
+def test_append_peek_ack_in_order(tmp_path):
+    sp = Spool(str(tmp_path), segment_bytes=1024, fsync=False)
+    sp.append(_lines(60))          # 1024 바이트를 넘으면 다음 append 는 새 segment
+    sp.append(_lines(60, 60))
+    assert sp.stats()["segments"] == 2
+
+    got = []
+    while True:
+        head = sp.peek()
+        if head is None:
+            break
+        got += head[1]
+        sp.ack(head[0])
+    assert got == _lines(120)
+    assert not sp.pending() and not has_segments(str(tmp_path))
+
+
+def test_reopen_after_crash_keeps_segments_and_drops_torn_tail(tmp_path):
+    sp = Spool(str(tmp_path), fsync=False)
+    sp.append(_lines(3))
+    assert has_segments(str(tmp_path))
+    # close() 없이 버림 = 프로세스 종료. 마지막 append 는 개행 전에 잘림
+    path = os.path.join(str(tmp_path), sorted(os.listdir(str(tmp_path)))[0])
+    with open(path, "ab") as f:
+        f.write(b"m v=3 ")
+
+    sp2 = Spool(str(tmp_path), fsync=False)
+    assert sp2.pending()
+    seq, lines = sp2.peek()
+    assert lines == _lines(3)
+    sp2.ack(seq)
+    sp2.append(_lines(1, 10))      # 새 segment 번호는 이어서
+    assert sp2.peek()[0] > seq
+
+
+def test_drop_newest_keeps_old_data(tmp_path):
+    sp = Spool(str(tmp_path), segment_bytes=1024, max_bytes=1024, policy=DROP_NEWEST, fsync=False)
+    assert sp.append(_lines(60)) == 60         # 580 bytes
+    assert sp.append(_lines(60, 60)) == 0      # +600 > 1024 -> 새 batch 를 버림
+    assert sp.stats()["dropped"] == 60 and sp.peek()[1] == _lines(60)
+
+
+def test_writer_spools_then_new_writer_replays_after_crash(tmp_path):
+    down = FakeWriteApi(up=False)
+    w = _writer(down, Spool(str(tmp_path), fsync=False))
+    w.start()
+    w.enqueue(_lines(10))
+    w.stop()                       # 큐는 비웠지만 Influx 는 계속 장애 -> 전부 spool
+    st = w.stats()
+    assert st["spooled"] == 10 and st["failed"] == 0 and st["down"]
+
+    api = FakeWriteApi(up=True)    # 재시작: 같은 디렉터리로 새 spool + writer
+    w2 = _writer(api, Spool(str(tmp_path), fsync=False))
+    w2.start()
+    try:
+        w2.enqueue(_lines(2, 10))
+        assert api.wait_points(12)
+        assert sorted(api.points) == sorted(_lines(12))
+        assert [p for p in api.points if p in _lines(10)] == _lines(10)   # spool 은 순서대로
+        for _ in range(100):
+            if not w2.backlog():
+                break
+            threading.Event().wait(0.02)
+        assert not w2.backlog() and not has_segments(str(tmp_path))
+    finally:
+        w2.stop()
@@ -0,0 +1,109 @@
+# tests/test_influx_writer.py
+"""
+InfluxBatchWriter: batch_size / flush_interval 로 묶어 쓰기, 재시도, stop 시 남은 큐 flush (fake write API)
+
+    cd backend && python -m pytest -q tests
+"""
+import threading
+import time
+
+from app.services.influx_service import InfluxBatchWriter
+
+
+class FakeWriteApi:
+    """write_fn 자리: 받은 batch 기록, fail 횟수만큼 예외"""
+
+    def __init__(self, fail: int = 0) -> None:
+        self.batches = []
+        self.fail = fail
+        self.calls = 0
+        self.cond = threading.Condition()
+
+    def write(self, lines) -> None:
+        with self.cond:
+            self.calls += 1
+            if self.fail > 0:
+                self.fail -= 1
+                raise ConnectionError("influx down")
+            self.batches.append(list(lines))
+            self.cond.notify_all()
+
+    def wait_points(self, n: int, timeout: float = 2.0) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: sum(map(len, self.batches)) >= n, timeout)
+
+
+def _lines(n: int, start: int = 0):
+    return [b"m v=%d %d" % (i, i) for i in range(start, start + n)]
+
+
+def _writer(api: FakeWriteApi, **kw) -> InfluxBatchWriter:
+    opts = dict(batch_size=4, flush_interval=60.0, max_queue=100, max_retries=0, retry_base=0.0)
+    opts.update(kw)
+    return InfluxBatchWriter(api.write, **opts)
+
+
+def test_full_batches_are_written_without_waiting_for_interval():
+    api = FakeWriteApi()
+    w = _writer(api)
+    w.start()
+    try:
+        assert w.enqueue(_lines(8)) == 8
+        assert api.wait_points(8)
+        assert [len(b) for b in api.batches] == [4, 4]
+        assert api.batches[0][0] == b"m v=0 0" and api.batches[1][-1] == b"m v=7 7"
+    finally:
+        w.stop()
+    st = w.stats()
+    assert st["written"] == 8 and st["batches"] == 2 and st["dropped"] == 0
+
+
+def test_partial_batch_flushes_after_interval():
+    api = FakeWriteApi()
+    w = _writer(api, flush_interval=0.05)
+    w.start()
+    try:
+        t0 = time.monotonic()
+        w.enqueue(_lines(3))
+        assert api.wait_points(3)
+        assert time.monotonic() - t0 >= 0.04
+        assert api.batches == [_lines(3)]
+    finally:
+        w.stop()
+
+
+def test_stop_flushes_remaining_queue():
+    api = FakeWriteApi()
+    w = _writer(api)
+    w.start()
+    w.enqueue(_lines(2))
+    w.stop()
+    assert api.batches == [_lines(2)]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    api = FakeWriteApi()
+    w = _writer(api, max_queue=5)   # start 안 함 -> 큐가 비워지지 않음
+    assert w.enqueue(_lines(8)) == 5
+    st = w.stats()
+    assert st["enqueued"] == 5 and st["dropped"] == 3 and st["queue_depth"] == 5
+
+
+def test_retry_then_write_and_failed_count_without_spool():
+    api = FakeWriteApi(fail=2)
+    w = _writer(api, max_retries=2)
+    w.start()
+    try:
+        w.enqueue(_lines(4))
+        assert api.wait_points(4)
+    finally:
+        w.stop()
+    assert api.calls == 3 and w.stats()["retries"] == 2
+
+    api = FakeWriteApi(fail=10)
+    w = _writer(api, max_retries=1)
+    w.start()
+    w.enqueue(_lines(4))
+    w.stop()
+    st = w.stats()
+    assert st["failed"] == 4 and st["written"] == 0 and "influx down" in st["last_error"]
@@ -0,0 +1,46 @@
+# tests/test_ingest_pool.py
+"""
+IngestPool: 같은 장치는 같은 shard 에서 순서대로, 여러 submit 스레드의 drop 카운트가 빠지지 않음
+
+    cd backend && python -m pytest -q tests
+"""
+import threading
+
+from app.services.ingest_pool import IngestPool
+
+
+def test_same_device_is_processed_in_order():
+    seen = []
+    pool = IngestPool(lambda topic, payload, ts: seen.append((topic, payload)), workers=4, queue_max=1000)
+    pool.start()
+    for i in range(200):
+        assert pool.submit(f"th/site001/pg46/{i % 5:03d}/meter", b"%d" % i, 0.0)
+    pool.stop()
+    for dev in range(5):
+        got = [int(p) for t, p in seen if t == f"th/site001/pg46/{dev:03d}/meter"]
+        assert got == list(range(dev, 200, 5))
+
+
+def test_dropped_count_from_many_submit_threads():
+    gate = threading.Event()
+    pool = IngestPool(lambda topic, payload, ts: gate.wait(), workers=1, queue_max=1)
+    pool.start()
+    results = []
+    lock = threading.Lock()
+
+    def producer() -> None:
+        ok = [pool.submit("th/site001/pg46/001/meter", b"x", 0.0) for _ in range(2000)]
+        with lock:
+            results.extend(ok)
+
+    threads = [threading.Thread(target=producer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert pool.dropped() == results.count(False)
+        assert results.count(True) <= 2   # 처리 중 1개 + 큐 1개
+    finally:
+        gate.set()
+        pool.stop()
@@ -0,0 +1,104 @@
+# tests/test_ipc.py
+"""
+ingest -> worker IPC: JSON frame, 소유자 전용 소켓 디렉터리, 접속 시 snapshot 후 live
+
+    cd backend && python -m pytest -q tests
+"""
+import os
+import socket
+
+import pytest
+
+from app.domain.device_store import registry, TelemetryRecord
+from app.services.ipc_service import RecordPublisher, decode_record, encode_record, _HEADER
+
+KEY = "th/site001/pg46/ipc1"
+
+
+def _rec(ts: float) -> TelemetryRecord:
+    meta = {"country": "th", "site_id": "site001", "model": "pg46", "device_id": "ipc1", "last_seen": ts}
+    return TelemetryRecord(KEY, meta, {"kw": 1}, {"kw": 1.5}, [{"term": "in", "phase": "L1", "kw": 1.5}], ts)
+
+
+def _read(conn: socket.socket):
+    """-> (seq, record)"""
+    def exact(n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            assert chunk
+            buf += chunk
+        return buf
+    size, seq = _HEADER.unpack(exact(_HEADER.size))
+    return seq, decode_record(exact(size))
+
+
+@pytest.fixture
+def _device():
+    registry.put(_rec(1.0))
+    yield
+    registry.remove(KEY)
+
+
+def test_frame_round_trip_is_json():
+    frame = encode_record(_rec(2.0))
+    assert frame[_HEADER.size:].startswith(b'["th/site001/pg46/ipc1"')
+    got = decode_record(frame[_HEADER.size:])
+    assert (got.key, got.summary, got.channels, got.ts) == (KEY, {"kw": 1.5}, _rec(2.0).channels, 2.0)
+
+
+def test_snapshot_then_live(tmp_path, _device):
+    pub = RecordPublisher(str(tmp_path / "run" / "ingest.sock"))
+    pub.start()
+    try:
+        assert os.stat(tmp_path / "run").st_mode & 0o777 == 0o700
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(5)
+        conn.connect(pub.path)
+        seq1, rec = _read(conn)
+        assert rec.ts == 1.0                  # 접속 시 registry snapshot (등록 후 전송)
+        pub.publish(_rec(3.0))
+        seq2, rec = _read(conn)
+        assert rec.ts == 3.0 and seq2 == seq1 + 1
+        conn.close()
+    finally:
+        pub.stop()
+
+
+def test_shared_dir_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(RuntimeError):
+        RecordPublisher(str(shared / "ingest.sock")).start()
+
+
+def test_replicas_share_ingest_seq_as_version(tmp_path, _device):
+    """worker 마다 접속 시점이 달라도 같은 record 는 같은 version (ETag / since 기준이 같음)"""
+    from app.domain.device_registry import DeviceRegistry
+
+    pub = RecordPublisher(str(tmp_path / "run" / "ingest.sock"))
+    pub.start()
+    try:
+        a = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        a.settimeout(5)
+        a.connect(pub.path)
+        rep_a = DeviceRegistry()
+        seq, rec = _read(a)
+        rep_a.put(rec, seq)
+        pub.publish(_rec(2.0))
+        seq, rec = _read(a)
+        rep_a.put(rec, seq)
+
+        b = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)   # 늦게 붙은 worker: snapshot 만 받음
+        b.settimeout(5)
+        b.connect(pub.path)
+        rep_b = DeviceRegistry()
+        seq, rec = _read(b)
+        rep_b.put(rec, seq)
+
+        assert rep_a.version == rep_b.version == rep_b.version_of(KEY)
+        a.close()
+        b.close()
+    finally:
+        pub.stop()
@@ -0,0 +1,27 @@
+# tests/test_liveness.py
+"""
+LivenessTracker.online_digest: online 집합이 같으면 전환 순서/횟수와 무관하게 같은 값 (worker 간 ETag)
+
+    cd backend && python -m pytest -q tests
+"""
+import time
+
+from app.services.liveness_service import LivenessTracker
+
+
+def test_online_digest_depends_only_on_online_set():
+    now = time.time()
+    a = LivenessTracker(online_sec=60)
+    b = LivenessTracker(online_sec=60)
+    a.touch("k1", "s1", now)
+    a.touch("k2", "s1", now)
+    b.touch("k3", "s1", now - 59)   # b 만 online -> offline 을 한 번 더 거침
+    b.touch("k2", "s1", now)
+    b.touch("k1", "s1", now)
+    assert b.expire(now + 30)[0] == 1
+
+    assert a.transitions != b.transitions
+    assert a.online_digest == b.online_digest
+
+    a.touch("k3", "s1", now)
+    assert a.online_digest != b.online_digest
@@ -0,0 +1,92 @@
+# tests/test_mqtt_manager.py
+"""
+manual ack: ingest 큐가 차면 PUBACK 전에 재시도, 끝내 못 넣으면 소켓을 끊어 재연결 (브로커 재전송)
+
+    cd backend && python -m pytest -q tests
+"""
+import socket
+from types import SimpleNamespace
+
+from app.services.mqtt_manager import MQTTConnection, MQTTManager
+
+
+class FakeSocket:
+    def __init__(self) -> None:
+        self.shutdowns = []
+
+    def shutdown(self, how: int) -> None:
+        self.shutdowns.append(how)
+
+
+class FakeClient:
+    """paho Client 중 on_message 가 쓰는 부분만"""
+
+    def __init__(self) -> None:
+        self.acked = []
+        self.sock = FakeSocket()
+
+    def ack(self, mid: int, qos: int) -> None:
+        self.acked.append(mid)
+
+    def socket(self):
+        return self.sock
+
+    def subscribe(self, topic: str, qos: int) -> None:
+        pass
+
+
+def _conn(results, **kw):
+    """handler 는 results 를 차례로 돌려주고 (다 쓰면 마지막 값 반복) 호출 수를 셈"""
+    calls = []
+
+    def handler(topic, payload, now):
+        calls.append(topic)
+        return results[min(len(calls), len(results)) - 1]
+
+    mgr = MQTTManager(handler, host="localhost", client_id="test", **kw)
+    conn = MQTTConnection(mgr, 0, "test")
+    conn.client = FakeClient()
+    return conn, calls
+
+
+def _msg(mid: int):
+    return SimpleNamespace(topic="th/site001/pg46/001", payload=b"{}", mid=mid, qos=1)
+
+
+def test_acks_after_queue_frees_up():
+    conn, calls = _conn([False, False, True], ack_wait=5)
+    conn.on_message(conn.client, None, _msg(1))
+
+    assert conn.client.acked == [1]
+    assert len(calls) == 3 and conn.ack_retries == 2
+    assert conn.unacked == 0 and not conn.client.sock.shutdowns
+
+
+def test_gives_up_then_forces_reconnect():
+    conn, _ = _conn([False], ack_wait=0.1, unacked_reconnect=2)
+    conn.on_message(conn.client, None, _msg(1))
+    assert conn.client.acked == [] and conn.unacked == 1
+    assert not conn.client.sock.shutdowns          # 아직 한도 전
+
+    conn.on_message(conn.client, None, _msg(2))
+    assert conn.client.acked == [] and conn.unacked == 2
+    assert conn.client.sock.shutdowns == [socket.SHUT_RDWR] and conn.forced_reconnects == 1
+
+
+def test_reconnect_resets_pending_count():
+    conn, _ = _conn([False], ack_wait=0.0, unacked_reconnect=2)
+    conn.on_message(conn.client, None, _msg(1))
+    conn.on_connect(conn.client, None, SimpleNamespace(session_present=True), SimpleNamespace(is_failure=False))
+    assert conn.pending_unacked == 0 and conn.unacked == 1
+
+
+def test_keeps_retrying_while_stopping():
+    conn, calls = _conn([False] * 5 + [True], ack_wait=0.0)
+    conn.manager.stopping = True                   # 종료 중: 세션이 지워지므로 포기하지 않음
+    conn.on_message(conn.client, None, _msg(7))
+
+    assert conn.client.acked == [7] and len(calls) == 6
+
+
+def test_ack_wait_is_capped_by_keepalive():
+    assert MQTTManager(lambda *a: True, host="h", keepalive=10, ack_wait=60).ack_wait == 5
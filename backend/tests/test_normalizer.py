@@ -0,0 +1,48 @@
+# tests/test_normalizer.py
+"""
+normalizer 값 선택 규칙: alias 순서대로 None / "" 가 아닌 첫 값 -> 0 은 정상값, 없는 값은 None
+
+    cd backend && python -m pytest -q tests
+"""
+from app.domain.normalizer import get_normalizer, register_profile, MODEL_PROFILES
+
+N = get_normalizer()
+
+
+def test_zero_is_a_value_not_missing():
+    s = N.summary_dict({"kw": 0, "p": 5.0, "v": 0, "kwh": "0"})
+    assert s["kw"] == 0.0 and s["kwh"] == 0.0
+    assert s["v_avg"] == 0.0 and s["v_l1"] == s["v_l2"] == s["v_l3"] == 0.0
+
+    ch = N.channel_dicts({"channels": [{"phase": 2, "v": 0, "volt": 230.0, "kw": 0.0, "p": 9}]})
+    assert ch == [{"term": "in", "phase": "L2", "v": 0.0, "a": None, "kw": 0.0, "pf": None}]
+
+
+def test_missing_and_empty_fall_through_to_next_alias():
+    s = N.summary_dict({"kw": None, "kW": "", "p": "1.5", "v1": 220, "v3": "bad"})
+    assert s["kw"] == 1.5
+    assert s["v_l1"] == 220.0 and s["v_l2"] is None and s["v_l3"] is None   # 변환 실패 = 없는 값
+    assert s["v_avg"] == 220.0
+    assert s["kwh"] is None and s["di"] is None
+
+    ch = N.channel_dicts({"channels": [{"term": "", "io": "out", "ph": "3", "pf": "", "power_factor": "0.9"}]})
+    assert ch == [{"term": "out", "phase": "L3", "v": None, "a": None, "kw": None, "pf": 0.9}]
+
+
+def test_defaults_and_single_value_fallback():
+    assert N.channel_dicts({"channels": [{"v": 1}]})[0]["term"] == "in"
+    assert N.channel_dicts({"channels": [{"v": 1}]})[0]["phase"] == "L1"
+    assert N.channel_dicts({"kwh": 10}) == []                        # 채널 값이 하나도 없음
+    single = N.channel_dicts({"volt": "230", "kw": 0})
+    assert [c["phase"] for c in single] == ["L1", "L2", "L3"]
+    assert all(c["v"] == 230.0 and c["kw"] == 0.0 for c in single)
+    assert N.channel_dicts("not a dict") == [] and N.summary_dict(None)["kw"] is None
+
+
+def test_profile_channel_aliases():
+    register_profile("t-model", channel={"kw": ("watts_k", "kw")})
+    try:
+        ch = get_normalizer("t-model").channel_dicts({"channels": [{"kw": 1.0, "watts_k": 0}]})
+        assert ch[0]["kw"] == 0.0
+    finally:
+        MODEL_PROFILES.pop("t-model", None)
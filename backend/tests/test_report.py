@@ -0,0 +1,88 @@
+# tests/test_report.py
+"""
+리포트 캐시: Influx 장애 / 밀린 쓰기 중 결과는 캐시하지 않음 + TTL 만료, CSV 스트림 오류 trailer
+
+    cd backend && python -m pytest -q tests
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import report_service as rs
+from app.services import series_service as svc
+
+NOW = datetime(2026, 3, 10, 12, 0, 0, tzinfo=timezone.utc)
+BACKLOG = {"on": False}
+
+
+@pytest.fixture(autouse=True)
+def _env(tmp_path, monkeypatch):
+    BACKLOG["on"] = False
+    monkeypatch.setattr(rs, "REPORT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(rs, "write_backlog", lambda: BACKLOG["on"])
+    yield
+
+
+def _report():
+    return rs.build_report(["th/site001/pg46/001"], "kwh", "total", "day", "2026-03-01", "2026-03-03", "csv", "", now=NOW)
+
+
+def _rows(n=3, fail_at=None):
+    t = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        if i == fail_at:
+            raise RuntimeError("influx not connected")
+        yield "th/site001/pg46/001", svc.format_label(t + timedelta(days=i), "day"), float(i)
+
+
+def test_settled_result_is_cached():
+    report = _report()
+    assert report.cacheable and report.settled
+    body = rs.build_csv(report, _rows())
+    path = rs.cached_file(report)
+    assert path and open(path, "rb").read() == body
+
+
+def test_backlog_at_start_or_end_is_not_cached():
+    BACKLOG["on"] = True
+    report = _report()
+    assert report.cacheable and not report.settled
+    rs.build_csv(report, _rows())
+    assert rs.cached_file(report) is None
+
+    BACKLOG["on"] = False
+    report = _report()
+
+    def rows():
+        yield from _rows(2)
+        BACKLOG["on"] = True   # 조회 중 Influx 장애 / spool 시작
+
+    rs.build_csv(report, rows())
+    BACKLOG["on"] = False
+    assert rs.cached_file(report) is None
+    assert os.listdir(rs.REPORT_CACHE_DIR) == []
+
+
+def test_cached_file_expires(monkeypatch):
+    report = _report()
+    rs.build_csv(report, _rows())
+    path = rs.cached_file(report)
+    old = time.time() - rs.REPORT_CACHE_TTL_SEC - 10
+    os.utime(path, (old, old))
+    assert rs.cached_file(report) is None
+    assert not os.path.exists(path)
+
+
+def test_stream_error_appends_trailer_and_skips_cache():
+    report = _report()
+    out = b"".join(rs.stream_csv(report, _rows(3, fail_at=2)))
+    lines = out.decode("utf-8").splitlines()
+    assert lines[0].startswith("device,date,")
+    assert len(lines) == 4 and lines[-1].startswith("# error: report truncated")
+    assert rs.cached_file(report) is None
+
+    with pytest.raises(RuntimeError):
+        rs.build_csv(report, _rows(3, fail_at=1))
+    assert rs.fits_in_memory(report)
@@ -0,0 +1,72 @@
+# tests/test_revocation.py
+"""
+token 폐기: users.db 에 기록 -> 다른 worker 도 반영, 비밀번호 변경/계정 정지 = 사용자 token 전부 폐기
+
+    cd backend && python -m pytest -q tests
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.security import (
+    change_password, create_access_token, hash_password, revoke_token, set_user_active, verify_token,
+)
+from app.domain.user_store import SQLiteUserStore, set_user_store
+
+
+def _other_worker_sees(monkeypatch) -> None:
+    """다른 worker: 메모리 표 없이 시작해서 다음 요청에서 동기화"""
+    for name, value in (("_revoked_jti", {}), ("_revoked_before", {}), ("_revoke_seen", 0), ("_revoke_synced", 0.0)):
+        monkeypatch.setattr(security, name, value)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    st = SQLiteUserStore(str(tmp_path / "users.db"))
+    set_user_store(st)
+    _other_worker_sees(monkeypatch)
+    security._token_cache.clear()
+    yield st
+    set_user_store(None)
+
+
+def test_logout_is_shared_through_store(store, monkeypatch):
+    token = create_access_token({"sub": "1", "email": "a@x", "role": "user"})
+    revoke_token(verify_token(token))
+    _other_worker_sees(monkeypatch)
+
+    with pytest.raises(HTTPException):
+        verify_token(token)   # 캐시에 있어도 users.db 의 폐기를 읽어서 거절
+
+
+def test_expired_revocations_are_pruned(store):
+    now = time.time()
+    store.add_revocation("old", None, 0, now - 1, now - 10)
+    store.add_revocation("new", None, 0, now + 60, now)
+    assert [r[1] for r in store.revocations_since(0, now)] == ["new"]
+    assert store._conn().execute("SELECT COUNT(*) FROM revocations").fetchone()[0] == 1
+
+
+def test_disable_user_revokes_existing_tokens(store, monkeypatch):
+    user = store.create("a@x", "h")
+    token = create_access_token({"sub": str(user["id"]), "email": "a@x", "role": "user"})
+    verify_token(token)
+    set_user_active(user["id"], False)
+    _other_worker_sees(monkeypatch)
+
+    assert store.get_by_id(user["id"])["is_active"] is False
+    with pytest.raises(HTTPException):
+        verify_token(token)
+
+
+def test_change_password_revokes_and_rehashes(store):
+    user = store.create("a@x", hash_password("old-pass"))
+    token = create_access_token({"sub": str(user["id"]), "email": "a@x", "role": "user"})
+    asyncio.run(change_password(verify_token(token), "old-pass", "new-pass"))
+
+    with pytest.raises(HTTPException):
+        verify_token(token)
+    assert security.pwd_context().verify("new-pass", store.get_by_id(user["id"])["password_hash"])
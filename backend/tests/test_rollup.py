@@ -0,0 +1,64 @@
+# tests/test_rollup.py
+"""
+RollupEngine: 재시작 사이 열린 버킷 이어받기 + 닫힌 버킷보다 늦은 샘플 거부
+
+    cd backend && python -m pytest -q tests
+"""
+from datetime import datetime, timezone
+
+from app.domain.device_store import TelemetryRecord
+from app.services.rollup_service import RollupEngine
+
+T0 = datetime(2026, 3, 2, 10, 0, 0, tzinfo=timezone.utc).timestamp()   # 분/시 경계
+KEY = "th/site001/pg46/001"
+META = {"country": "th", "site_id": "site001", "model": "pg46", "device_id": "001"}
+
+
+def _rec(ts: float, kw: float, kwh: float) -> TelemetryRecord:
+    return TelemetryRecord(key=KEY, meta=META, payload={}, summary={"kw": kw, "kwh": kwh}, channels=[], ts=ts)
+
+
+def _fields(line: str) -> dict:
+    fields = line.split(" ")[1]
+    out = {}
+    for kv in fields.split(","):
+        k, v = kv.split("=")
+        out[k] = float(v.rstrip("i"))
+    return out
+
+
+def _engine(out: list) -> RollupEngine:
+    return RollupEngine(lambda lines: out.extend(lines) or len(lines), levels=("hour",), grace=0)
+
+
+def test_restart_merges_open_bucket_instead_of_overwriting():
+    out: list = []
+    eng = _engine(out)
+    eng.add(_rec(T0 - 10, 1.0, 90.0))    # 이전 시간 버킷 -> kwh_prev = 90
+    eng.add(_rec(T0 + 60, 2.0, 100.0))
+    eng.add(_rec(T0 + 120, 4.0, 101.0))
+    eng.flush_all()
+    state = eng.export_state()
+
+    out2: list = []
+    eng2 = _engine(out2)
+    assert eng2.load_state(state) == 1
+    eng2.add(_rec(T0 + 1800, 6.0, 105.0))
+    eng2.add(_rec(T0 + 3600, 1.0, 106.0))   # 다음 버킷 -> 10:00 버킷 닫힘
+
+    row = _fields(out2[0])
+    assert row["kw_count"] == 3 and row["kw_sum"] == 12.0 and row["kw_min"] == 2.0 and row["kw_max"] == 6.0
+    assert row["kwh_last"] == 105.0
+    assert row["kwh_delta"] == 15.0   # 105 - 이전 버킷 마지막 90 (재시작 전 kwh_prev 유지)
+
+
+def test_sample_after_sweep_is_late_not_a_new_bucket():
+    out: list = []
+    eng = _engine(out)
+    eng.add(_rec(T0 + 60, 2.0, 100.0))
+    assert eng.sweep(now=T0 + 3600) == 1
+    eng.add(_rec(T0 + 120, 9.0, 100.5))   # 이미 닫혀서 기록된 버킷
+
+    assert eng.late == 1
+    assert eng.sweep(now=T0 + 7200) == 0
+    assert len(out) == 1
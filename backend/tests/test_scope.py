@@ -0,0 +1,60 @@
+# tests/test_scope.py
+"""
+REST 사용자 범위: token 의 sites / devices claim 밖 장치·site 는 403
+
+    cd backend && python -m pytest -q tests
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import require_device_scope, require_site_scope, scope_allows_key
+from app.domain.device_store import registry, TelemetryRecord
+
+SITE_USER = {"sub": "a@x", "role": "user", "sites": ["site001"]}
+DEVICE_USER = {"sub": "b@x", "role": "user", "devices": ["th/site002/pg46/007"]}
+ADMIN = {"sub": "root", "role": "admin", "sites": []}
+
+
+@pytest.fixture(autouse=True)
+def _devices():
+    keys = ["th/site001/pg46/001", "th/site002/pg46/001", "th/site002/pg46/007"]
+    for i, key in enumerate(keys):
+        country, site, model, dev = key.split("/")
+        meta = {"country": country, "site_id": site, "model": model, "device_id": dev, "last_seen": float(i)}
+        registry.put(TelemetryRecord(key=key, meta=meta, payload={}, summary={}, channels=[], ts=float(i)))
+    yield
+    for key in keys:
+        registry.remove(key)
+
+
+def test_scope_allows_key():
+    assert scope_allows_key(None, "th/site009/pg46/001")
+    assert scope_allows_key((["site001"], []), "th/site001/pg46/001")
+    assert not scope_allows_key((["site001"], []), "th/site002/pg46/001")
+    assert scope_allows_key(([], ["007"]), "th/site002/pg46/007")
+
+
+def test_device_scope():
+    assert require_device_scope(ADMIN, "001") == "001"
+    assert require_device_scope(SITE_USER, "th/site001/pg46/001") == "th/site001/pg46/001"
+    with pytest.raises(HTTPException) as e:
+        require_device_scope(SITE_USER, "th/site002/pg46/001")
+    assert e.value.status_code == 403
+    # device_id 만: 같은 id 가 범위 밖 site 에도 있으면 확정할 수 없음 -> 403
+    with pytest.raises(HTTPException):
+        require_device_scope(SITE_USER, "001")
+    assert require_device_scope(DEVICE_USER, "007") == "th/site002/pg46/007"
+
+
+def test_site_scope():
+    assert require_site_scope(ADMIN, "site002") is None
+    assert require_site_scope(SITE_USER, "site001") == {"th/site001/pg46/001"}
+    assert require_site_scope(DEVICE_USER, "site002") == {"th/site002/pg46/007"}
+    with pytest.raises(HTTPException) as e:
+        require_site_scope(SITE_USER, "site002")
+    assert e.value.status_code == 403
+
+
+def test_query_scope_limits_total():
+    out, _, total = registry.query({"site_id": "site002"}, scope={"th/site002/pg46/007"})
+    assert [r.key for r in out] == ["th/site002/pg46/007"] and total == 1
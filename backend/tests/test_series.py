@@ -0,0 +1,53 @@
+# tests/test_series.py
+"""
+series: rollup 이 없는 window 는 raw 로 채움 + raw 상별 kW 는 입력(term=in) 채널만
+
+    cd backend && python -m pytest -q tests
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.services import series_service as ss
+
+T0 = datetime(2026, 3, 2, 0, 0, tzinfo=timezone.utc)
+
+
+def _h(n: int) -> datetime:
+    return T0 + timedelta(hours=n)
+
+
+def _fake_run(rollup_rows: dict, raw_rows: dict, calls: list):
+    def run(q, start, stop, ttl, rollup=False):
+        calls.append((rollup, start, stop))
+        src = rollup_rows if rollup else raw_rows
+        return [(t, v) for t, v in sorted(src.items()) if start <= t < stop]
+    return run
+
+
+def test_closed_fills_windows_missing_from_rollup(monkeypatch):
+    q = ss.make_query("th/site001/pg46/001", "kw", "total", "hour")
+    raw = {_h(i): float(i) for i in range(6)}
+    rollup = {_h(2): 20.0, _h(3): 30.0, _h(5): 50.0}   # 2 시부터 rollup, 4 시는 rollup 꺼짐
+    calls: list = []
+    monkeypatch.setattr(ss, "ROLLUP_ENABLED", True)
+    monkeypatch.setattr(ss, "_run", _fake_run(rollup, raw, calls))
+
+    rows = sorted(ss._closed(q, _h(0), _h(6)))
+
+    # 0~2 시(도입 시점 window 포함)와 4 시는 raw, 나머지는 rollup
+    assert rows == [(_h(0), 0.0), (_h(1), 1.0), (_h(2), 2.0), (_h(3), 30.0), (_h(4), 4.0), (_h(5), 50.0)]
+    assert [(s, e) for r, s, e in calls if not r] == [(_h(0), _h(3)), (_h(4), _h(5))]
+
+
+def test_closed_uses_raw_when_no_rollup(monkeypatch):
+    q = ss.make_query("001", "kwh", "total", "hour")
+    calls: list = []
+    monkeypatch.setattr(ss, "ROLLUP_ENABLED", True)
+    monkeypatch.setattr(ss, "_run", _fake_run({}, {_h(1): 3.0}, calls))
+
+    assert ss._closed(q, _h(0), _h(3)) == [(_h(1), 3.0)]
+
+
+def test_raw_phase_kw_filters_input_term():
+    flux = ss.build_flux(ss.make_query("001", "kw", "l2", "hour"), _h(0), _h(1))
+    assert 'r.phase == "L2"' in flux and 'r.term == "in"' in flux
+    assert "r.term" not in ss.build_flux(ss.make_query("001", "v", "l2", "hour"), _h(0), _h(1))
@@ -0,0 +1,39 @@
+# tests/test_stream.py
+"""
+ClientStream delta: dict 필드 안의 key 삭제는 removed, 최상위 필드 삭제는 전체 프레임
+
+    cd backend && python -m pytest -q tests
+"""
+import json
+
+from app.ws.stream import ClientStream
+
+KEY = "th/site001/pg46/001"
+
+
+def _event(ts: float, **fields) -> dict:
+    return {"type": "telemetry", "key": KEY, "ts": ts, **fields}
+
+
+def _send(cs: ClientStream, event: dict) -> dict:
+    return json.loads(cs.encode(KEY, json.dumps(event), event, now=event["ts"]))
+
+
+def test_nested_removal_is_a_delta():
+    cs = ClientStream(delta=True)
+    _send(cs, _event(1, summary={"kw": 1.0, "pf": 0.9}, payload={"a": 1}))
+    out = _send(cs, _event(2, summary={"kw": 2.0}, payload={"a": 1}))
+    assert out["type"] == "telemetry_delta"
+    assert out["changed"] == {"summary": {"kw": 2.0}}
+    assert out["removed"] == {"summary": ["pf"]}
+
+
+def test_top_level_removal_sends_full_frame():
+    cs = ClientStream(delta=True)
+    _send(cs, _event(1, summary={"kw": 1.0}, channel_count=3, channels=[1, 2, 3]))
+    out = _send(cs, _event(2, summary={"kw": 1.0}))
+    assert out["type"] == "telemetry" and "channels" not in out
+    assert cs.frames_full == 2 and cs.frames_delta == 0
+
+    out = _send(cs, _event(3, summary={"kw": 1.5}))   # 새 기준에서 다시 delta
+    assert out["type"] == "telemetry_delta" and out["changed"] == {"summary": {"kw": 1.5}}
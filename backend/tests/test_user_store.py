@@ -0,0 +1,54 @@
+# tests/test_user_store.py
+"""
+사용자 저장소: worker 여럿이 동시에 seed 해도 에러 없음, seed hash 는 hash 스레드에서
+
+    cd backend && python -m pytest -q tests
+"""
+import threading
+
+import pytest
+
+from app.core.health import get_state
+from app.core.security import init_user_store
+from app.domain.user_store import MemoryUserStore, SQLiteUserStore, UserStore, list_seed_users, set_user_store
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        UserStore()
+
+
+def test_concurrent_seed_does_not_conflict(tmp_path):
+    path = str(tmp_path / "users.db")
+    stores = [SQLiteUserStore(path) for _ in range(4)]   # worker 4 개가 같은 users.db
+    results = []
+    start = threading.Barrier(len(stores))
+
+    def seed(st):
+        start.wait()
+        results.append(st.create_if_absent("admin@local", "h", "admin"))
+
+    threads = [threading.Thread(target=seed, args=(st,)) for st in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(results) == [False, False, False, True]
+    assert stores[0].count() == 1
+    with pytest.raises(ValueError):
+        stores[0].create("ADMIN@local", "h")
+
+
+def test_init_user_store_seeds_off_the_caller_thread():
+    store = MemoryUserStore()
+    set_user_store(store)
+    try:
+        fut = init_user_store()
+        assert fut is not None
+        fut.result(timeout=30)
+        assert store.count() == len(list_seed_users())
+        assert get_state("users") == "ready"
+        assert init_user_store() is None   # 이미 있으면 seed 안 함
+    finally:
+        set_user_store(None)
@@ -2309,7 +2309,17 @@
           ? API_BASE.replace("https", "wss")
           : API_BASE.replace("http", "ws"));
 
-      const wsUrl = `${WS_BASE}/ws/telemetry`;
+      const wsBase = `${WS_BASE}/ws/telemetry`;
+
+      // ✅ 서버가 handshake 에서 token 검증 (WS_AUTH_REQUIRED) -> 브라우저 WebSocket 은 헤더를 못 붙여서 query 로
+      //    재연결 때마다 최신 token 사용 (lib/auth.js getToken 과 같은 키)
+      function wsUrl() {
+        const t = String(localStorage.getItem("token") || localStorage.getItem("access_token") || "")
+          .trim()
+          .replace(/^"+|"+$/g, "")
+          .replace(/^bearer\s+/i, "");
+        return t ? `${wsBase}?token=${encodeURIComponent(t)}` : wsBase;
+      }
 
       let retry = 1000;
 
@@ -2317,7 +2327,7 @@
         __wsClosedByUser = false;
 
         try { __ws && __ws.close(); } catch {}
-        __ws = new WebSocket(wsUrl);
+        __ws = new WebSocket(wsUrl());
 
         __ws.onopen = () => {
           setWsStatus("WS connected");
@@ -1,11 +1,42 @@
 // /js/wsTelemetry.js
-export function connectTelemetryWS({ baseWsUrl, onTelemetry, onStatus }) {
+import { getToken } from "./lib/auth.js";
+
+export function connectTelemetryWS({ baseWsUrl, onTelemetry, onPresence, onStatus, patterns, maxFps, delta, token }) {
   // baseWsUrl 예: "wss://<백엔드도메인>" 또는 로컬 "ws://localhost:10000"
-  const url = `${baseWsUrl}/ws/telemetry`;
+  // patterns 예: ["th/site001/#"] (country/site_id/model/device_id, + / # 와일드카드)
+  //   -> 생략하면 전체 수신
+  // maxFps: 장치당 초당 최대 프레임 (서버에서 최신값만 남기고 합침), delta: 바뀐 필드만 수신
+  // onPresence: online/offline 전환 {key, online, ts, site_id, site_online}
+  // token: 생략하면 로그인 token (서버가 handshake 에서 검증, 사용자 범위 밖 장치는 안 옴)
+  const base = `${baseWsUrl}/ws/telemetry`;
 
   let ws = null;
   let retryMs = 1000;
   let closedByUser = false;
+  // delta 복원용: key -> 마지막 전체 메시지
+  const lastByKey = new Map();
+
+  function applyDelta(msg) {
+    const prev = lastByKey.get(msg.key);
+    if (!prev) return null; // 기준 프레임 없음 (다음 전체 프레임 대기)
+    const next = { ...prev, type: "telemetry", ts: msg.ts };
+    const changed = msg.changed || {};
+    for (const [f, v] of Object.entries(changed)) {
+      const pv = prev[f];
+      if (v && typeof v === "object" && !Array.isArray(v) && pv && typeof pv === "object" && !Array.isArray(pv)) {
+        next[f] = { ...pv, ...v };
+      } else {
+        next[f] = v;
+      }
+    }
+    const removed = msg.removed || {};
+    for (const [f, keys] of Object.entries(removed)) {
+      if (!next[f] || typeof next[f] !== "object") continue;
+      next[f] = { ...next[f] };
+      for (const k of keys) delete next[f][k];
+    }
+    return next;
+  }
 
   function logStatus(type, detail) {
     if (onStatus) onStatus({ type, detail });
@@ -14,21 +45,52 @@ export function connectTelemetryWS({ baseWsUrl, onTelemetry, onStatus }) {
   function connect() {
     if (closedByUser) return;
 
-    ws = new WebSocket(url);
+    // ✅ 재연결 때마다 최신 token 으로 (브라우저 WebSocket 은 헤더를 못 붙여서 query 로)
+    const t = String(token || getToken() || "").replace(/^bearer\s+/i, "");
+    ws = new WebSocket(t ? `${base}?token=${encodeURIComponent(t)}` : base);
 
     ws.onopen = () => {
       retryMs = 1000;
       logStatus("open", "connected");
+      lastByKey.clear(); // 새 연결은 전체 프레임부터 다시 받음
+      if (maxFps || delta) {
+        ws.send(JSON.stringify({ type: "options", max_fps: maxFps || 0, delta: !!delta }));
+      }
+      // ✅ 재연결 때마다 구독 다시 전송 (서버는 연결 단위로 구독을 관리)
+      if (Array.isArray(patterns) && patterns.length) {
+        ws.send(JSON.stringify({ type: "subscribe", patterns }));
+      }
     };
 
     ws.onmessage = (ev) => {
       let msg;
       try { msg = JSON.parse(ev.data); } catch { return; }
 
-      if (msg.type === "ping") return;
+      if (msg.type === "ping") {
+        if (msg.scope) logStatus("scope", msg.scope);
+        return;
+      }
+      if (msg.type === "telemetry_delta") {
+        const full = applyDelta(msg);
+        if (!full) return;
+        lastByKey.set(msg.key, full);
+        if (onTelemetry) onTelemetry(full);
+        return;
+      }
+
+      if (msg.type === "presence") {
+        if (onPresence) onPresence(msg);
+        return;
+      }
+
+      if (msg.type === "subscribed" || msg.type === "unsubscribed" || msg.type === "options") {
+        logStatus(msg.type, msg.patterns);
+        return;
+      }
 
       if (msg.type === "telemetry") {
         // msg = {type, ts, key, payload, summary, channels, channel_count}
+        if (delta) lastByKey.set(msg.key, msg);
         if (onTelemetry) onTelemetry(msg);
       }
     };